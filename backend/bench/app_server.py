@@ -0,0 +1,38 @@
+"""在后台线程里启动被测的 FastAPI 应用（main:app）"""
+import os
+import threading
+import time
+
+import uvicorn
+
+
+class AppServer:
+    """把后端指向模拟 LLM 服务后，用 uvicorn 在后台线程运行 main:app"""
+
+    def __init__(self, openai_base_url: str, host: str = "127.0.0.1", port: int = 8765, env: dict = None):
+        os.environ["OPENAI_API_KEY"] = "mock-key"
+        os.environ["OPENAI_API_BASE"] = openai_base_url
+        os.environ["DEEPSEEK_API_KEY"] = "mock-key"
+        os.environ["DEEPSEEK_API_BASE"] = openai_base_url
+        # 基准测试不需要预加载 embedding 模型
+        os.environ.setdefault("VECTORSTORE_WARMUP", "false")
+        os.environ.update(env or {})
+
+        from main import app
+
+        self.app = app
+        self.http_url = f"http://{host}:{port}"
+        self.ws_url = f"ws://{host}:{port}"
+        config = uvicorn.Config(app, host=host, port=port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> "AppServer":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
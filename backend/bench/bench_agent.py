@@ -0,0 +1,83 @@
+"""/ask 单次请求开销对比：每次重建 Agent vs 复用 AgentFactory
+
+两种方式都连到本地模拟 LLM 服务，因此测到的是框架自身的开销
+（客户端构建、连接建立、工具描述和提示词组装），而不是模型耗时。
+
+用法（在 backend 目录下）：
+    python -m bench.bench_agent --requests 200
+"""
+import argparse
+import statistics
+import time
+
+from langchain.agents import initialize_agent
+from langchain.memory import ConversationBufferMemory
+
+from bench.mock_openai import MockOpenAIServer
+from services.agent_factory import AgentFactory, build_llm, build_tools
+
+QUESTION = "你好，今天过得怎么样？"
+
+
+def run_rebuild_per_request(base_url: str, n: int) -> list:
+    """旧实现：每个请求都新建 ChatOpenAI 和 Agent"""
+    memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+    tools = build_tools()
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        llm = build_llm("mock-key", base_url)
+        agent = initialize_agent(
+            tools=tools,
+            llm=llm,
+            agent="conversational-react-description",
+            memory=memory,
+            verbose=False,
+            return_intermediate_steps=True,
+            handle_parsing_errors=True
+        )
+        agent.invoke({"input": QUESTION})
+        timings.append(time.perf_counter() - start)
+        memory.clear()
+    return timings
+
+
+def run_shared_factory(base_url: str, n: int) -> list:
+    """新实现：启动时构建一次，请求只注入记忆"""
+    factory = AgentFactory(build_llm("mock-key", base_url))
+    factory.executor.verbose = False
+    memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        factory.run(QUESTION, memory)
+        timings.append(time.perf_counter() - start)
+        memory.clear()
+    return timings
+
+
+def summarize(name: str, timings: list):
+    ms = sorted(t * 1000 for t in timings)
+    p95 = ms[int(len(ms) * 0.95) - 1]
+    print(f"{name:<24} mean={statistics.mean(ms):7.2f}ms  p50={statistics.median(ms):7.2f}ms  p95={p95:7.2f}ms")
+    return statistics.mean(ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--port", type=int, default=9999)
+    args = parser.parse_args()
+
+    with MockOpenAIServer(port=args.port) as server:
+        # 预热一次，排除首次导入和连接的影响
+        run_shared_factory(server.base_url, 1)
+
+        before = summarize("rebuild per request", run_rebuild_per_request(server.base_url, args.requests))
+        after = summarize("shared AgentFactory", run_shared_factory(server.base_url, args.requests))
+
+    print(f"per-request overhead saved: {before - after:.2f}ms ({(1 - after / before) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""并发 /api/check-sentence 压测
+
+对本地模拟 LLM 服务（固定往返延迟）同时发出 N 个 /api/check-sentence 请求。
+EnglishChecker 走异步客户端后，总耗时应接近一次往返时间，而不是 N 倍。
+
+用法（在 backend 目录下）：
+    python -m bench.bench_checker_concurrency --concurrency 20 --latency-ms 500
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+from bench.mock_openai import MockOpenAIServer
+
+
+async def fire(app, n: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post("/api/check-sentence", json={"sentence": f"I has a apple number {i}."}, timeout=120)
+            for i in range(n)
+        ])
+        elapsed = time.perf_counter() - start
+    failed = [r for r in responses if r.status_code != 200]
+    if failed:
+        raise RuntimeError(f"{len(failed)} requests failed: {failed[0].text}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--port", type=int, default=9999)
+    args = parser.parse_args()
+
+    with MockOpenAIServer(port=args.port, latency_ms=args.latency_ms) as server:
+        # 导入 main 之前把检查器指向模拟服务
+        os.environ["OPENAI_API_KEY"] = "mock-key"
+        os.environ["OPENAI_API_BASE"] = server.base_url
+        os.environ.setdefault("OPENAI_MAX_CONCURRENCY", str(args.concurrency))
+        from main import app
+
+        elapsed = asyncio.run(fire(app, args.concurrency))
+
+    rtt = args.latency_ms / 1000
+    print(f"{args.concurrency} concurrent /api/check-sentence: {elapsed:.3f}s "
+          f"(one round trip = {rtt:.3f}s, serial would be ~{rtt * args.concurrency:.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""文档入库的向量计算吞吐：单进程 vs 多进程 embedding_pipeline
+
+读取一份 PDF（默认 example_data/nke-10k-2023.pdf），按 semantic-search-engine.py
+相同的参数切片，然后分别用不同的进程数计算全部切片的向量，报告耗时、
+chunks/s 和峰值内存。每种配置在独立的子进程里运行，峰值内存互不影响。
+
+用法（在 backend 目录下）：
+    python -m bench.bench_embedding_pipeline --workers 1 2 4 --batch-size 64
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from services.embedding_pipeline import EMBED_BATCH_SIZE
+
+DEFAULT_PDF = "example_data/nke-10k-2023.pdf"
+
+
+def load_texts(pdf_path: str) -> list:
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    docs = PyPDFLoader(pdf_path).load()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, add_start_index=True)
+    return [doc.page_content for doc in splitter.split_documents(docs)]
+
+
+def run_single(pdf_path: str, workers: int, batch_size: int):
+    """子进程入口：跑一种配置，把统计信息以 JSON 输出到最后一行"""
+    from services.embedding_pipeline import embed_texts
+
+    texts = load_texts(pdf_path)
+    _, stats = embed_texts(texts, batch_size=batch_size, workers=workers, verbose=False)
+    print(json.dumps(stats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", default=DEFAULT_PDF)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        run_single(args.pdf, args.workers[0], args.batch_size)
+        return
+
+    print(f"{args.pdf}: {len(load_texts(args.pdf))} chunks, batch size {args.batch_size}, {os.cpu_count()} CPUs")
+    baseline = None
+    for workers in args.workers:
+        output = subprocess.run(
+            [sys.executable, "-m", "bench.bench_embedding_pipeline", "--single",
+             "--pdf", args.pdf, "--workers", str(workers), "--batch-size", str(args.batch_size)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        stats = json.loads(output.strip().splitlines()[-1])
+        baseline = baseline or stats["chunks_per_sec"]
+        peak = f"{stats['peak_rss_mb']:.0f}MB" if stats["peak_rss_mb"] is not None else "n/a"
+        print(f"workers={stats['workers']:<3} {stats['seconds']:7.2f}s  {stats['chunks_per_sec']:8.1f} chunks/s  "
+              f"speedup={stats['chunks_per_sec'] / baseline:5.2f}x  peak RSS={peak}")
+
+
+if __name__ == "__main__":
+    main()
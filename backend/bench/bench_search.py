@@ -0,0 +1,77 @@
+"""检索吞吐对比：逐条调用 query_vectorstore vs 批量 RetrievalService.search
+
+- loop：每条查询单独调用 query_vectorstore（一次 embedding 推理 + 一次 FAISS 检索）
+- batch：每 batch_size 条查询调用一次 search，向量一次算完，再在各索引上并行检索
+
+每轮开始前清空查询向量和结果缓存，测到的是未命中缓存时的吞吐。
+
+用法（在 backend 目录下）：
+    python -m bench.bench_search --queries 256 --batch-size 32
+"""
+import argparse
+import asyncio
+import time
+
+from services.rag_builder import query_vectorstore
+from services.retrieval import retrieval_service
+from services.vectorstore_registry import registry
+
+TOPICS = [
+    "particle accelerator energy", "cosmic ray observatory", "charm physics experiment",
+    "public speaking tips", "leadership in clubs", "how to give an evaluation",
+    "gamma ray detection", "speech contest rules", "high altitude detector", "storytelling on stage"
+]
+
+
+def make_queries(n: int) -> list:
+    # 查询各不相同，避免命中缓存
+    return [f"{TOPICS[i % len(TOPICS)]} #{i}" for i in range(n)]
+
+
+def reset_caches():
+    registry.embedding_cache.clear()
+    registry.result_cache.clear()
+
+
+def run_loop(queries: list) -> float:
+    reset_caches()
+    start = time.perf_counter()
+    for query in queries:
+        query_vectorstore(query)
+    return time.perf_counter() - start
+
+
+def run_batch(queries: list, batch_size: int, index_names: list) -> float:
+    reset_caches()
+
+    async def run():
+        for i in range(0, len(queries), batch_size):
+            await retrieval_service.search(queries[i:i + batch_size], index_names, k=4)
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    # 预加载模型和所有索引，排除首次加载的耗时
+    retrieval_service.warmup()
+    queries = make_queries(args.queries)
+
+    loop = run_loop(queries)
+    print(f"{'loop query_vectorstore':<32} {loop:7.2f}s  {len(queries) / loop:8.1f} queries/s")
+    batch = run_batch(queries, args.batch_size, ["physics"])
+    print(f"{'batch search (physics)':<32} {batch:7.2f}s  {len(queries) / batch:8.1f} queries/s  "
+          f"speedup={loop / batch:.2f}x")
+    fanout = run_batch(queries, args.batch_size, retrieval_service.names)
+    print(f"{'batch search (all indexes)':<32} {fanout:7.2f}s  {len(queries) / fanout:8.1f} queries/s  "
+          f"({len(retrieval_service.names)} indexes)")
+
+
+if __name__ == "__main__":
+    main()
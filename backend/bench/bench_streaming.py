@@ -0,0 +1,64 @@
+"""句子检查流式反馈的首个有效输出时间
+
+本地模拟服务按固定速度逐块“生成”检查结果 JSON，通过真实的 WebSocket 连接分别测量：
+- 非流式：客户端收到 feedback 的时间
+- 流式：第一条 feedback_partial 和最终 feedback 的时间
+
+用法（在 backend 目录下）：
+    python -m bench.bench_streaming --chunk-delay-ms 30 --runs 5
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import websockets
+
+from bench.app_server import AppServer
+from bench.mock_openai import MockOpenAIServer
+
+
+async def measure(ws_url: str, stream: bool, run: int) -> dict:
+    async with websockets.connect(f"{ws_url}/ws/writing-assistant/bench-{stream}-{run}") as ws:
+        await ws.recv()
+        await ws.send(json.dumps({"type": "start_session", "stream": stream}))
+        await ws.recv()
+
+        # 每轮换一个句子，避免命中结果缓存
+        start = time.perf_counter()
+        await ws.send(json.dumps({"type": "text_update", "text": f"I has been to Beijing {run} times."}))
+        first_partial = None
+        while True:
+            message = json.loads(await ws.recv())
+            if message["type"] == "feedback_partial" and first_partial is None:
+                first_partial = time.perf_counter() - start
+            if message["type"] == "feedback":
+                return {"first_partial": first_partial, "final": time.perf_counter() - start}
+
+
+async def run(ws_url: str, runs: int):
+    blocking = [await measure(ws_url, False, i) for i in range(runs)]
+    streaming = [await measure(ws_url, True, runs + i) for i in range(runs)]
+    return blocking, streaming
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-delay-ms", type=float, default=30)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--mock-port", type=int, default=9999)
+    parser.add_argument("--app-port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with MockOpenAIServer(port=args.mock_port, chunk_delay_ms=args.chunk_delay_ms) as mock:
+        with AppServer(mock.base_url, port=args.app_port, env={"WS_CHECK_DEBOUNCE_MS": "0"}) as app:
+            blocking, streaming = asyncio.run(run(app.ws_url, args.runs))
+
+    print(f"non-streaming  feedback:       {statistics.median(r['final'] for r in blocking) * 1000:7.1f}ms")
+    print(f"streaming      first partial:  {statistics.median(r['first_partial'] for r in streaming) * 1000:7.1f}ms")
+    print(f"streaming      feedback:       {statistics.median(r['final'] for r in streaming) * 1000:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
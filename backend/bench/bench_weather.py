@@ -0,0 +1,71 @@
+"""Weather 工具的上游请求量：用户请求增加时，上游请求数应保持不变
+
+对本地模拟天气服务，分几档并发量在固定时长内持续调用 aget_weather，
+报告每档的用户请求数、上游请求数和延迟；最后让上游返回 503，
+确认缓存过期后仍能返回旧值。
+
+用法（在 backend 目录下）：
+    python -m bench.bench_weather --users 1 10 100 --seconds 3 --ttl 1
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from bench.fake_weather import FakeWeatherServer
+from services.tools import CITY_COORDINATES, WeatherService, aget_weather
+import services.tools as tools
+
+
+async def run_users(users: int, seconds: float) -> list:
+    cities = list(CITY_COORDINATES)
+    deadline = time.perf_counter() + seconds
+    latencies = []
+
+    async def user():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await aget_weather(random.choice(cities))
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(user() for _ in range(users)))
+    return latencies
+
+
+async def run(args):
+    with FakeWeatherServer(port=args.port, latency_ms=args.latency_ms) as server:
+        service = WeatherService(base_url=server.base_url, ttl=args.ttl, stale_ttl=3600)
+        tools.weather_service = service
+
+        for users in args.users:
+            before = server.request_count
+            latencies = await run_users(users, args.seconds)
+            upstream = server.request_count - before
+            ms = sorted(t * 1000 for t in latencies)
+            print(f"users={users:<4} requests={len(ms):<6} upstream={upstream:<4} "
+                  f"upstream/min={upstream / args.seconds * 60:6.1f}  "
+                  f"p50={statistics.median(ms):6.2f}ms  p99={ms[int(len(ms) * 0.99) - 1]:6.2f}ms")
+
+        # 上游故障：缓存过期后应回退到旧值，而不是报错
+        server.set_failing(True)
+        await asyncio.sleep(args.ttl)
+        answer = await aget_weather("北京")
+        print(f"upstream failing -> {answer}  stats={service.stats()}")
+        await service.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--ttl", type=float, default=1.0, help="缓存有效期（秒），基准测试中调小以便观察")
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--port", type=int, default=9998)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""对比两次 bench.loadgen 的结果，发现性能回退
+
+逐场景比较 p50/p95/p99 延迟、吞吐和事件循环延迟 p99：
+- 延迟（p95、p99）上升超过 --max-latency-increase
+- 吞吐下降超过 --max-throughput-drop
+- 错误数增加
+- 事件循环延迟 p99 上升超过 --max-latency-increase，且超过 --lag-floor-ms（低于该值视为噪声）
+任一条件满足即视为回退，退出码为 1，可直接用于 CI。
+
+用法（在 backend 目录下）：
+    python -m bench.compare bench/results/baseline.json bench/results/loadgen-20240101-120000.json
+"""
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+
+def change(before: Optional[float], after: Optional[float]) -> Optional[float]:
+    """相对变化，任一方缺失或基线为 0 时返回 None"""
+    if not isinstance(before, (int, float)) or not isinstance(after, (int, float)) or before == 0:
+        return None
+    return (after - before) / before
+
+
+def fmt(before, after) -> str:
+    ratio = change(before, after)
+    if ratio is None:
+        return f"{before} -> {after}"
+    return f"{before} -> {after} ({ratio * 100:+.1f}%)"
+
+
+def compare(baseline: dict, current: dict, max_latency_increase: float, max_throughput_drop: float, lag_floor_ms: float) -> List[str]:
+    regressions = []
+    for name, after in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            print(f"{name}: no baseline, skipped")
+            continue
+        print(f"{name}")
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "errors"):
+            print(f"  {key:<16} {fmt(before[key], after[key])}")
+        lag_before, lag_after = before["event_loop_lag"]["p99_ms"], after["event_loop_lag"]["p99_ms"]
+        print(f"  {'loop_lag_p99_ms':<16} {fmt(lag_before, lag_after)}")
+
+        for key in ("p95_ms", "p99_ms"):
+            ratio = change(before[key], after[key])
+            if ratio is not None and ratio > max_latency_increase:
+                regressions.append(f"{name}: {key} {fmt(before[key], after[key])}")
+        ratio = change(before["throughput_rps"], after["throughput_rps"])
+        if ratio is not None and -ratio > max_throughput_drop:
+            regressions.append(f"{name}: throughput_rps {fmt(before['throughput_rps'], after['throughput_rps'])}")
+        if after["errors"] > before["errors"]:
+            regressions.append(f"{name}: errors {before['errors']} -> {after['errors']}")
+        if lag_after == "inf" or (isinstance(lag_after, (int, float)) and lag_after > lag_floor_ms):
+            ratio = change(lag_before, lag_after)
+            if lag_after == "inf" or ratio is None or ratio > max_latency_increase:
+                regressions.append(f"{name}: event loop lag p99 {fmt(lag_before, lag_after)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--max-latency-increase", type=float, default=0.10, help="允许的延迟上升比例")
+    parser.add_argument("--max-throughput-drop", type=float, default=0.10, help="允许的吞吐下降比例")
+    parser.add_argument("--lag-floor-ms", type=float, default=10.0, help="事件循环延迟低于此值时不判定回退")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+
+    regressions = compare(baseline, current, args.max_latency_increase, args.max_throughput_drop, args.lag_floor_ms)
+    if regressions:
+        print("\nregressions:")
+        for item in regressions:
+            print(f"  {item}")
+        sys.exit(1)
+    print("\nno regressions")
+
+
+if __name__ == "__main__":
+    main()
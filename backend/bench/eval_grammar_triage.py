@@ -0,0 +1,105 @@
+"""离线评估本地语法初筛：省下的 LLM 调用比例和漏掉的错误比例
+
+标注数据每行 {"sentence": ..., "has_error": true/false, "category": ...}，分两份：
+- data/grammar_triage_eval.jsonl：开发集，规则和搭配表是对照它写的，结果是样本内的，只能说明规则确实生效
+- data/grammar_triage_holdout.jsonl：留出集，编写规则时没有看过，用来估计实际漏掉的错误；
+  调整规则后不要把留出集里漏掉的句子直接写成规则，否则它也变成了样本内数据
+
+两份数据分别报告规则命中情况、总体结果，并按错误类别和句子长度列出漏掉的错误。
+
+- saved：在本地返回“没有问题”的句子占全部句子的比例，即省下的 check_sentence 调用
+- missed：有错误的句子中被本地判定为没有问题的比例
+- clean_escalated：没有错误的句子中仍然交给 LLM 的比例
+
+用法（在 backend 目录下）：
+    python -m bench.eval_grammar_triage
+    python -m bench.eval_grammar_triage --data data/grammar_triage_eval.jsonl --holdout data/grammar_triage_holdout.jsonl
+"""
+import argparse
+import os
+from collections import Counter
+
+from services.grammar_triage import GrammarTriage, load_examples, tokenize
+from services.spell_checker import spell_checker
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+DEFAULT_DATA = os.path.join(DATA_DIR, "grammar_triage_eval.jsonl")
+DEFAULT_HOLDOUT = os.path.join(DATA_DIR, "grammar_triage_holdout.jsonl")
+# 按词数分组：(上限, 名称)
+LENGTH_BUCKETS = ((8, "1-8"), (15, "9-15"), (25, "16-25"), (float("inf"), "26+"))
+
+
+def length_bucket(sentence: str) -> str:
+    words = sum(1 for token in tokenize(sentence) if token[0].isalpha())
+    return next(name for limit, name in LENGTH_BUCKETS if words <= limit)
+
+
+def summarize(examples, local) -> dict:
+    errors = [is_local for e, is_local in zip(examples, local) if e["has_error"]]
+    clean = [is_local for e, is_local in zip(examples, local) if not e["has_error"]]
+    return {
+        "saved": sum(local) / max(1, len(local)),
+        "missed": sum(errors) / max(1, len(errors)),
+        "clean_escalated": sum(1 for is_local in clean if not is_local) / max(1, len(clean))
+    }
+
+
+def report(name: str, triage: GrammarTriage, examples, show_missed: bool):
+    errors = sum(1 for e in examples if e["has_error"])
+    print(f"== {name}: {len(examples)} sentences, {errors} with errors, {len(examples) - errors} clean")
+
+    screened = [triage.screen(e["sentence"]) for e in examples]
+    too_long = sum(1 for issue in screened if issue == "too_long")
+    rule_hits = [issue is not None and issue != "too_long" for issue in screened]
+    caught = sum(1 for e, hit in zip(examples, rule_hits) if e["has_error"] and hit)
+    false_alarms = sum(1 for e, hit in zip(examples, rule_hits) if not e["has_error"] and hit)
+    print(f"longer than {triage.max_words} words (always escalated): {too_long}")
+    print(f"rules: {caught}/{errors} errors caught, {false_alarms} clean sentences flagged")
+
+    reasons = [triage.issue(e["sentence"]) for e in examples]
+    local = [reason is None for reason in reasons]
+    bigram_hits = sum(1 for reason in reasons if reason == "unseen_bigram")
+    print(f"unseen common bigrams: {bigram_hits} more sentences escalated")
+    row = summarize(examples, local)
+    print(f"saved {row['saved']:.1%}  missed {row['missed']:.1%}  clean_escalated {row['clean_escalated']:.1%}")
+
+    missed = [(e["category"], e["sentence"]) for e, is_local in zip(examples, local) if e["has_error"] and is_local]
+    total = Counter(e["category"] for e in examples if e["has_error"])
+    by_category = Counter(category for category, _ in missed)
+    print(f"\nmissed: {len(missed)}")
+    for category in sorted(total):
+        print(f"  {category:<15} {by_category.get(category, 0)}/{total[category]} missed")
+    if show_missed:
+        for category, sentence in sorted(missed):
+            print(f"    [{category}] {sentence}")
+
+    print("\nby length:")
+    print(f"  {'words':<7} {'sentences':>9}  {'saved':>7}  {'missed':>9}")
+    buckets = [length_bucket(e["sentence"]) for e in examples]
+    for _, bucket in LENGTH_BUCKETS:
+        rows = [i for i, b in enumerate(buckets) if b == bucket]
+        if not rows:
+            continue
+        saved = sum(1 for i in rows if local[i]) / len(rows)
+        with_error = [i for i in rows if examples[i]["has_error"]]
+        missed_here = sum(1 for i in with_error if local[i])
+        print(f"  {bucket:<7} {len(rows):>9}  {saved:>7.1%}  {missed_here:>4}/{len(with_error):<4}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=DEFAULT_DATA, help="开发集（样本内）")
+    parser.add_argument("--holdout", default=DEFAULT_HOLDOUT, help="留出集（样本外）")
+    parser.add_argument("--show-missed", action="store_true", help="列出开发集中漏掉的句子（留出集总是列出）")
+    args = parser.parse_args()
+
+    spell_checker.load()
+    triage = GrammarTriage(enabled=True)
+    triage.load()
+    report("dev (in-sample)", triage, load_examples(args.data), args.show_missed)
+    report("holdout (out-of-sample)", triage, load_examples(args.holdout), True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""本地 open-meteo 兼容的模拟天气服务
+
+只实现 /v1/forecast?latitude=..&longitude=..&current_weather=true，
+可以设置响应延迟，也可以在运行中切换为返回 503，用来验证旧值回退。
+
+用法：
+    python -m bench.fake_weather --port 9998 --latency-ms 100
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Response
+
+
+def create_app(latency_ms: float = 0.0) -> FastAPI:
+    app = FastAPI()
+    app.state.latency_ms = latency_ms
+    app.state.fail = False
+    app.state.requests = 0
+
+    @app.get("/v1/forecast")
+    async def forecast(latitude: float, longitude: float, current_weather: bool = False):
+        app.state.requests += 1
+        if app.state.latency_ms:
+            await asyncio.sleep(app.state.latency_ms / 1000)
+        if app.state.fail:
+            return Response(status_code=503)
+        return {
+            "latitude": latitude,
+            "longitude": longitude,
+            "current_weather": {
+                "temperature": round(20 + latitude / 10, 1),
+                "windspeed": round(5 + longitude / 100, 1),
+                "time": time.strftime("%Y-%m-%dT%H:%M")
+            }
+        }
+
+    return app
+
+
+class FakeWeatherServer:
+    """在后台线程里运行模拟天气服务，可作为上下文管理器使用"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9998, latency_ms: float = 0.0):
+        self.app = create_app(latency_ms)
+        self.base_url = f"http://{host}:{port}/v1"
+        config = uvicorn.Config(self.app, host=host, port=port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> "FakeWeatherServer":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+    @property
+    def request_count(self) -> int:
+        return self.app.state.requests
+
+    def set_failing(self, fail: bool):
+        self.app.state.fail = fail
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="open-meteo 兼容的本地模拟天气服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9998)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency_ms), host=args.host, port=args.port)
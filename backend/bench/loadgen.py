@@ -0,0 +1,325 @@
+"""离线压测：模拟 LLM 服务 + 被测服务各自运行在独立进程，按场景施加并发负载
+
+场景：
+- ask           POST /ask
+- check-word    POST /api/check-word
+- check-sentence POST /api/check-sentence
+- improve-text  POST /api/improve-text
+- ws-typing     模拟用户在 /ws/writing-assistant 上逐词输入，测量句子结束到收到 feedback 的延迟
+                （包含 WS_CHECK_DEBOUNCE_MS 的防抖时间）
+
+每个场景以 --concurrency 个并发用户闭环请求 --seconds 秒，报告 p50/p95/p99 延迟、吞吐、
+错误数，以及被测服务 /metrics 中事件循环延迟的分位数。结果写入 JSON，可用 bench.compare 对比两次运行。
+
+默认关闭被测服务的检查结果缓存和 /ask 语义缓存，每个请求都走完整路径；
+需要测量缓存效果时用 --server-env 覆盖。指定 --url 时直接压测已运行的服务，不再启动子进程。
+
+用法（在 backend 目录下）：
+    python -m bench.loadgen --scenarios check-word check-sentence ws-typing --concurrency 20 --seconds 10
+    python -m bench.loadgen --latency-ms 300 --tokens-per-second 50 --output bench/results/baseline.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+
+SCENARIOS = ("ask", "check-word", "check-sentence", "improve-text", "ws-typing")
+
+WORDS = ["recieve", "definitely", "accomodate", "beautiful", "occured", "necessary", "writting", "language"]
+SENTENCES = [
+    "I has been to Beijing many times.",
+    "She don't like apples very much.",
+    "We goes to school by bus every day.",
+    "Yesterday I have visited my grandmother.",
+    "The weather are really nice today."
+]
+QUESTIONS = ["LHC是什么", "BESIII 研究什么", "今天过得怎么样", "LHAASO 在哪里"]
+
+# 被测服务的默认环境：指向模拟 LLM 服务，关闭缓存，事件循环延迟采样得更密
+DEFAULT_SERVER_ENV = {
+    "OPENAI_API_KEY": "mock-key",
+    "DEEPSEEK_API_KEY": "mock-key",
+    "VECTORSTORE_WARMUP": "false",
+    "CHECK_CACHE_BACKEND": "none",
+    "ASK_CACHE_ENABLED": "false",
+    "METRICS_LOOP_LAG_INTERVAL": "0.05"
+}
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """最近秩分位数，q 取 0-100"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    ms = sorted(round(t * 1000, 2) for t in latencies)
+    return {
+        "requests": len(ms) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(ms) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(ms) / len(ms), 2) if ms else None,
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+        "max_ms": ms[-1] if ms else None
+    }
+
+
+def histogram_buckets(metrics_text: str, name: str) -> Dict[float, float]:
+    """从 Prometheus 文本中取出直方图的累计桶 {上界: 计数}"""
+    buckets = {}
+    pattern = re.compile(rf'^{name}_bucket\{{le="([^"]+)"\}} ([0-9.e+-]+)$')
+    for line in metrics_text.splitlines():
+        match = pattern.match(line)
+        if match:
+            buckets[float(match.group(1))] = float(match.group(2))
+    return buckets
+
+
+def lag_summary(before: Dict[float, float], after: Dict[float, float]) -> dict:
+    """场景期间事件循环延迟的分位数（毫秒，取所在桶的上界）"""
+    delta = sorted((bound, after.get(bound, 0) - before.get(bound, 0)) for bound in after)
+    total = delta[-1][1] if delta else 0
+    result = {"samples": int(total)}
+    for q in (50, 95, 99):
+        bound = next((b for b, count in delta if total and count >= total * q / 100), None)
+        result[f"p{q}_ms"] = None if bound is None else (round(bound * 1000, 2) if bound != float("inf") else "inf")
+    return result
+
+
+class Scenario:
+    """一个 HTTP 场景：request(client, i) 发出第 i 个请求并返回响应"""
+
+    def __init__(self, name: str, method: str, path: str, payload):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.payload = payload
+
+    async def request(self, client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.request(self.method, self.path, json=self.payload(i))
+
+
+HTTP_SCENARIOS = {
+    "ask": Scenario("ask", "POST", "/ask", lambda i: {"question": f"{QUESTIONS[i % len(QUESTIONS)]} #{i}"}),
+    "check-word": Scenario("check-word", "POST", "/api/check-word",
+                           lambda i: {"word": WORDS[i % len(WORDS)], "context": f"I will {WORDS[i % len(WORDS)]} it ({i})."}),
+    "check-sentence": Scenario("check-sentence", "POST", "/api/check-sentence",
+                               lambda i: {"sentence": f"{SENTENCES[i % len(SENTENCES)][:-1]} #{i}."}),
+    "improve-text": Scenario("improve-text", "POST", "/api/improve-text",
+                             lambda i: {"question": " ".join(SENTENCES) + f" ({i})"})
+}
+
+
+async def run_http(url: str, scenario: Scenario, concurrency: int, seconds: float, timeout: float) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    counter = itertools.count()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        deadline = start + seconds
+
+        async def user():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                sent = time.perf_counter()
+                try:
+                    response = await scenario.request(client, next(counter))
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - sent)
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return summarize(latencies, errors, elapsed)
+
+
+async def run_typists(ws_url: str, typists: int, seconds: float, word_interval: float) -> dict:
+    """每个模拟用户逐词输入，发送全文；每句结束时记下时间，收到该句的 feedback 时计算延迟"""
+    latencies: List[float] = []
+    errors = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+
+    async def typist(n: int):
+        nonlocal errors
+        pending: Dict[int, float] = {}
+        async with websockets.connect(f"{ws_url}/ws/writing-assistant/bench-typist-{n}-{int(start)}") as ws:
+            await ws.recv()
+            await ws.send(json.dumps({"type": "start_session"}))
+
+            async def receive():
+                nonlocal errors
+                async for raw in ws:
+                    message = json.loads(raw)
+                    if message["type"] == "feedback":
+                        sent = pending.pop(message["sentence_index"], None)
+                        if sent is not None:
+                            latencies.append(time.perf_counter() - sent)
+                    elif message["type"] == "error":
+                        errors += 1
+
+            receiver = asyncio.create_task(receive())
+            text = ""
+            sentence_index = 0
+            try:
+                for i in itertools.count():
+                    if time.perf_counter() >= deadline:
+                        break
+                    sentence = f"{SENTENCES[(n + i) % len(SENTENCES)][:-1]} {n}-{i}."
+                    for word in sentence.split():
+                        text = f"{text} {word}".lstrip()
+                        await ws.send(json.dumps({"type": "text_update", "text": text}))
+                        if word.endswith("."):
+                            pending[sentence_index] = time.perf_counter()
+                            sentence_index += 1
+                        await asyncio.sleep(word_interval)
+                # 等待最后几句的结果
+                wait_until = time.perf_counter() + 10
+                while pending and time.perf_counter() < wait_until:
+                    await asyncio.sleep(0.05)
+                errors += len(pending)
+            finally:
+                receiver.cancel()
+
+    await asyncio.gather(*(typist(n) for n in range(typists)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def wait_until_ready(url: str, path: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{url}{path}", timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready in {timeout}s")
+
+
+class LocalStack:
+    """在子进程中启动模拟 LLM 服务和被测服务，退出时一并结束"""
+
+    def __init__(self, args):
+        self.args = args
+        self.processes: List[subprocess.Popen] = []
+        self.mock_url = f"http://127.0.0.1:{args.mock_port}"
+        self.url = f"http://127.0.0.1:{args.app_port}"
+
+    def __enter__(self) -> "LocalStack":
+        args = self.args
+        self.processes.append(subprocess.Popen([
+            sys.executable, "-m", "bench.mock_openai", "--port", str(args.mock_port),
+            "--latency-ms", str(args.latency_ms), "--tokens-per-second", str(args.tokens_per_second)
+        ]))
+        wait_until_ready(self.mock_url, "/docs")
+
+        env = {**os.environ, **DEFAULT_SERVER_ENV,
+               "OPENAI_API_BASE": f"{self.mock_url}/v1", "DEEPSEEK_API_BASE": f"{self.mock_url}/v1"}
+        env.update(item.split("=", 1) for item in args.server_env)
+        self.processes.append(subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.app_port), "--log-level", "warning"
+        ], env=env))
+        wait_until_ready(self.url, "/api/health")
+        return self
+
+    def __exit__(self, *exc):
+        for process in reversed(self.processes):
+            process.terminate()
+            process.wait(timeout=10)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_scenarios(url: str, args) -> dict:
+    results = {}
+    async with httpx.AsyncClient(base_url=url, timeout=10) as client:
+        for name in args.scenarios:
+            before = histogram_buckets((await client.get("/metrics")).text, "event_loop_lag_seconds")
+            if name == "ws-typing":
+                ws_url = "ws" + url[len("http"):]
+                result = await run_typists(ws_url, args.concurrency, args.seconds, args.word_interval_ms / 1000)
+            else:
+                result = await run_http(url, HTTP_SCENARIOS[name], args.concurrency, args.seconds, args.timeout)
+            after = histogram_buckets((await client.get("/metrics")).text, "event_loop_lag_seconds")
+            result["event_loop_lag"] = lag_summary(before, after)
+            results[name] = result
+            print(format_row(name, result))
+    return results
+
+
+def format_row(name: str, result: dict) -> str:
+    def ms(value):
+        return f"{value:8.1f}" if isinstance(value, (int, float)) else f"{'-':>8}"
+
+    lag = result["event_loop_lag"]
+    return (f"{name:<16} n={result['requests']:<6} err={result['errors']:<4} {result['throughput_rps']:8.1f} rps  "
+            f"p50={ms(result['p50_ms'])}  p95={ms(result['p95_ms'])}  p99={ms(result['p99_ms'])} ms  "
+            f"loop lag p99={lag['p99_ms']} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=10, help="并发用户数（ws-typing 为同时输入的用户数）")
+    parser.add_argument("--seconds", type=float, default=10.0, help="每个场景的持续时间")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--word-interval-ms", type=float, default=150.0, help="模拟输入时每个词的间隔")
+    parser.add_argument("--url", help="压测已运行的服务，不启动子进程")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="模拟 LLM 的首字延迟")
+    parser.add_argument("--tokens-per-second", type=float, default=100.0, help="模拟 LLM 的生成速度")
+    parser.add_argument("--mock-port", type=int, default=9999)
+    parser.add_argument("--app-port", type=int, default=8765)
+    parser.add_argument("--server-env", nargs="*", default=[], metavar="KEY=VALUE", help="被测服务的额外环境变量")
+    parser.add_argument("--output", help="结果 JSON 路径，默认 bench/results/loadgen-<时间>.json")
+    args = parser.parse_args()
+
+    if args.url:
+        results = asyncio.run(run_scenarios(args.url.rstrip("/"), args))
+    else:
+        with LocalStack(args) as stack:
+            results = asyncio.run(run_scenarios(stack.url, args))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args)
+        },
+        "scenarios": results
+    }
+    output = args.output or os.path.join("bench", "results", f"loadgen-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""本地 OpenAI 兼容的模拟服务，用于离线基准测试
+
+只实现 /v1/chat/completions，按请求内容返回固定的回复：
+- ReAct Agent 的提示词 -> 直接给出最终回答
+- 其余（英语检查器的提示词）-> 一段合法的检查结果 JSON（批量检查时为数组）
+
+回复按 chunk_size 个字符一块模拟生成速度，每块耗时 chunk_delay_ms；也可以用
+tokens_per_second 指定生成速度（按 4 个字符一个 token 换算成每块耗时）。
+请求带 stream=true 时以 SSE 逐块返回，否则等全部“生成”完再一次性返回。
+两种方式都返回 usage，流式请求带 stream_options.include_usage 时在最后一块返回。
+
+用法：
+    python -m bench.mock_openai --port 9999 --latency-ms 200 --chunk-delay-ms 20
+    python -m bench.mock_openai --port 9999 --latency-ms 300 --tokens-per-second 50
+"""
+import argparse
+import asyncio
+import json
+import re
+import threading
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+AGENT_REPLY = "Thought: Do I need to use a tool? No\nAI: 这是来自模拟服务的回答。"
+
+WORD_REPLY = {
+    "is_correct": True,
+    "suggestions": [],
+    "explanation": "拼写正确",
+    "confidence": 1.0
+}
+
+SENTENCE_REPLY = {
+    "is_complete": True,
+    "issues": [],
+    "suggestions": [],
+    "overall_score": 0.95,
+    "explanation": "句子语法正确，表达清晰。",
+    "polished_sentence": "This is a polished sentence from the mock server.",
+    "polished_explanation": "用词更自然。"
+}
+
+IMPROVEMENT_REPLY = {
+    "overall_assessment": "整体不错",
+    "strengths": ["结构清晰"],
+    "areas_for_improvement": [],
+    "suggestions": [],
+    "level": "intermediate",
+    "score": 0.85
+}
+
+
+def canned_reply(messages) -> str:
+    """根据提示词内容挑选固定回复"""
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    if "Do I need to use a tool?" in prompt:
+        return AGENT_REPLY
+    if "拼写检查器" in prompt:
+        return json.dumps(WORD_REPLY, ensure_ascii=False)
+    if "写作导师" in prompt:
+        return json.dumps(IMPROVEMENT_REPLY, ensure_ascii=False)
+    batch = re.search(r"检查以下 (\d+) 个句子", prompt)
+    if batch:
+        items = [{"index": i + 1, **SENTENCE_REPLY} for i in range(int(batch.group(1)))]
+        return json.dumps(items, ensure_ascii=False)
+    return json.dumps(SENTENCE_REPLY, ensure_ascii=False)
+
+
+# 估算 token 数时每个 token 对应的字符数
+CHARS_PER_TOKEN = 4
+
+
+def usage_for(messages, content: str) -> dict:
+    prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // CHARS_PER_TOKEN
+    completion_tokens = len(content) // CHARS_PER_TOKEN
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens
+    }
+
+
+def chunk_delay_for(chunk_size: int, chunk_delay_ms: float, tokens_per_second: float) -> float:
+    """每块的生成耗时（毫秒），指定了 tokens_per_second 时以它为准"""
+    if tokens_per_second:
+        return chunk_size / CHARS_PER_TOKEN / tokens_per_second * 1000
+    return chunk_delay_ms
+
+
+def stream_chunks(content: str, model: str, chunk_size: int, chunk_delay_ms: float, usage: dict = None):
+    """把回复切成若干块，按 OpenAI 的 SSE 格式逐块输出；usage 不为空时最后附加一块只含用量的分片"""
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+    def event(delta: dict = None, finish_reason=None, usage: dict = None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            "usage": usage
+        }
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    async def generate():
+        yield event({"role": "assistant", "content": ""})
+        for i in range(0, len(content), chunk_size):
+            if chunk_delay_ms:
+                await asyncio.sleep(chunk_delay_ms / 1000)
+            yield event({"content": content[i:i + chunk_size]})
+        yield event({}, finish_reason="stop")
+        if usage is not None:
+            yield event(usage=usage)
+        yield "data: [DONE]\n\n"
+
+    return generate()
+
+
+def create_app(latency_ms: float = 0.0, chunk_delay_ms: float = 0.0, chunk_size: int = 8, tokens_per_second: float = 0.0) -> FastAPI:
+    app = FastAPI()
+    app.state.latency_ms = latency_ms
+    app.state.chunk_delay_ms = chunk_delay_for(chunk_size, chunk_delay_ms, tokens_per_second)
+    app.state.chunk_size = chunk_size
+    app.state.requests = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        if app.state.latency_ms:
+            await asyncio.sleep(app.state.latency_ms / 1000)
+
+        messages = body.get("messages", [])
+        content = canned_reply(messages)
+        usage = usage_for(messages, content)
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage")
+            return StreamingResponse(
+                stream_chunks(content, body.get("model", "mock"), app.state.chunk_size, app.state.chunk_delay_ms,
+                              usage if include_usage else None),
+                media_type="text/event-stream"
+            )
+
+        if app.state.chunk_delay_ms:
+            chunks = -(-len(content) // app.state.chunk_size)
+            await asyncio.sleep(chunks * app.state.chunk_delay_ms / 1000)
+
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        }
+
+    return app
+
+
+class MockOpenAIServer:
+    """在后台线程里运行模拟服务，可作为上下文管理器使用"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 9999,
+        latency_ms: float = 0.0,
+        chunk_delay_ms: float = 0.0,
+        chunk_size: int = 8,
+        tokens_per_second: float = 0.0
+    ):
+        self.app = create_app(latency_ms, chunk_delay_ms, chunk_size, tokens_per_second)
+        self.base_url = f"http://{host}:{port}/v1"
+        config = uvicorn.Config(self.app, host=host, port=port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> "MockOpenAIServer":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+    @property
+    def request_count(self) -> int:
+        return self.app.state.requests
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI 兼容的本地模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9999)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--chunk-delay-ms", type=float, default=0.0)
+    parser.add_argument("--chunk-size", type=int, default=8)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="生成速度，设置后覆盖 --chunk-delay-ms")
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(args.latency_ms, args.chunk_delay_ms, args.chunk_size, args.tokens_per_second),
+        host=args.host, port=args.port, log_level="warning"
+    )
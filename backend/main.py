@@ -1,18 +1,28 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
-from langchain.memory import ConversationBufferMemory
-from langchain.agents import initialize_agent, Tool
-from services.tools import get_weather
-from services.rag_builder import query_vectorstore
-from services.english_checker import english_checker, WordCheckRequest, WordCheckResponse, SentenceCheckRequest, SentenceCheckResponse
+from services.agent_factory import AgentFactory, build_llm
+from services.session_memory import SessionMemoryStore, history_window
+from services.answer_cache import answer_cache
+from services.vectorstore_registry import registry
+from services.retrieval import retrieval_service, SearchRequest, SearchResult, SEARCH_MAX_K, SEARCH_MAX_QUERIES
+from services import concurrency
+from services.tools import weather_service
+from services.grammar_triage import grammar_triage
+from services.spell_checker import spell_checker
+from services import metrics, profiling
+from services.sentence_segmenter import IncrementalSegmenter
+from services.check_scheduler import CheckScheduler
+from services.english_checker import english_checker, CHECK_MAX_SENTENCES, WordCheckRequest, WordCheckResponse, SentenceCheckRequest, SentenceCheckResponse, SentenceBatchCheckRequest
 import os
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+import asyncio
+import functools
 import json
-import re
-from typing import Dict, List
+import time
+import uuid
+from typing import Dict, List, Optional
 
 load_dotenv()
 
@@ -34,74 +44,124 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """按路由模板记录请求耗时，未匹配的路径归为一类，避免标签数量无限增长"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_SECONDS.labels(
+            request.method, route.path if route is not None else "unmatched", str(status)
+        ).observe(time.perf_counter() - start)
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """按需性能分析：PROFILING_ENABLED 时带 X-Profile: 1 或 ?profile=1 的请求会记录区间和采样栈
+
+    结果保存在 PROFILE_DIR，响应头 X-Profile-Id 给出编号，可通过 /api/profiles/{id} 获取。
+    """
+    if not profiling.requested(request.headers, request.query_params):
+        return await call_next(request)
+    with profiling.Profile(sample=True) as profile:
+        response = await call_next(request)
+    await concurrency.run_blocking(profile.save)
+    response.headers["X-Profile-Id"] = profile.id
+    return response
+
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    """后台采样事件循环延迟"""
+    if metrics.METRICS_LOOP_LAG_INTERVAL > 0:
+        app.state.loop_lag_monitor = asyncio.create_task(metrics.monitor_event_loop_lag())
+
+@app.on_event("startup")
+async def load_local_checkers():
+    """在后台构建本地拼写索引并加载语法初筛模型，加载完成前单词和句子检查全部交给 LLM"""
+    app.state.local_checker_loader = asyncio.create_task(concurrency.run_blocking(grammar_triage.load))
+
+@app.on_event("startup")
+def warmup_vectorstores():
+    """启动时预加载 embedding 模型和向量库，避免首个请求承担加载开销"""
+    if os.getenv("VECTORSTORE_WARMUP", "true").lower() != "true":
+        return
+    try:
+        retrieval_service.warmup()
+    except Exception as e:
+        # 预加载失败不影响启动，首次查询时会再尝试加载
+        print(f"Vector store warmup failed: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_clients():
+    """关闭共享的线程池和 HTTP 连接池"""
+    monitor = getattr(app.state, "loop_lag_monitor", None)
+    if monitor is not None:
+        monitor.cancel()
+    concurrency.shutdown()
+    await english_checker.aclose()
+    await weather_service.aclose()
+
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY") or os.getenv("OPENAI_API_KEY")
 DEEPSEEK_API_BASE = os.getenv("DEEPSEEK_API_BASE", "https://api.openai.com/v1")
 
-# 初始化记忆
-memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
-
 # 请求体
 class Query(BaseModel):
     question: str
+    session_id: Optional[str] = None
 
-# 工具列表
-tools = [
-    Tool(
-        name="Weather",
-        func=get_weather,
-        description="获取指定城市的实时天气信息，输入城市名即可，比如：北京、上海"
-    ),
-    Tool(
-        name="PhysicsQA",
-        func=query_vectorstore,
-        description="用于查询和物理学相关的专有名词，例如LHC、BESIII、LHAASO等。当用户的问题包含这些词语时，优先使用此工具。"
-    )
-]
+# Agent 在启动时构建一次，所有请求共享 LLM 客户端和执行器
+agent_factory = AgentFactory(build_llm(DEEPSEEK_API_KEY, DEEPSEEK_API_BASE))
+
+# 按会话保存记忆，超出 token 预算后滚动摘要，空闲会话自动淘汰
+session_memories = SessionMemoryStore(agent_factory.llm)
 
 @app.post("/ask")
-async def ask(query: Query):
-    llm = ChatOpenAI(
-        openai_api_key=DEEPSEEK_API_KEY,
-        openai_api_base=DEEPSEEK_API_BASE,
-        model_name="gpt-4o-mini",
-        temperature=0.7
-    )
-    
-    system_template = """你是一个聪明又幽默的 AI 助手。
-    - 如果用户聊天，就幽默机智地回复。
-    - 如果用户提到天气，你可以调用 Weather 工具。
-    - 如果用户的问题涉及物理学，特别是关于LHC、BESIII、LHAASO等实验或概念，请务必优先使用 PhysicsQA 工具来获取最准确的定义和信息。
-    - 保持对话上下文，记住用户说过的内容。
-    聊天记录：
-    {chat_history}
-    """
-    prompt = PromptTemplate(
-        template=system_template + "用户的问题：{input}",
-        input_variables=["chat_history", "input"]
-    )
-
-    # 初始化 Agent
-    agent = initialize_agent(
-        tools=tools,
-        llm=llm,
-        agent="conversational-react-description",
-        memory=memory,
-        verbose=True,
-        return_intermediate_steps=True,
-        handle_parsing_errors=True
-    )
-
-    # 执行
-    result = agent(query.question)
+async def ask(query: Query, response: Response):
+    session_id = query.session_id or uuid.uuid4().hex
+    memory = session_memories.get(session_id)
+    had_history = bool(memory.chat_memory.messages or memory.moving_summary_buffer)
+
+    # 语义相近的问题已经回答过时直接返回，省去整个 Agent 循环；已有历史的会话不使用缓存
+    # 向量模型不可用时跳过缓存，照常交给 Agent
+    try:
+        hit = await concurrency.run_blocking(answer_cache.lookup, query.question, had_history)
+    except Exception as e:
+        print(f"Warning: answer cache lookup failed, falling back to agent: {e}")
+        hit = None
+    if hit is not None:
+        await memory.asave_context({"input": query.question}, {"output": hit["answer"]})
+        response.headers["X-Cache"] = "HIT"
+        decision_log = {
+            **hit["decision_log"],
+            "question": query.question,
+            "cache": {"cached_question": hit["decision_log"]["question"], "similarity": hit["similarity"]}
+        }
+        return {
+            "answer": hit["answer"],
+            "session_id": session_id,
+            "decision_log": decision_log,
+            "history": history_window(memory),
+            "cached": True
+        }
+
+    # 执行；回调记录每次 LLM 和工具调用的耗时，开启性能分析时记入本次请求的 Profile
+    profile = profiling.current() or profiling.Profile()
+    result = await agent_factory.arun(query.question, memory, callbacks=[profile.callback])
 
     # 整理工具调用日志
     steps_log = []
-    for step in result["intermediate_steps"]:
+    step_timings = profile.step_timings()
+    for i, step in enumerate(result["intermediate_steps"]):
         action, observation = step
         steps_log.append({
             "tool": action.tool,
             "tool_input": str(action.tool_input),
-            "observation": str(observation)
+            "observation": str(observation),
+            **(step_timings[i] if i < len(step_timings) else {})
         })
 
     # 构造决策树风格的可视化日志
@@ -110,17 +170,46 @@ async def ask(query: Query):
         "decision": "调用工具" if steps_log else "直接回答",
         "tool_used": steps_log[0]["tool"] if steps_log else None,
         "steps": steps_log,
-        "final_answer": result["output"]
+        "final_answer": result["output"],
+        "timing": profile.timing_summary(len(steps_log))
     }
 
-    return {
+    if answer_cache.cacheable(steps_log, had_history):
+        try:
+            await concurrency.run_blocking(answer_cache.store, query.question, result["output"], decision_log)
+        except Exception as e:
+            print(f"Warning: answer cache store failed: {e}")
+    else:
+        answer_cache.record_skip()
+    response.headers["X-Cache"] = "MISS"
+
+    body = {
         "answer": result["output"],
+        "session_id": session_id,
         "decision_log": decision_log,
-        "history": [
-            {"role": msg.type, "content": msg.content}
-            for msg in memory.chat_memory.messages
-        ]
+        "history": history_window(memory),
+        "cached": False
     }
+    if profiling.current() is not None:
+        body["profile"] = {"id": profile.id, "spans": profile.tree()}
+    return body
+
+@app.post("/api/search", response_model=List[SearchResult])
+async def search(request: SearchRequest):
+    """批量检索：所有查询一次计算向量，在多个索引上并行检索，返回每个查询的 top-k"""
+    if not request.queries or len(request.queries) > SEARCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"queries must contain 1-{SEARCH_MAX_QUERIES} items")
+    if not 1 <= request.k <= SEARCH_MAX_K:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {SEARCH_MAX_K}")
+    try:
+        return await retrieval_service.search(request.queries, request.indexes, request.k)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+@app.get("/api/indexes")
+async def list_indexes():
+    """可检索的索引名称"""
+    return {"indexes": retrieval_service.names}
 
 # 英语检查相关API端点
 
@@ -134,57 +223,223 @@ async def check_sentence(request: SentenceCheckRequest):
     """检查句子完整性和语法"""
     return await english_checker.check_sentence(request)
 
+@app.post("/api/check-sentences", response_model=List[SentenceCheckResponse])
+async def check_sentences(request: SentenceBatchCheckRequest):
+    """批量检查多个句子，结果顺序与输入一致"""
+    if not request.sentences or len(request.sentences) > CHECK_MAX_SENTENCES:
+        raise HTTPException(status_code=400, detail=f"sentences must contain 1-{CHECK_MAX_SENTENCES} items")
+    return await english_checker.check_sentences_batch(request.sentences, request.full_text)
+
 @app.post("/api/improve-text")
 async def improve_text(request: Query):
     """获取文本改进建议"""
     result = await english_checker.get_improvement_suggestions(request.question)
     return result
 
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """英语检查结果缓存的命中统计"""
+    # SQLite 后端统计条目数需要查询数据库
+    return await concurrency.run_blocking(english_checker.cache.stats)
+
+@app.get("/api/spell/stats")
+async def spell_stats():
+    """单词检查在本地判定和交给 LLM 的次数"""
+    return spell_checker.stats()
+
+@app.get("/api/grammar/stats")
+async def grammar_stats():
+    """句子检查在本地判定为没有问题和交给 LLM 的次数"""
+    return grammar_triage.stats()
+
+@app.get("/api/retrieval/cache/stats")
+async def retrieval_cache_stats():
+    """查询向量和检索结果缓存的命中统计"""
+    return registry.cache_stats()
+
+@app.get("/api/ask/cache/stats")
+async def ask_cache_stats():
+    """/ask 语义缓存的命中统计"""
+    return answer_cache.stats()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus 格式的指标"""
+    # 抓取时会读取各缓存的 stats()，其中 SQLite 缓存需要查询数据库
+    body, content_type = await concurrency.run_blocking(metrics.render_metrics)
+    return Response(content=body, media_type=content_type)
+
+@app.get("/api/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = "json"):
+    """读取保存的性能分析结果：json 为区间树，folded 为 collapsed stack（可直接生成火焰图）"""
+    if not profiling.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not profile_id.isalnum() or format not in ("json", "folded"):
+        raise HTTPException(status_code=400, detail="Invalid profile id or format")
+    path = os.path.join(profiling.PROFILE_DIR, f"{profile_id}.{format}")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Profile not found: {profile_id}")
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+    if format == "folded":
+        return PlainTextResponse(content)
+    return json.loads(content)
+
 @app.get("/api/health")
 async def health_check():
     """健康检查端点"""
     return {"status": "healthy", "service": "english-checker"}
 
 # WebSocket连接管理
+# 是否默认以 feedback_partial 消息流式推送句子检查结果
+WS_STREAM_FEEDBACK = os.getenv("WS_STREAM_FEEDBACK", "false").lower() == "true"
+
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
         self.user_contexts: Dict[str, Dict] = {}
+        # 后台检查任务和接收循环会同时发送消息，按连接加锁保证帧不交错
+        self.send_locks: Dict[str, asyncio.Lock] = {}
 
     async def connect(self, websocket: WebSocket, client_id: str):
         await websocket.accept()
         self.active_connections[client_id] = websocket
+        self.send_locks[client_id] = asyncio.Lock()
         self.user_contexts[client_id] = {
             "current_text": "",
             "last_sentence": "",
-            "session_started": False
+            "session_started": False,
+            "stream_feedback": WS_STREAM_FEEDBACK,
+            "segmenter": IncrementalSegmenter(),
+            "scheduler": CheckScheduler()
         }
 
     def disconnect(self, client_id: str):
         if client_id in self.active_connections:
             del self.active_connections[client_id]
         if client_id in self.user_contexts:
+            self.user_contexts[client_id]["scheduler"].cancel_all()
             del self.user_contexts[client_id]
+        self.send_locks.pop(client_id, None)
 
     async def send_message(self, message: dict, client_id: str):
-        if client_id in self.active_connections:
-            await self.active_connections[client_id].send_text(json.dumps(message))
+        websocket = self.active_connections.get(client_id)
+        lock = self.send_locks.get(client_id)
+        if websocket is not None and lock is not None:
+            async with lock:
+                await websocket.send_text(json.dumps(message))
 
 manager = ConnectionManager()
 
-def detect_sentence_end(text: str) -> List[str]:
-    """检测文本中完整的句子"""
-    # 简单的句子分割，基于标点符号
-    sentences = re.split(r'([.!?。！？]+)', text)
-    complete_sentences = []
-    
-    for i in range(0, len(sentences) - 1, 2):
-        if i + 1 < len(sentences):
-            sentence = (sentences[i] + sentences[i + 1]).strip()
-            if sentence:
-                complete_sentences.append(sentence)
-    
-    return complete_sentences
+# 指标在抓取时读取当前状态
+metrics.WS_CONNECTIONS.set_function(lambda: len(manager.active_connections))
+metrics.WS_CHECKS_IN_FLIGHT.set_function(
+    lambda: sum(context["scheduler"].in_flight for context in list(manager.user_contexts.values()))
+)
+metrics.cache_collector.register("english_checker", english_checker.cache.stats)
+metrics.cache_collector.register("query_embeddings", registry.embedding_cache.stats)
+metrics.cache_collector.register("search_results", registry.result_cache.stats)
+metrics.cache_collector.register("ask_answers", answer_cache.stats)
+metrics.cache_collector.register("weather", weather_service.stats)
+
+def feedback_message(sentence: str, index: int, sentence_check: SentenceCheckResponse) -> dict:
+    """句子检查结果的 WebSocket 消息"""
+    return {
+        "type": "feedback",
+        "sentence": sentence,
+        "sentence_index": index,
+        "is_complete": sentence_check.is_complete,
+        "issues": sentence_check.issues,
+        "suggestions": sentence_check.suggestions,
+        "score": sentence_check.overall_score,
+        "explanation": sentence_check.explanation,
+        "polished_sentence": sentence_check.polished_sentence,
+        "polished_explanation": sentence_check.polished_explanation
+    }
+
+def is_current(client_id: str, index: int, sentence: str) -> bool:
+    """句子仍是客户端当前文本中第 index 句；检查期间被修改或连接已断开时结果已过期"""
+    context = manager.user_contexts.get(client_id)
+    return context is not None and context["segmenter"].sentence_at(index) == sentence
+
+async def check_sentence_and_send(client_id: str, sentence: str, full_text: str, index: int):
+    """检查一个句子并把结果推送给客户端"""
+    # 发送正在分析的状态
+    await manager.send_message({
+        "type": "analyzing",
+        "sentence": sentence,
+        "sentence_index": index
+    }, client_id)
+
+    async def send_partial(fields: Dict[str, str]):
+        if not is_current(client_id, index, sentence):
+            return
+        await manager.send_message({
+            "type": "feedback_partial",
+            "sentence": sentence,
+            "sentence_index": index,
+            **fields
+        }, client_id)
+
+    # 调用英语检查器，流式模式下边生成边推送 feedback_partial
+    context = manager.user_contexts.get(client_id, {})
+    try:
+        sentence_check = await english_checker.check_sentence(
+            SentenceCheckRequest(
+                sentence=sentence,
+                full_text=full_text
+            ),
+            on_partial=send_partial if context.get("stream_feedback") else None
+        )
+
+        # 检查期间句子又被修改时，结果已过期，交给新的检查处理
+        if not is_current(client_id, index, sentence):
+            return
+        await manager.send_message(feedback_message(sentence, index, sentence_check), client_id)
+
+    except Exception as e:
+        await manager.send_message({
+            "type": "error",
+            "message": f"检查时出错: {str(e)}"
+        }, client_id)
+
+async def check_sentences_and_send(client_id: str, items: List[Dict], full_text: str):
+    """粘贴或重连时一次出现多个句子，合并成批量检查后逐句推送结果"""
+    for item in items:
+        await manager.send_message({
+            "type": "analyzing",
+            "sentence": item["text"],
+            "sentence_index": item["index"]
+        }, client_id)
+
+    try:
+        results = await english_checker.check_sentences_batch([item["text"] for item in items], full_text)
+    except Exception as e:
+        await manager.send_message({
+            "type": "error",
+            "message": f"检查时出错: {str(e)}"
+        }, client_id)
+        return
+
+    for item, sentence_check in zip(items, results):
+        # 检查期间句子又被修改时，结果已过期，交给新的检查处理
+        if not is_current(client_id, item["index"], item["text"]):
+            continue
+        await manager.send_message(feedback_message(item["text"], item["index"], sentence_check), client_id)
+
+async def send_improvement(client_id: str, text: str):
+    """获取全文改进建议并推送给客户端"""
+    try:
+        improvement = await english_checker.get_improvement_suggestions(text)
+        await manager.send_message({
+            "type": "improvement",
+            "data": improvement
+        }, client_id)
+    except Exception as e:
+        await manager.send_message({
+            "type": "error",
+            "message": f"获取改进建议时出错: {str(e)}"
+        }, client_id)
 
 @app.websocket("/ws/writing-assistant/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
@@ -207,76 +462,75 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
             context = manager.user_contexts[client_id]
             
             if msg_type == "start_session":
-                # 开始写作会话
+                # 开始写作会话，客户端可以通过 stream 字段开启或关闭流式反馈
                 context["session_started"] = True
+                context["stream_feedback"] = bool(message.get("stream", context["stream_feedback"]))
                 await manager.send_message({
                     "type": "session_started",
                     "message": "🖊️ 开始写日记吧！我会在每句话结束后给你反馈。"
                 }, client_id)
             
-            elif msg_type == "text_update":
-                # 文本更新
-                current_text = message.get("text", "")
-                context["current_text"] = current_text
-                
-                # 检测完整的句子
-                sentences = detect_sentence_end(current_text)
-                
-                if sentences:
-                    last_sentence = sentences[-1]
-                    
-                    # 如果是新句子，进行检查
-                    if last_sentence != context["last_sentence"]:
-                        context["last_sentence"] = last_sentence
-                        
-                        # 发送正在分析的状态
-                        await manager.send_message({
-                            "type": "analyzing",
-                            "sentence": last_sentence
-                        }, client_id)
-                        
-                        # 调用英语检查器
-                        try:
-                            sentence_check = await english_checker.check_sentence(
-                                SentenceCheckRequest(
-                                    sentence=last_sentence,
-                                    full_text=current_text
-                                )
-                            )
-                            
-                            # 发送检查结果
-                            await manager.send_message({
-                                "type": "feedback",
-                                "sentence": last_sentence,
-                                "is_complete": sentence_check.is_complete,
-                                "issues": sentence_check.issues,
-                                "suggestions": sentence_check.suggestions,
-                                "score": sentence_check.overall_score,
-                                "explanation": sentence_check.explanation,
-                                "polished_sentence": sentence_check.polished_sentence,
-                                "polished_explanation": sentence_check.polished_explanation
-                            }, client_id)
-                            
-                        except Exception as e:
-                            await manager.send_message({
-                                "type": "error",
-                                "message": f"检查时出错: {str(e)}"
-                            }, client_id)
-            
-            elif msg_type == "request_improvement":
-                # 请求全文改进建议
-                text = message.get("text", "")
+            elif msg_type in ("text_update", "text_patch"):
+                # 文本更新：text_update 携带全文，text_patch 只携带修改的区间
+                segmenter: IncrementalSegmenter = context["segmenter"]
                 try:
-                    improvement = await english_checker.get_improvement_suggestions(text)
+                    if msg_type == "text_update":
+                        diff = segmenter.set_text(message.get("text", ""))
+                    else:
+                        diff = segmenter.apply_patch(message["start"], message["end"], message.get("text", ""))
+                except (KeyError, TypeError, ValueError) as e:
+                    # 补丁与服务端文本不一致，让客户端重新发送全文
                     await manager.send_message({
-                        "type": "improvement",
-                        "data": improvement
+                        "type": "error",
+                        "message": f"无效的文本补丁，请发送完整文本: {str(e)}"
                     }, client_id)
-                except Exception as e:
+                    continue
+
+                current_text = segmenter.text
+                context["current_text"] = current_text
+                # 只取最后一个句子，避免每次按键都重建全部句子
+                context["last_sentence"] = segmenter.sentence_at(segmenter.count - 1) or ""
+
+                scheduler: CheckScheduler = context["scheduler"]
+                # 取消涉及被修改或删除句子的检查，包括覆盖这些句子的批量检查，避免过期的 LLM 调用继续执行
+                items = diff["new"] + diff["changed"]
+                pending = scheduler.cancel_sentences(
+                    [item["index"] for item in diff["removed"]] + [item["index"] for item in items]
+                )
+                if diff["removed"]:
                     await manager.send_message({
-                        "type": "error",
-                        "message": f"获取改进建议时出错: {str(e)}"
+                        "type": "sentences_removed",
+                        "sentences": diff["removed"]
                     }, client_id)
+
+                # 被取消的批量检查中没有修改的句子重新提交
+                for index in pending:
+                    text = segmenter.sentence_at(index)
+                    if text is not None:
+                        items.append({"index": index, "text": text})
+
+                # 只检查新增或被修改的句子；在后台防抖执行，同一位置的旧检查会被取消
+                items = sorted(items, key=lambda x: x["index"])
+                if len(items) == 1:
+                    item = items[0]
+                    scheduler.schedule(
+                        ("sentence", item["index"]),
+                        functools.partial(check_sentence_and_send, client_id, item["text"], current_text, item["index"])
+                    )
+                elif items:
+                    # 一次出现多个句子（粘贴、重连）时合并为一次批量检查
+                    scheduler.schedule(
+                        ("batch", tuple(item["index"] for item in items)),
+                        functools.partial(check_sentences_and_send, client_id, items, current_text)
+                    )
+            
+            elif msg_type == "request_improvement":
+                # 请求全文改进建议，后台执行，新的请求会取代未完成的旧请求
+                context["scheduler"].schedule(
+                    "improvement",
+                    functools.partial(send_improvement, client_id, message.get("text", "")),
+                    delay=0
+                )
             
             elif msg_type == "ping":
                 # 心跳检测
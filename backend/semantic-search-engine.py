@@ -1,36 +1,245 @@
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_huggingface import HuggingFaceEmbeddings
-from dotenv import load_dotenv
-import getpass
+"""把一个或多个 PDF（或包含 PDF 的目录）流式写入持久化的向量库
+
+逐页读取 -> 逐页切片（保留 start_index）-> 分批计算向量 -> 切片和向量追加写入磁盘，
+处理过程中内存里只有正在处理的几批切片；最后从磁盘上的向量构建 FAISS 索引，
+索引（切片数 × 384 维 × 4 字节）是唯一随 PDF 大小增长的内存占用。
+已入库且未修改的 PDF 会被跳过；修改过的 PDF 会先丢弃旧切片再重新入库，已删除的 PDF 的切片会被移除。
+manifest 以 PDF 的真实路径（os.path.realpath）为键，./a.pdf 和 a.pdf 是同一个文件。
+
+用法（在 backend 目录下）：
+    python semantic-search-engine.py example_data --index vectorstore/pdf \
+        --query "How many distribution centers does Nike have in the US?"
+"""
+import argparse
+import glob
+import json
 import os
+import shutil
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List
+
+import faiss
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.vectorstores import InMemoryVectorStore
+from services.ann_index import build_index, reconstruct_all
+from services.chunk_store import FAISS_FILE, ChunkStoreWriter
+from services.embedding_pipeline import EMBED_BATCH_SIZE, EMBED_WORKERS, EmbeddingPool, peak_rss_mb
+from services.index_storage import new_version_dir, publish_version, resolve_index_dir
+from services.vectorstore_registry import registry
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_INDEX_PATH = "vectorstore/pdf"
+MANIFEST_FILE = "manifest.json"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+
+class StageTimer:
+  """累计每个阶段的耗时；各阶段交替执行，所以分别计时再汇总"""
+
+  def __init__(self):
+    self.seconds: Dict[str, float] = defaultdict(float)
+
+  @contextmanager
+  def stage(self, name: str):
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.seconds[name] += time.perf_counter() - start
+
+
+def find_pdfs(paths: List[str]) -> List[str]:
+  """展开目录，同一个文件以不同路径出现多次时只保留第一次"""
+  pdfs = []
+  seen = set()
+  for path in paths:
+    found = sorted(glob.glob(os.path.join(path, "**", "*.pdf"), recursive=True)) if os.path.isdir(path) else [path]
+    for pdf in found:
+      if os.path.realpath(pdf) not in seen:
+        seen.add(os.path.realpath(pdf))
+        pdfs.append(pdf)
+  return pdfs
+
+
+def iter_pages(pdfs: List[str], timer: StageTimer) -> Iterator[Document]:
+  """逐页读取 PDF，不一次性加载整个文件"""
+  for pdf in pdfs:
+    pages = PyPDFLoader(pdf).lazy_load()
+    while True:
+      with timer.stage("load"):
+        page = next(pages, None)
+      if page is None:
+        break
+      yield page
+
+
+def iter_chunks(pages: Iterable[Document], timer: StageTimer) -> Iterator[Document]:
+  """逐页切片；start_index 是切片在所在页中的字符偏移"""
+  splitter = RecursiveCharacterTextSplitter(
+      chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, add_start_index=True
+  )
+  for page in pages:
+    with timer.stage("split"):
+      chunks = splitter.split_documents([page])
+    yield from chunks
+
+
+def iter_batches(chunks: Iterable[Document], batch_size: int) -> Iterator[List[Document]]:
+  batch = []
+  for chunk in chunks:
+    batch.append(chunk)
+    if len(batch) >= batch_size:
+      yield batch
+      batch = []
+  if batch:
+    yield batch
+
+
+def source_fingerprint(pdf: str) -> dict:
+  stat = os.stat(pdf)
+  return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def load_manifest(index_dir: str, params: dict) -> dict:
+  """读取上一版本的 manifest；embedding 或切片参数不同时返回空的 manifest
+
+  旧版本以命令行中的原始路径为键，读取时统一换成真实路径，原始路径保存在 source 字段，
+  它与切片 metadata 中的 source 一致，丢弃旧切片时按它匹配。
+  """
+  manifest = {"params": params, "sources": {}}
+  try:
+    with open(os.path.join(index_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+      previous = json.load(f)
+  except FileNotFoundError:
+    return manifest
+  previous_params = previous.get("params", {})
+  if {key: previous_params.get(key) for key in params} != params:
+    return manifest
+  # ann_index 转换过的索引类型保留下来
+  manifest["params"] = {**previous_params, **params}
+  for key, entry in previous.get("sources", {}).items():
+    manifest["sources"][os.path.realpath(key)] = {"source": key, **entry}
+  return manifest
+
+
+def ingest(pdfs: List[str], index_path: str, batch_size: int, workers: int, full: bool = False) -> int:
+  """把 PDF 追加到 index_path 的向量库，返回新增切片数"""
+  timer = StageTimer()
+  start = time.perf_counter()
+
+  previous_dir = resolve_index_dir(index_path)
+  params = {"embedding_model": MODEL_NAME, "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+  manifest = {"params": params, "sources": {}} if full else load_manifest(previous_dir, params)
+  base_dir = previous_dir if manifest["sources"] else None
+
+  # 源文件已经不存在的 PDF：移除 manifest 中的记录和它们的切片
+  drop_sources = []
+  for key in [key for key in manifest["sources"] if not os.path.exists(key)]:
+    entry = manifest["sources"].pop(key)
+    print(f"{entry['source']} no longer exists; removing its {entry.get('chunks', 0)} chunks")
+    drop_sources.append(entry["source"])
+  removed_pdfs = len(drop_sources)
+
+  todo = []
+  for pdf in pdfs:
+    known = manifest["sources"].get(os.path.realpath(pdf))
+    fingerprint = source_fingerprint(pdf)
+    if known and {k: known.get(k) for k in fingerprint} == fingerprint:
+      print(f"Skip unchanged {pdf}")
+      continue
+    if known:
+      print(f"{pdf} changed since it was ingested; replacing its {known.get('chunks', 0)} old chunks")
+      drop_sources.append(known["source"])
+    todo.append(pdf)
+  if not todo and not removed_pdfs:
+    print(f"Nothing to ingest into {index_path}")
+    return 0
+
+  staging = new_version_dir(index_path)
+  published = False
+  try:
+    writer = ChunkStoreWriter(staging, base_dir=base_dir, drop_sources=drop_sources)
+    existing = len(writer)
+    # 进程池持有模型，输入是生成器，整个过程只保留在途的几批切片
+    chunk_counts: Dict[str, int] = defaultdict(int)
+    batches = iter_batches(iter_chunks(iter_pages(todo, timer), timer), batch_size)
+    pending: List[List[Document]] = []
 
-load_dotenv()
+    def texts_of(batches_iter):
+      for batch in batches_iter:
+        pending.append(batch)
+        yield [doc.page_content for doc in batch]
 
-if not os.environ.get("DEEPSEEK_API_KEY"):
-  os.environ["DEEPSEEK_API_KEY"] = getpass.getpass("Enter API key for DeepSeek: ")
+    with EmbeddingPool(MODEL_NAME, batch_size, workers) as pool:
+      vectors_iter = pool.map(texts_of(batches))
+      while True:
+        # 等待向量期间生成器会继续读页、切片，这部分时间已计入 load/split，需要扣除
+        overlap = timer.seconds["load"] + timer.seconds["split"]
+        wait_start = time.perf_counter()
+        vectors = next(vectors_iter, None)
+        overlap = timer.seconds["load"] + timer.seconds["split"] - overlap
+        timer.seconds["embed"] += time.perf_counter() - wait_start - overlap
+        if vectors is None:
+          break
+        batch = pending.pop(0)
+        with timer.stage("index"):
+          writer.add(batch, vectors)
+        for doc in batch:
+          chunk_counts[doc.metadata.get("source", "")] += 1
 
-file_path = "./example_data/nke-10k-2023.pdf"
-loader = PyPDFLoader(file_path)
+    with timer.stage("index"):
+      writer.close()
+      index_type = manifest["params"].get("index_type", "flat")
+      if index_type != "flat":
+        index_file = os.path.join(staging, FAISS_FILE)
+        index = build_index(reconstruct_all(faiss.read_index(index_file)), index_type, **manifest["params"].get("index_params", {}))
+        faiss.write_index(index, index_file)
+      for pdf in todo:
+        manifest["sources"][os.path.realpath(pdf)] = {"source": pdf, **source_fingerprint(pdf), "chunks": chunk_counts[pdf]}
+      with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+      publish_version(index_path, staging)
+      published = True
+  finally:
+    # 中途失败时删除写了一半的暂存目录
+    if not published:
+      shutil.rmtree(staging, ignore_errors=True)
 
-docs = loader.load()
+  added = len(writer) - existing
+  elapsed = time.perf_counter() - start
+  # embed 是主进程等待向量的时间；进程池并行时计算向量与 load/split 重叠
+  stages = "  ".join(f"{name}={timer.seconds[name]:.2f}s" for name in ("load", "split", "embed", "index"))
+  peak = peak_rss_mb()
+  dropped = f", -{writer.dropped} stale" if writer.dropped else ""
+  print(f"Ingested {len(todo)} PDF(s) into {index_path}: +{added} chunks{dropped} ({len(writer)} total) in {elapsed:.2f}s")
+  print(f"  {stages}  {added / elapsed:.1f} chunks/s  peak RSS={f'{peak:.0f}MB' if peak is not None else 'n/a'}")
+  return added
 
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
 
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000, chunk_overlap=200, add_start_index=True
-)
-all_splits = text_splitter.split_documents(docs)
-vector_1 = embeddings.embed_query(all_splits[0].page_content)
-vector_2 = embeddings.embed_query(all_splits[1].page_content)
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("paths", nargs="*", default=["example_data"], help="PDF 文件或目录")
+  parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="向量库目录")
+  parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+  parser.add_argument("--workers", type=int, default=EMBED_WORKERS)
+  parser.add_argument("--full", action="store_true", help="丢弃已有索引，全部重新入库")
+  parser.add_argument("--query", help="入库后执行一次检索")
+  args = parser.parse_args()
 
-vector_store = InMemoryVectorStore(embeddings)
-ids = vector_store.add_documents(documents=all_splits)
+  pdfs = find_pdfs(args.paths)
+  if not pdfs:
+    raise SystemExit(f"No PDF found in {args.paths}")
+  ingest(pdfs, args.index, args.batch_size, args.workers, full=args.full)
 
+  if args.query:
+    results = registry.get_vectorstore(args.index, MODEL_NAME).similarity_search(args.query)
+    print(results[0] if results else "No relevant document found.")
 
-results = vector_store.similarity_search(
-    "How many distribution centers does Nike have in the US?"
-)
 
-print(results[0])
+# 进程池使用 spawn 启动子进程，入口代码必须放在 main 保护之下
+if __name__ == "__main__":
+  main()
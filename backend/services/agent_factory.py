@@ -0,0 +1,74 @@
+from typing import Any, Dict, List, Optional
+
+from langchain.agents import AgentExecutor, Tool, initialize_agent
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.memory import BaseMemory
+from langchain_openai import ChatOpenAI
+
+from services.metrics import metrics_callback
+from services.rag_builder import aquery_vectorstore, query_vectorstore
+from services.tools import aget_weather, get_weather
+
+
+def build_llm(api_key: str, api_base: str, model_name: str = "gpt-4o-mini", temperature: float = 0.7) -> ChatOpenAI:
+    """创建 Agent 使用的 LLM 客户端（内部持有 HTTP 连接池，应全局复用）"""
+    return ChatOpenAI(
+        openai_api_key=api_key,
+        openai_api_base=api_base,
+        model_name=model_name,
+        temperature=temperature
+    )
+
+
+def build_tools() -> List[Tool]:
+    """Agent 可用的工具列表"""
+    return [
+        Tool(
+            name="Weather",
+            func=get_weather,
+            coroutine=aget_weather,
+            description="获取指定城市的实时天气信息，输入城市名即可，比如：北京、上海"
+        ),
+        Tool(
+            name="PhysicsQA",
+            func=query_vectorstore,
+            coroutine=aquery_vectorstore,
+            description="用于查询和物理学相关的专有名词，例如LHC、BESIII、LHAASO等。当用户的问题包含这些词语时，优先使用此工具。"
+        )
+    ]
+
+
+class AgentFactory:
+    """一次性构建 LLM 客户端、工具列表和 Agent 执行器，所有 /ask 请求共享
+
+    执行器本身不绑定记忆，每次调用时由调用方注入对话记忆。
+    callbacks 在每次调用时传入，默认记录 LLM 和工具调用的耗时与 token 数。
+    """
+
+    def __init__(self, llm: BaseLanguageModel, tools: Optional[List[Tool]] = None, callbacks: Optional[List[BaseCallbackHandler]] = None):
+        self.llm = llm
+        self.tools = tools if tools is not None else build_tools()
+        self.callbacks = callbacks if callbacks is not None else [metrics_callback]
+        self.executor: AgentExecutor = initialize_agent(
+            tools=self.tools,
+            llm=self.llm,
+            agent="conversational-react-description",
+            verbose=True,
+            return_intermediate_steps=True,
+            handle_parsing_errors=True
+        )
+
+    def run(self, question: str, memory: BaseMemory, callbacks: Optional[List[BaseCallbackHandler]] = None) -> Dict[str, Any]:
+        """使用注入的记忆执行一次 Agent 调用，并把本轮对话写回记忆；callbacks 只对本次调用生效"""
+        inputs = {"input": question, **memory.load_memory_variables({})}
+        result = self.executor.invoke(inputs, config={"callbacks": self.callbacks + (callbacks or [])})
+        memory.save_context({"input": question}, {"output": result["output"]})
+        return result
+
+    async def arun(self, question: str, memory: BaseMemory, callbacks: Optional[List[BaseCallbackHandler]] = None) -> Dict[str, Any]:
+        """run 的异步版本，LLM 调用和工具都走异步接口，不阻塞事件循环"""
+        inputs = {"input": question, **(await memory.aload_memory_variables({}))}
+        result = await self.executor.ainvoke(inputs, config={"callbacks": self.callbacks + (callbacks or [])})
+        await memory.asave_context({"input": question}, {"output": result["output"]})
+        return result
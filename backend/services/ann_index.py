@@ -0,0 +1,155 @@
+import argparse
+import json
+import os
+import shutil
+
+import faiss
+import numpy as np
+
+from services.index_storage import MANIFEST_FILE, new_version_dir, publish_version, resolve_index_dir
+
+# 支持的索引类型：flat 为精确检索，其余为近似检索
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# 构建参数
+ANN_INDEX_TYPE = os.getenv("ANN_INDEX_TYPE", "flat")
+ANN_NLIST = int(os.getenv("ANN_NLIST", "1024"))
+ANN_PQ_M = int(os.getenv("ANN_PQ_M", "48"))
+ANN_PQ_NBITS = int(os.getenv("ANN_PQ_NBITS", "8"))
+ANN_HNSW_M = int(os.getenv("ANN_HNSW_M", "32"))
+ANN_EF_CONSTRUCTION = int(os.getenv("ANN_EF_CONSTRUCTION", "200"))
+# 查询参数，加载索引时设置
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+ANN_EF_SEARCH = int(os.getenv("ANN_EF_SEARCH", "64"))
+
+# faiss 建议每个聚类中心至少有 39 个训练样本
+MIN_POINTS_PER_CENTROID = 39
+
+
+def build_index(
+    vectors: np.ndarray,
+    index_type: str = ANN_INDEX_TYPE,
+    nlist: int = ANN_NLIST,
+    pq_m: int = ANN_PQ_M,
+    pq_nbits: int = ANN_PQ_NBITS,
+    hnsw_m: int = ANN_HNSW_M,
+    ef_construction: int = ANN_EF_CONSTRUCTION
+) -> faiss.Index:
+    """用给定向量构建（必要时训练）一个 L2 索引
+
+    语料较小时自动缩小 nlist / pq_nbits，保证训练样本足够；
+    样本少到无法训练 IVF 时退回 flat。
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type}, expected one of {INDEX_TYPES}")
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, d = vectors.shape
+    if index_type.startswith("ivf") and n < MIN_POINTS_PER_CENTROID:
+        print(f"Only {n} vectors, too few to train {index_type}; using flat index")
+        index_type = "flat"
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(d)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(d, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+    else:
+        nlist = max(1, min(nlist, n // MIN_POINTS_PER_CENTROID))
+        quantizer = faiss.IndexFlatL2(d)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, d, nlist)
+        else:
+            if d % pq_m != 0:
+                raise ValueError(f"pq_m={pq_m} must divide the vector dimension {d}")
+            pq_nbits = max(1, min(pq_nbits, int(np.log2(max(n, 2)))))
+            index = faiss.IndexIVFPQ(quantizer, d, nlist, pq_m, pq_nbits)
+        index.train(vectors)
+
+    index.add(vectors)
+    configure_search(index)
+    return index
+
+
+def configure_search(index: faiss.Index, nprobe: int = ANN_NPROBE, ef_search: int = ANN_EF_SEARCH):
+    """设置查询时参数：IVF 的 nprobe、HNSW 的 efSearch，flat 索引不受影响"""
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+        return
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return
+    ivf.nprobe = min(nprobe, ivf.nlist)
+
+
+def index_type_of(index: faiss.Index) -> str:
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def reconstruct_all(index: faiss.Index) -> np.ndarray:
+    """按插入顺序取回索引中的全部原始向量
+
+    IVF-PQ 只保存量化后的编码，无法还原原始向量，直接报错。
+    """
+    if index_type_of(index) == "ivf_pq":
+        raise ValueError("IVF-PQ indexes are lossy and cannot be converted; rebuild from source documents")
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype=np.float32)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def convert_vectorstore(path: str, index_type: str, **params) -> str:
+    """把已有向量库的索引换成另一种类型，写入新版本目录并原子切换
+
+    docstore 和 ID 映射保持不变，只替换 index.faiss；manifest 中记录新的索引类型和构建参数，
+    之后的增量构建沿用这个类型。返回新版本目录。
+    """
+    index_dir = resolve_index_dir(path)
+    old_index = faiss.read_index(os.path.join(index_dir, "index.faiss"))
+    new_index = build_index(reconstruct_all(old_index), index_type, **params)
+
+    staging = new_version_dir(path)
+    for name in os.listdir(index_dir):
+        source = os.path.join(index_dir, name)
+        if name not in ("index.faiss", MANIFEST_FILE) and os.path.isfile(source):
+            shutil.copy2(source, os.path.join(staging, name))
+    manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        manifest.setdefault("params", {}).update({"index_type": index_type, "index_params": params})
+        with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+    faiss.write_index(new_index, os.path.join(staging, "index.faiss"))
+    final = publish_version(path, staging)
+    print(f"Converted {path}: {index_type_of(old_index)} -> {index_type} ({new_index.ntotal} vectors)")
+    return final
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="转换已有向量库的 FAISS 索引类型")
+    parser.add_argument("--index", required=True, help="向量库目录，如 vectorstore/physics 或 indexes/toastmasters-faiss")
+    parser.add_argument("--type", required=True, choices=INDEX_TYPES, help="目标索引类型")
+    parser.add_argument("--nlist", type=int, default=ANN_NLIST)
+    parser.add_argument("--pq-m", type=int, default=ANN_PQ_M)
+    parser.add_argument("--pq-nbits", type=int, default=ANN_PQ_NBITS)
+    parser.add_argument("--hnsw-m", type=int, default=ANN_HNSW_M)
+    parser.add_argument("--ef-construction", type=int, default=ANN_EF_CONSTRUCTION)
+    args = parser.parse_args()
+    convert_vectorstore(
+        args.index,
+        args.type,
+        nlist=args.nlist,
+        pq_m=args.pq_m,
+        pq_nbits=args.pq_nbits,
+        hnsw_m=args.hnsw_m,
+        ef_construction=args.ef_construction
+    )
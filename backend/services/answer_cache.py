@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+
+import numpy as np
+
+from services.cache import normalize_text
+from services.rag_builder import PHYSICS_INDEX_PATH
+from services.vectorstore_registry import DEFAULT_EMBEDDING_MODEL, registry
+
+# /ask 语义缓存：问题向量的余弦相似度不低于阈值时直接返回缓存的回答
+ASK_CACHE_ENABLED = os.getenv("ASK_CACHE_ENABLED", "true").lower() == "true"
+ASK_CACHE_THRESHOLD = float(os.getenv("ASK_CACHE_THRESHOLD", "0.95"))
+ASK_CACHE_TTL = float(os.getenv("ASK_CACHE_TTL", "3600"))
+ASK_CACHE_MAX_ENTRIES = int(os.getenv("ASK_CACHE_MAX_ENTRIES", "1000"))
+# 结果随时间变化的工具，用到它们的回答不缓存，逗号分隔
+ASK_CACHE_EXCLUDED_TOOLS = os.getenv("ASK_CACHE_EXCLUDED_TOOLS", "Weather")
+
+
+class SemanticAnswerCache:
+    """按问题语义缓存 /ask 的回答和 decision_log
+
+    - 问题用 rag_builder 同一个 embedding 模型编码（经 registry 缓存），归一化后按余弦相似度匹配
+    - 问题中出现的物理术语必须完全一致，避免 "LHC是什么" 命中 "LHAASO是什么" 这类向量很接近的问题
+    - 条目按 ttl 过期，超过 max_entries 时淘汰最久未命中的
+    - 用到 excluded_tools 的回答不缓存；缓存只按问题文本匹配，已有对话历史的会话既不写入也不读取，
+      否则 "那它的质量呢？" 这类追问的回答会被返回给没有上下文的其他会话
+    """
+
+    def __init__(
+        self,
+        threshold: float = ASK_CACHE_THRESHOLD,
+        ttl: float = ASK_CACHE_TTL,
+        max_entries: int = ASK_CACHE_MAX_ENTRIES,
+        excluded_tools: Iterable[str] = tuple(t.strip() for t in ASK_CACHE_EXCLUDED_TOOLS.split(",") if t.strip()),
+        model_name: str = DEFAULT_EMBEDDING_MODEL,
+        enabled: bool = ASK_CACHE_ENABLED
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.excluded_tools = frozenset(excluded_tools)
+        self.model_name = model_name
+        self.enabled = enabled and max_entries > 0
+        self._lock = threading.Lock()
+        # 槽位 -> 条目，按最近命中排序；向量存在 _vectors 的同一行
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._vectors: Optional[np.ndarray] = None
+        self._free: List[int] = list(range(max_entries - 1, -1, -1))
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(registry.embed_query(question, self.model_name), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def _terms(question: str) -> FrozenSet[str]:
+        term_index = registry.get_term_index(PHYSICS_INDEX_PATH)
+        return frozenset(term_index.match(question)) if term_index is not None else frozenset()
+
+    def cacheable(self, steps: List[Dict[str, Any]], had_history: bool) -> bool:
+        """回答能否缓存
+
+        会话已有历史时问题可能依赖上下文（即使调用了工具，工具输入也可能来自上文），不缓存；
+        用到时效性工具的也不缓存。
+        """
+        if not self.enabled or had_history:
+            return False
+        return not any(step["tool"] in self.excluded_tools for step in steps)
+
+    def lookup(self, question: str, had_history: bool = False) -> Optional[Dict[str, Any]]:
+        """查找语义相近的已缓存问题，返回 {"answer", "decision_log", "similarity"}；未命中返回 None
+
+        已有历史的会话不使用缓存：同样的文字在上下文中可能是另一个问题。
+        """
+        if not self.enabled or had_history:
+            return None
+        question = normalize_text(question)
+        vector = self._embed(question)
+        terms = self._terms(question)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            if self._entries:
+                slots = np.fromiter(self._entries, dtype=np.int64, count=len(self._entries))
+                similarities = self._vectors[slots] @ vector
+                for i in np.argsort(-similarities):
+                    if similarities[i] < self.threshold:
+                        break
+                    slot = int(slots[i])
+                    entry = self._entries[slot]
+                    if entry["terms"] != terms:
+                        continue
+                    self._entries.move_to_end(slot)
+                    self.hits += 1
+                    return {
+                        "answer": entry["answer"],
+                        "decision_log": entry["decision_log"],
+                        "similarity": float(similarities[i])
+                    }
+            self.misses += 1
+            return None
+
+    def store(self, question: str, answer: str, decision_log: Dict[str, Any]):
+        if not self.enabled:
+            return
+        question = normalize_text(question)
+        vector = self._embed(question)
+        entry = {
+            "question": question,
+            "answer": answer,
+            "decision_log": decision_log,
+            "terms": self._terms(question),
+            "expires_at": time.monotonic() + self.ttl if self.ttl else None
+        }
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            # 同一个问题只保留最新的回答
+            for slot, existing in self._entries.items():
+                if existing["question"] == question:
+                    self._release(slot)
+                    break
+            if not self._free:
+                self._release(next(iter(self._entries)))
+            slot = self._free.pop()
+            self._vectors[slot] = vector
+            self._entries[slot] = entry
+
+    def _release(self, slot: int):
+        del self._entries[slot]
+        self._free.append(slot)
+
+    def _evict_expired(self, now: float):
+        expired = [slot for slot, entry in self._entries.items()
+                   if entry["expires_at"] is not None and entry["expires_at"] <= now]
+        for slot in expired:
+            self._release(slot)
+
+    def record_skip(self):
+        """请求的回答不可缓存（用于统计）"""
+        self.skipped += 1
+
+    def clear(self):
+        with self._lock:
+            for slot in list(self._entries):
+                self._release(slot)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "not_cacheable": self.skipped,
+            "size": len(self._entries),
+            "threshold": self.threshold
+        }
+
+
+# 全局实例
+answer_cache = SemanticAnswerCache()
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from services.concurrency import run_blocking
+
+
+def make_cache_key(*parts: Any) -> str:
+    """把若干组成部分哈希成定长的缓存键"""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """合并空白字符，去掉首尾空白"""
+    return " ".join((text or "").split())
+
+
+class BaseCache:
+    """缓存后端接口：值必须可以 JSON 序列化
+
+    异步代码中使用 aget / aset，需要磁盘 IO 的后端会把读写放到线程池中，不阻塞事件循环。
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    async def aget(self, key: str) -> Optional[Any]:
+        return self.get(key)
+
+    async def aset(self, key: str, value: Any):
+        self.set(key, value)
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def _record(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "size": len(self)
+        }
+
+
+class NullCache(BaseCache):
+    """不缓存任何内容，用于关闭缓存"""
+
+    def get(self, key: str) -> Optional[Any]:
+        self._record(False)
+        return None
+
+    def set(self, key: str, value: Any):
+        pass
+
+    def clear(self):
+        pass
+
+    def __len__(self) -> int:
+        return 0
+
+
+class LRUCache(BaseCache):
+    """内存 LRU 缓存，支持按条目过期（ttl 为 None 表示不过期）"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires_at = item
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self._record(True)
+                    return value
+                del self._data[key]
+            self._record(False)
+            return None
+
+    def set(self, key: str, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache(BaseCache):
+    """SQLite 磁盘缓存，进程重启后仍然有效"""
+
+    def __init__(self, path: str, ttl: Optional[float] = None):
+        super().__init__()
+        self.path = path
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                value, expires_at = row
+                if expires_at is None or expires_at > time.time():
+                    self._record(True)
+                    return json.loads(value)
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+            self._record(False)
+            return None
+
+    def set(self, key: str, value: Any):
+        expires_at = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires_at)
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    async def aget(self, key: str) -> Optional[Any]:
+        return await run_blocking(self.get, key)
+
+    async def aset(self, key: str, value: Any):
+        # 每次写入都会 commit（fsync），放到线程池中执行
+        await run_blocking(self.set, key, value)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+def build_cache(backend: str, maxsize: int = 1024, ttl: Optional[float] = None, path: Optional[str] = None) -> BaseCache:
+    """根据配置创建缓存后端：memory / sqlite / none"""
+    backend = (backend or "memory").lower()
+    if backend == "memory":
+        return LRUCache(maxsize=maxsize, ttl=ttl)
+    if backend == "sqlite":
+        return SQLiteCache(path or "cache/cache.sqlite3", ttl=ttl)
+    if backend == "none":
+        return NullCache()
+    raise ValueError(f"Unknown cache backend: {backend}")
@@ -0,0 +1,71 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set
+
+# 同一个位置的检查在这段时间内被再次提交时，只执行最后一次
+WS_CHECK_DEBOUNCE_MS = float(os.getenv("WS_CHECK_DEBOUNCE_MS", "300"))
+
+
+class CheckScheduler:
+    """单个 WebSocket 客户端的后台检查调度器
+
+    - 每个检查作为后台任务执行，接收消息的循环不会被阻塞
+    - 按槽位（例如句子序号）防抖：同一槽位的新任务会取消尚未完成的旧任务
+    - 单句检查的槽位为 ("sentence", 序号)，批量检查为 ("batch", (序号, ...))
+    - 客户端断开时取消所有任务
+    """
+
+    def __init__(self, debounce: float = WS_CHECK_DEBOUNCE_MS / 1000):
+        self.debounce = debounce
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    def schedule(self, slot: Hashable, job: Callable[[], Awaitable[None]], delay: Optional[float] = None):
+        """提交任务，取代同一槽位上还没完成的任务"""
+        self.cancel(slot)
+        delay = self.debounce if delay is None else delay
+        self._tasks[slot] = asyncio.create_task(self._run(slot, job, delay))
+
+    async def _run(self, slot: Hashable, job: Callable[[], Awaitable[None]], delay: float):
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await job()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"Background check failed for slot {slot}: {e}")
+        finally:
+            if self._tasks.get(slot) is asyncio.current_task():
+                del self._tasks[slot]
+
+    def cancel(self, slot: Hashable) -> bool:
+        """取消某个槽位上的任务，返回是否取消了尚未完成的任务"""
+        task = self._tasks.pop(slot, None)
+        if task is not None and not task.done():
+            task.cancel()
+            return True
+        return False
+
+    def cancel_sentences(self, indexes: Iterable[int]) -> Set[int]:
+        """句子被修改或删除时，取消这些句子的单句检查和包含其中任意一句的批量检查
+
+        返回被取消的批量检查中其余句子的序号，这些句子没有修改，调用方需要重新提交检查。
+        """
+        indexes = set(indexes)
+        for index in indexes:
+            self.cancel(("sentence", index))
+        pending: Set[int] = set()
+        for slot in list(self._tasks):
+            if isinstance(slot, tuple) and slot[0] == "batch" and indexes.intersection(slot[1]):
+                if self.cancel(slot):
+                    pending.update(slot[1])
+        return pending - indexes
+
+    def cancel_all(self):
+        for slot in list(self._tasks):
+            self.cancel(slot)
+
+    @property
+    def in_flight(self) -> int:
+        """尚未完成的任务数"""
+        return sum(1 for task in self._tasks.values() if not task.done())
@@ -0,0 +1,243 @@
+import argparse
+import json
+import mmap
+import os
+import shutil
+import uuid
+from collections.abc import Mapping
+from typing import Iterable, Iterator, List, Optional, Union
+
+import faiss
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from services.index_storage import CURRENT_FILE, new_version_dir, publish_version, resolve_index_dir
+
+# 向量库目录中的文件：
+#   index.faiss  FAISS 索引，按内存映射方式加载
+#   chunks.bin   切片记录，每行一个 JSON：{"id", "page_content", "metadata"}
+#   chunks.idx   numpy int64 数组，第 i 个切片位于 chunks.bin[idx[i]:idx[i+1]]
+# 第 i 行切片与 FAISS 索引中第 i 个向量一一对应。
+FAISS_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.bin"
+OFFSETS_FILE = "chunks.idx"
+LEGACY_DOCSTORE_FILE = "index.pkl"
+
+# faiss 1.8 起可以内存映射 flat 编码（IndexFlat / IVF / HNSW 的向量存储）
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_READ_ONLY)
+
+
+class MmapDocstore(Docstore):
+    """按行号读取切片的只读 docstore
+
+    切片文件和偏移表都以内存映射方式打开，只有检索命中的切片才会被解析成 Document，
+    多个 worker 进程加载同一个索引时共享操作系统的页缓存。
+    """
+
+    def __init__(self, index_dir: str):
+        self.offsets = np.load(os.path.join(index_dir, OFFSETS_FILE), mmap_mode="r")
+        with open(os.path.join(index_dir, CHUNKS_FILE), "rb") as f:
+            # 空文件无法 mmap
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def raw(self, row: int) -> bytes:
+        """第 row 个切片的原始 JSON 行"""
+        return self._data[int(self.offsets[row]):int(self.offsets[row + 1])]
+
+    def search(self, search: Union[int, str]) -> Union[str, Document]:
+        row = int(search)
+        if not 0 <= row < len(self):
+            return f"ID {search} not found."
+        record = json.loads(self.raw(row))
+        return Document(id=record["id"], page_content=record["page_content"], metadata=record["metadata"])
+
+
+class RowIds(Mapping):
+    """FAISS 行号到 docstore 键的映射：MmapDocstore 直接用行号作为键，无需加载 ID 表"""
+
+    def __init__(self, size: int):
+        self.size = size
+
+    def __getitem__(self, row: int) -> int:
+        if not 0 <= row < self.size:
+            raise KeyError(row)
+        return int(row)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.size))
+
+    def __len__(self) -> int:
+        return self.size
+
+
+def has_chunk_store(index_dir: str) -> bool:
+    return os.path.exists(os.path.join(index_dir, OFFSETS_FILE))
+
+
+def load_vectorstore(index_dir: str, embeddings: Embeddings) -> FAISS:
+    """以只读、内存映射的方式加载向量库，供服务检索使用
+
+    尚未迁移的旧目录（index.pkl）退回 FAISS.load_local。
+    """
+    if not has_chunk_store(index_dir):
+        print(f"Loading legacy pickled docstore from {index_dir}; migrate with `python -m services.chunk_store`")
+        return FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+
+    index = faiss.read_index(os.path.join(index_dir, FAISS_FILE), MMAP_FLAGS)
+    docstore = MmapDocstore(index_dir)
+    if len(docstore) != index.ntotal:
+        raise ValueError(f"{index_dir}: {len(docstore)} chunks but {index.ntotal} vectors")
+    return FAISS(embeddings, index, docstore, RowIds(len(docstore)))
+
+
+def load_mutable_vectorstore(index_dir: str, embeddings: Embeddings) -> FAISS:
+    """把向量库完整读入内存，得到可以增删的 FAISS 实例，供构建时使用"""
+    if not has_chunk_store(index_dir):
+        return FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+
+    index = faiss.read_index(os.path.join(index_dir, FAISS_FILE))
+    docstore = MmapDocstore(index_dir)
+    documents = {}
+    index_to_docstore_id = {}
+    for row in range(len(docstore)):
+        doc = docstore.search(row)
+        documents[doc.id] = doc
+        index_to_docstore_id[row] = doc.id
+    return FAISS(embeddings, index, InMemoryDocstore(documents), index_to_docstore_id)
+
+
+def _write_record(f, doc: Document, doc_id: Optional[str] = None) -> int:
+    record = {"id": doc.id or doc_id or str(uuid.uuid4()), "page_content": doc.page_content, "metadata": doc.metadata}
+    f.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+    return f.tell()
+
+
+def _write_offsets(index_dir: str, offsets: List[int]):
+    np.save(os.path.join(index_dir, OFFSETS_FILE), np.asarray(offsets, dtype=np.int64))
+    # np.save 会自动追加 .npy 后缀
+    os.replace(os.path.join(index_dir, OFFSETS_FILE + ".npy"), os.path.join(index_dir, OFFSETS_FILE))
+
+
+def save_vectorstore(vectorstore: FAISS, index_dir: str):
+    """写出 index.faiss 和切片文件，不再生成 index.pkl"""
+    os.makedirs(index_dir, exist_ok=True)
+    faiss.write_index(vectorstore.index, os.path.join(index_dir, FAISS_FILE))
+
+    offsets: List[int] = [0]
+    with open(os.path.join(index_dir, CHUNKS_FILE), "wb") as f:
+        for row in range(vectorstore.index.ntotal):
+            doc_id = vectorstore.index_to_docstore_id[row]
+            offsets.append(_write_record(f, vectorstore.docstore.search(doc_id), str(doc_id)))
+    _write_offsets(index_dir, offsets)
+
+
+class ChunkStoreWriter:
+    """边计算边写入：切片追加到 chunks.bin，向量追加到临时文件 vectors.f32，内存里只有偏移表
+
+    close() 时从内存映射的向量文件一次性构建 FAISS 索引，此时 embedding 进程池已经退出，
+    索引本身（切片数 × 维度 × 4 字节）是唯一随数据量增长的内存占用。
+    给出 base_dir 时先复制已有版本的切片和向量，新切片追加在后面；
+    drop_sources 中的来源（metadata["source"]）的旧切片不会被复制，用于重新入库已修改的文件和移除已删除的文件。
+    """
+
+    VECTORS_FILE = "vectors.f32"
+    # 复制已有向量时每次读取的行数
+    COPY_BLOCK = 4096
+
+    def __init__(self, index_dir: str, base_dir: Optional[str] = None, drop_sources: Iterable[str] = ()):
+        os.makedirs(index_dir, exist_ok=True)
+        self.index_dir = index_dir
+        self.dim: Optional[int] = None
+        self.offsets: List[int] = [0]
+        self.dropped = 0
+        self._vectors_path = os.path.join(index_dir, self.VECTORS_FILE)
+        self._vectors = open(self._vectors_path, "wb")
+        self._file = open(os.path.join(index_dir, CHUNKS_FILE), "wb")
+        if base_dir is not None and has_chunk_store(base_dir):
+            self._copy_base(base_dir, set(drop_sources))
+
+    def _copy_base(self, base_dir: str, drop_sources: set):
+        index = faiss.read_index(os.path.join(base_dir, FAISS_FILE), MMAP_FLAGS)
+        docstore = MmapDocstore(base_dir)
+        self.dim = index.d
+        for start in range(0, len(docstore), self.COPY_BLOCK):
+            end = min(start + self.COPY_BLOCK, len(docstore))
+            vectors = index.reconstruct_n(start, end - start)
+            keep = []
+            for row in range(start, end):
+                record = docstore.raw(row)
+                if drop_sources and json.loads(record)["metadata"].get("source") in drop_sources:
+                    self.dropped += 1
+                    continue
+                self._file.write(record)
+                self.offsets.append(self._file.tell())
+                keep.append(row - start)
+            np.ascontiguousarray(vectors[keep], dtype=np.float32).tofile(self._vectors)
+
+    def add(self, documents: Iterable[Document], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        for doc in documents:
+            self.offsets.append(_write_record(self._file, doc))
+        vectors.tofile(self._vectors)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def close(self):
+        """写出偏移表，从向量文件构建索引并写出，删除向量文件"""
+        self._file.close()
+        self._vectors.close()
+        try:
+            if self.dim is None or len(self) == 0:
+                raise ValueError("No chunks were written")
+            _write_offsets(self.index_dir, self.offsets)
+            vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(len(self), self.dim))
+            index = faiss.IndexFlatL2(self.dim)
+            for start in range(0, len(self), self.COPY_BLOCK):
+                index.add(np.ascontiguousarray(vectors[start:start + self.COPY_BLOCK]))
+            del vectors
+            faiss.write_index(index, os.path.join(self.index_dir, FAISS_FILE))
+        finally:
+            os.remove(self._vectors_path)
+
+
+def migrate(path: str) -> str:
+    """把使用 index.pkl 的旧向量库转换为切片文件格式，写入新版本目录并原子切换"""
+    index_dir = resolve_index_dir(path)
+    if has_chunk_store(index_dir):
+        print(f"{path} already uses the chunk store")
+        return index_dir
+
+    # 迁移只需要读取 docstore，不需要 embedding 模型
+    vectorstore = FAISS.load_local(index_dir, None, allow_dangerous_deserialization=True)
+    staging = new_version_dir(path)
+    save_vectorstore(vectorstore, staging)
+    for name in os.listdir(index_dir):
+        source = os.path.join(index_dir, name)
+        if name not in (FAISS_FILE, LEGACY_DOCSTORE_FILE, CURRENT_FILE) and os.path.isfile(source):
+            shutil.copy2(source, os.path.join(staging, name))
+    final = publish_version(path, staging)
+
+    if index_dir == path:
+        # 旧布局的文件已被新版本目录取代
+        for name in (FAISS_FILE, LEGACY_DOCSTORE_FILE):
+            os.remove(os.path.join(path, name))
+    print(f"Migrated {path}: {vectorstore.index.ntotal} chunks -> {final}")
+    return final
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="把 pickle docstore 迁移为内存映射的切片文件")
+    parser.add_argument("paths", nargs="+", help="向量库目录，如 vectorstore/physics indexes/toastmasters-faiss")
+    args = parser.parse_args()
+    for path in args.paths:
+        migrate(path)
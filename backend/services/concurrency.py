@@ -0,0 +1,24 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+# 只有同步实现的工具（FAISS 检索、embedding 推理等）在这个有界线程池里执行，
+# 避免阻塞事件循环，也避免无限制地创建线程
+TOOL_THREADPOOL_SIZE = int(os.getenv("TOOL_THREADPOOL_SIZE", "8"))
+
+_executor = ThreadPoolExecutor(max_workers=TOOL_THREADPOOL_SIZE, thread_name_prefix="tool-worker")
+
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """在有界线程池中执行同步函数并等待结果；函数在调用方的 contextvars 上下文中运行"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(context.run, func, *args, **kwargs))
+
+
+def shutdown():
+    """关闭线程池，供服务退出时调用"""
+    _executor.shutdown(wait=False, cancel_futures=True)
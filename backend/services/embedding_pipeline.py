@@ -0,0 +1,210 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from services.vectorstore_registry import DEFAULT_EMBEDDING_MODEL
+
+# 每批送入模型的切片数，以及并行计算向量的进程数
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", str(os.cpu_count() or 1)))
+# 子进程启动方式；torch 在 fork 出的子进程里可能死锁，默认使用 spawn
+EMBED_MP_START_METHOD = os.getenv("EMBED_MP_START_METHOD", "spawn")
+
+CHECKPOINT_META = "meta.json"
+
+# 子进程里加载的模型，每个进程只加载一次
+_worker_embeddings = None
+
+
+def _init_worker(model_name: str, batch_size: int, threads: int):
+    """子进程初始化：限制 torch 线程数避免进程间争抢 CPU，然后加载模型"""
+    global _worker_embeddings
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from langchain_huggingface import HuggingFaceEmbeddings
+    _worker_embeddings = HuggingFaceEmbeddings(model_name=model_name, encode_kwargs={"batch_size": batch_size})
+
+
+def _embed_batch(batch_id: int, texts: List[str]) -> Tuple[int, np.ndarray]:
+    return batch_id, np.asarray(_worker_embeddings.embed_documents(texts), dtype=np.float32)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """本进程和已结束子进程的峰值常驻内存（MB），不支持的平台返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    )
+    # Linux 上单位是 KB，macOS 上是字节
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+
+class EmbeddingCheckpoint:
+    """按批次保存已计算的向量，中断后重新运行时跳过已完成的批次"""
+
+    def __init__(self, directory: str, fingerprint: str):
+        self.directory = directory
+        meta_path = os.path.join(directory, CHECKPOINT_META)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                valid = json.load(f).get("fingerprint") == fingerprint
+        except FileNotFoundError:
+            valid = False
+        if not valid:
+            # 输入或参数变了，旧的检查点作废
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory)
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"fingerprint": fingerprint}, f)
+
+    def _path(self, batch_id: int) -> str:
+        return os.path.join(self.directory, f"batch-{batch_id:06d}.npy")
+
+    def load(self, batch_id: int) -> Optional[np.ndarray]:
+        try:
+            return np.load(self._path(batch_id))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save(self, batch_id: int, vectors: np.ndarray):
+        # 先写临时文件再改名，避免中断时留下半个批次
+        tmp = self._path(batch_id) + ".tmp.npy"
+        np.save(tmp, vectors)
+        os.replace(tmp, self._path(batch_id))
+
+    def remove(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class EmbeddingPool:
+    """可复用的 embedding 计算器：workers > 1 时是进程池，否则直接在当前进程计算
+
+    map() 按输入顺序产出每批的向量，同时提交的批次数不超过 2 * workers，
+    输入可以是生成器，整个过程不会一次性持有全部批次。
+    """
+
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL, batch_size: int = EMBED_BATCH_SIZE, workers: int = EMBED_WORKERS):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.workers = max(1, workers)
+        self._pool = None
+        self._embeddings = None
+        if self.workers == 1:
+            # 只有一个进程可用时直接在当前进程计算，省去启动子进程和重复加载模型
+            from services.vectorstore_registry import registry
+            self._embeddings = registry.get_embeddings(model_name)
+        else:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(EMBED_MP_START_METHOD),
+                initializer=_init_worker,
+                initargs=(model_name, batch_size, threads)
+            )
+
+    def map(self, batches: Iterable[List[str]]) -> Iterator[np.ndarray]:
+        if self._pool is None:
+            for texts in batches:
+                yield np.asarray(self._embeddings.embed_documents(texts), dtype=np.float32)
+            return
+
+        pending: Deque = deque()
+        for batch_id, texts in enumerate(batches):
+            pending.append(self._pool.submit(_embed_batch, batch_id, texts))
+            if len(pending) >= 2 * self.workers:
+                yield pending.popleft().result()[1]
+        while pending:
+            yield pending.popleft().result()[1]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self) -> "EmbeddingPool":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def embed_texts(
+    texts: List[str],
+    model_name: str = DEFAULT_EMBEDDING_MODEL,
+    batch_size: int = EMBED_BATCH_SIZE,
+    workers: int = EMBED_WORKERS,
+    checkpoint_dir: Optional[str] = None,
+    verbose: bool = True
+) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """分批计算文本向量，返回 (向量矩阵, 统计信息)
+
+    - 批次多于一个且 workers > 1 时在进程池中并行计算，每个进程持有一份模型
+    - 同时提交的批次数不超过 2 * workers，避免结果堆积占用内存
+    - 给出 checkpoint_dir 时每完成一批就落盘，中断后可从断点继续
+    """
+    start = time.perf_counter()
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    results: Dict[int, np.ndarray] = {}
+
+    checkpoint = None
+    if checkpoint_dir:
+        digest = hashlib.sha256()
+        digest.update(f"{model_name}\0{batch_size}\0".encode("utf-8"))
+        for text in texts:
+            digest.update(hashlib.sha256(text.encode("utf-8")).digest())
+        checkpoint = EmbeddingCheckpoint(checkpoint_dir, digest.hexdigest())
+        for batch_id in range(len(batches)):
+            vectors = checkpoint.load(batch_id)
+            if vectors is not None:
+                results[batch_id] = vectors
+    resumed = len(results)
+    todo = [batch_id for batch_id in range(len(batches)) if batch_id not in results]
+
+    workers = max(1, min(workers, len(todo)))
+    if todo:
+        with EmbeddingPool(model_name, batch_size, workers) as pool:
+            vectors_iter = pool.map(batches[batch_id] for batch_id in todo)
+            for done, (batch_id, vectors) in enumerate(zip(todo, vectors_iter), start=1):
+                results[batch_id] = vectors
+                if checkpoint is not None:
+                    checkpoint.save(batch_id, vectors)
+                if verbose and (done % 10 == 0 or done == len(todo)):
+                    print(f"Embedded {done}/{len(todo)} batches")
+
+    vectors = np.concatenate([results[i] for i in range(len(batches))]) if batches else np.zeros((0, 0), dtype=np.float32)
+    if checkpoint is not None:
+        checkpoint.remove()
+
+    elapsed = time.perf_counter() - start
+    embedded = sum(len(batches[batch_id]) for batch_id in todo)
+    stats = {
+        "chunks": len(texts),
+        "batches": len(batches),
+        "resumed_batches": resumed,
+        "batch_size": batch_size,
+        "workers": workers,
+        "seconds": elapsed,
+        "chunks_per_sec": embedded / elapsed if elapsed > 0 else 0.0,
+        "peak_rss_mb": peak_rss_mb()
+    }
+    if verbose:
+        peak = f"{stats['peak_rss_mb']:.0f}MB" if stats["peak_rss_mb"] is not None else "n/a"
+        print(f"Embedded {len(texts)} chunks in {elapsed:.2f}s "
+              f"({stats['chunks_per_sec']:.1f} chunks/s, {workers} workers, batch {batch_size}, peak RSS {peak})")
+    return vectors, stats
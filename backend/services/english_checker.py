@@ -1,14 +1,33 @@
 import os
-from typing import Dict, List, Optional, Any
-from openai import OpenAI
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Any
+import httpx
+from openai import AsyncOpenAI
 import json
 import re
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from langchain_core.utils.json import parse_partial_json
+from services.cache import BaseCache, build_cache, make_cache_key, normalize_text
+from services.grammar_triage import grammar_triage
+from services.metrics import GRAMMAR_TRIAGE_DECISIONS, SPELL_DECISIONS, record_llm_call
+from services.profiling import span
+from services.spell_checker import spell_checker
 
 # 加载环境变量
 load_dotenv()
 
+# 提示词版本号，修改对应提示词时递增，使旧的缓存结果失效
+PROMPT_VERSIONS = {
+    "check_word": "1",
+    "check_sentence": "1",
+    "improve_text": "1",
+}
+
+# /api/check-sentences 一次最多检查的句子数，避免单个请求展开成大量 LLM 调用
+CHECK_MAX_SENTENCES = int(os.getenv("CHECK_MAX_SENTENCES", "64"))
+
 class WordCheckRequest(BaseModel):
     word: str
     context: Optional[str] = None
@@ -23,6 +42,10 @@ class SentenceCheckRequest(BaseModel):
     sentence: str
     full_text: Optional[str] = None
 
+class SentenceBatchCheckRequest(BaseModel):
+    sentences: List[str]
+    full_text: Optional[str] = None
+
 class SentenceCheckResponse(BaseModel):
     is_complete: bool
     issues: List[Dict[str, Any]]
@@ -32,6 +55,22 @@ class SentenceCheckResponse(BaseModel):
     polished_sentence: Optional[str] = None  # AI 润色后的地道表达
     polished_explanation: Optional[str] = None  # 为什么这样改的解释
 
+# 流式检查时提前推送给客户端的字段
+STREAMED_SENTENCE_FIELDS = ("polished_sentence", "explanation")
+
+def extract_partial_fields(text: str, fields) -> Dict[str, str]:
+    """从不完整的 JSON 文本中尽量取出指定的字符串字段"""
+    start = text.find("{")
+    if start == -1:
+        return {}
+    try:
+        partial = parse_partial_json(text[start:])
+    except Exception:
+        return {}
+    if not isinstance(partial, dict):
+        return {}
+    return {field: partial[field] for field in fields if isinstance(partial.get(field), str) and partial[field]}
+
 class EnglishChecker:
     def __init__(self):
         # 初始化OpenAI客户端 - 使用OpenAI API（英文能力更强）
@@ -41,15 +80,141 @@ class EnglishChecker:
         
         base_url = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
         
-        self.client = OpenAI(
+        # 所有检查共享一个 HTTP 连接池，复用 keep-alive 连接
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+                max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+            ),
+            timeout=httpx.Timeout(float(os.getenv("OPENAI_TIMEOUT", "60")), connect=5.0)
+        )
+        self.client = AsyncOpenAI(
             api_key=api_key,
-            base_url=base_url
+            base_url=base_url,
+            http_client=self.http_client
         )
         # 使用gpt-4o-mini，性价比高且英文能力强
         self.model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-        
+
+        # 单次调用的超时时间（秒）
+        self.word_timeout = float(os.getenv("CHECK_WORD_TIMEOUT", "15"))
+        self.sentence_timeout = float(os.getenv("CHECK_SENTENCE_TIMEOUT", "30"))
+        self.improvement_timeout = float(os.getenv("IMPROVE_TEXT_TIMEOUT", "60"))
+
+        # 批量检查时每次请求最多打包的句子数和超时时间
+        self.batch_size = int(os.getenv("CHECK_BATCH_SIZE", "8"))
+        self.batch_timeout = float(os.getenv("CHECK_BATCH_TIMEOUT", "60"))
+
+        # 同时进行中的 LLM 调用上限，超出的请求排队等待
+        self.semaphore = asyncio.Semaphore(int(os.getenv("OPENAI_MAX_CONCURRENCY", "16")))
+
+        # 检查结果缓存：memory（LRU + TTL）/ sqlite / none
+        ttl = float(os.getenv("CHECK_CACHE_TTL", "86400"))
+        self.cache: BaseCache = build_cache(
+            os.getenv("CHECK_CACHE_BACKEND", "memory"),
+            maxsize=int(os.getenv("CHECK_CACHE_SIZE", "2048")),
+            ttl=ttl if ttl > 0 else None,
+            path=os.getenv("CHECK_CACHE_PATH", "cache/english_checker.sqlite3")
+        )
+
+    def _cache_key(self, method: str, *inputs: Optional[str]) -> str:
+        """缓存键：方法名 + 模型 + 提示词版本 + 归一化后的输入"""
+        return make_cache_key(method, self.model, PROMPT_VERSIONS[method], *[normalize_text(i) for i in inputs])
+
+    async def _remember(self, key: str, response: Any) -> Any:
+        """缓存成功解析的结果后原样返回；降级结果不会经过这里"""
+        await self.cache.aset(key, response.model_dump() if isinstance(response, BaseModel) else response)
+        return response
+
+    async def _complete(self, system: str, prompt: str, temperature: float, max_tokens: int, timeout: float) -> str:
+        """调用 chat completions 接口并返回回复文本"""
+        async with self.semaphore:
+            start = time.perf_counter()
+            try:
+                with span("chat.completions", kind="llm", model=self.model):
+                    response = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=[
+                            {"role": "system", "content": system},
+                            {"role": "user", "content": prompt}
+                        ],
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        timeout=timeout
+                    )
+            except Exception:
+                record_llm_call("english_checker", self.model, time.perf_counter() - start, status="error")
+                raise
+        record_llm_call("english_checker", self.model, time.perf_counter() - start, response.usage)
+        return response.choices[0].message.content.strip()
+
+    async def _complete_stream(
+        self,
+        system: str,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        timeout: float,
+        on_text: Callable[[str], Awaitable[None]]
+    ) -> str:
+        """流式调用 chat completions 接口，每收到一段内容就用已累计的文本回调 on_text"""
+        async with self.semaphore:
+            start = time.perf_counter()
+            usage = None
+            status = "error"
+            try:
+                with span("chat.completions", kind="llm", model=self.model, stream=True):
+                    stream = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=[
+                            {"role": "system", "content": system},
+                            {"role": "user", "content": prompt}
+                        ],
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        timeout=timeout,
+                        stream=True,
+                        # 最后一个分片携带本次调用的 token 用量
+                        stream_options={"include_usage": True}
+                    )
+                    parts: List[str] = []
+                    try:
+                        async for chunk in stream:
+                            if chunk.usage is not None:
+                                usage = chunk.usage
+                            if not chunk.choices:
+                                continue
+                            delta = chunk.choices[0].delta.content
+                            if delta:
+                                parts.append(delta)
+                                await on_text("".join(parts))
+                    finally:
+                        await stream.close()
+                    status = "ok"
+            except asyncio.CancelledError:
+                # WebSocket 防抖会取消被新输入取代的检查
+                status = "cancelled"
+                raise
+            finally:
+                record_llm_call("english_checker", self.model, time.perf_counter() - start, usage, status)
+        return "".join(parts).strip()
+
+    async def aclose(self):
+        """关闭 HTTP 连接池"""
+        await self.http_client.aclose()
+
     async def check_word(self, request: WordCheckRequest) -> WordCheckResponse:
-        """检查单词拼写和用法"""
+        """检查单词拼写和用法；明显正确或只有一个合理改法的单词在本地判定，不调用 LLM"""
+        local, reason = spell_checker.check(request.word, request.context)
+        SPELL_DECISIONS.labels("local" if local is not None else "escalated", reason).inc()
+        if local is not None:
+            return WordCheckResponse(**local)
+
+        cache_key = self._cache_key("check_word", request.word, request.context)
+        cached = await self.cache.aget(cache_key)
+        if cached is not None:
+            return WordCheckResponse(**cached)
+
         prompt = f"""
 你是一个专业的英语拼写和语法检查器。请检查以下单词：
 
@@ -76,28 +241,24 @@ class EnglishChecker:
 """
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的英语拼写检查器。只返回JSON格式的结果。"},
-                    {"role": "user", "content": prompt}
-                ],
+            result_text = await self._complete(
+                "你是一个专业的英语拼写检查器。只返回JSON格式的结果。",
+                prompt,
                 temperature=0.1,
-                max_tokens=300
+                max_tokens=300,
+                timeout=self.word_timeout
             )
             
-            result_text = response.choices[0].message.content.strip()
-            
             # 尝试解析JSON
             try:
                 result = json.loads(result_text)
-                return WordCheckResponse(**result)
+                return await self._remember(cache_key, WordCheckResponse(**result))
             except json.JSONDecodeError:
                 # 如果JSON解析失败，尝试提取JSON部分
                 json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
                 if json_match:
                     result = json.loads(json_match.group())
-                    return WordCheckResponse(**result)
+                    return await self._remember(cache_key, WordCheckResponse(**result))
                 else:
                     # 降级处理
                     return WordCheckResponse(
@@ -116,8 +277,36 @@ class EnglishChecker:
                 confidence=0.0
             )
 
-    async def check_sentence(self, request: SentenceCheckRequest) -> SentenceCheckResponse:
-        """检查句子完整性和语法"""
+    @staticmethod
+    def _triage(sentence: str) -> Optional[SentenceCheckResponse]:
+        local, reason = grammar_triage.check(sentence)
+        GRAMMAR_TRIAGE_DECISIONS.labels("local" if local is not None else "escalated", reason).inc()
+        return SentenceCheckResponse(**local) if local is not None else None
+
+    async def check_sentence(
+        self,
+        request: SentenceCheckRequest,
+        on_partial: Optional[Callable[[Dict[str, str]], Awaitable[None]]] = None,
+        screened: bool = False
+    ) -> SentenceCheckResponse:
+        """检查句子完整性和语法
+
+        传入 on_partial 时使用流式输出，polished_sentence 和 explanation
+        在生成过程中每有变化就回调一次；返回值与非流式调用相同。
+        本地初筛认为没有问题的句子直接返回，不调用 LLM；
+        screened 为 True 表示调用方已经做过初筛（批量检查），不再重复初筛和计数。
+        """
+        if not screened:
+            local = self._triage(request.sentence)
+            if local is not None:
+                return local
+
+        # 只按句子本身缓存：full_text 每次按键都会变化，仅作为参考上下文
+        cache_key = self._cache_key("check_sentence", request.sentence)
+        cached = await self.cache.aget(cache_key)
+        if cached is not None:
+            return SentenceCheckResponse(**cached)
+
         prompt = f"""
 你是一个专业的英语语法和写作检查器。请检查以下句子的完整性和语法，并提供native speaker的地道表达：
 
@@ -159,28 +348,43 @@ class EnglishChecker:
 """
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的英语语法检查器。只返回JSON格式的结果。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=500
-            )
-            
-            result_text = response.choices[0].message.content.strip()
+            if on_partial is None:
+                result_text = await self._complete(
+                    "你是一个专业的英语语法检查器。只返回JSON格式的结果。",
+                    prompt,
+                    temperature=0.1,
+                    max_tokens=500,
+                    timeout=self.sentence_timeout
+                )
+            else:
+                last_fields: Dict[str, str] = {}
+
+                async def on_text(text: str):
+                    nonlocal last_fields
+                    fields = extract_partial_fields(text, STREAMED_SENTENCE_FIELDS)
+                    if fields and fields != last_fields:
+                        last_fields = fields
+                        await on_partial(fields)
+
+                result_text = await self._complete_stream(
+                    "你是一个专业的英语语法检查器。只返回JSON格式的结果。",
+                    prompt,
+                    temperature=0.1,
+                    max_tokens=500,
+                    timeout=self.sentence_timeout,
+                    on_text=on_text
+                )
             
             # 尝试解析JSON
             try:
                 result = json.loads(result_text)
-                return SentenceCheckResponse(**result)
+                return await self._remember(cache_key, SentenceCheckResponse(**result))
             except json.JSONDecodeError:
                 # 如果JSON解析失败，尝试提取JSON部分
                 json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
                 if json_match:
                     result = json.loads(json_match.group())
-                    return SentenceCheckResponse(**result)
+                    return await self._remember(cache_key, SentenceCheckResponse(**result))
                 else:
                     # 降级处理
                     return SentenceCheckResponse(
@@ -205,8 +409,133 @@ class EnglishChecker:
                 polished_explanation=None
             )
 
+    async def check_sentences_batch(self, sentences: List[str], full_text: Optional[str] = None) -> List[SentenceCheckResponse]:
+        """批量检查多个句子，结果顺序与输入一致
+
+        本地初筛认为没有问题的句子和已缓存的句子直接返回，其余每 batch_size 个打包成一次请求；
+        某一批的回复无法解析时，这一批退回逐句调用 check_sentence。
+        """
+        results: List[Optional[SentenceCheckResponse]] = [None] * len(sentences)
+        pending: Dict[str, List[int]] = {}
+        for i, sentence in enumerate(sentences):
+            local = self._triage(sentence)
+            if local is not None:
+                results[i] = local
+                continue
+            cached = await self.cache.aget(self._cache_key("check_sentence", sentence))
+            if cached is not None:
+                results[i] = SentenceCheckResponse(**cached)
+            else:
+                # 重复的句子只检查一次
+                pending.setdefault(normalize_text(sentence), []).append(i)
+
+        unique = [sentences[positions[0]] for positions in pending.values()]
+        groups = [unique[i:i + self.batch_size] for i in range(0, len(unique), self.batch_size)]
+        group_results = await asyncio.gather(*[self._check_sentence_group(group, full_text) for group in groups])
+
+        for group, responses in zip(groups, group_results):
+            for sentence, response in zip(group, responses):
+                for i in pending[normalize_text(sentence)]:
+                    results[i] = response
+        return results
+
+    async def _check_sentence_group(self, sentences: List[str], full_text: Optional[str]) -> List[SentenceCheckResponse]:
+        """用一次 LLM 调用检查一组句子，解析失败时逐句检查"""
+        if len(sentences) == 1:
+            return [await self.check_sentence(SentenceCheckRequest(sentence=sentences[0], full_text=full_text), screened=True)]
+
+        numbered = "\n".join(f"{i + 1}. {json.dumps(sentence, ensure_ascii=False)}" for i, sentence in enumerate(sentences))
+        prompt = f"""
+你是一个专业的英语语法和写作检查器。请逐个检查以下 {len(sentences)} 个句子的完整性和语法，并为每个句子提供native speaker的地道表达：
+
+句子列表:
+{numbered}
+
+完整文本（仅作为上下文参考）: "{full_text or '无'}"
+
+请返回一个JSON数组，按句子编号顺序每个句子一个元素，共 {len(sentences)} 个元素：
+[
+    {{
+        "index": 1,
+        "is_complete": true/false,
+        "issues": [
+            {{
+                "type": "grammar|spelling|punctuation|structure",
+                "position": "错误位置描述",
+                "message": "具体错误描述",
+                "severity": "high|medium|low"
+            }}
+        ],
+        "suggestions": [
+            {{
+                "type": "grammar|spelling|punctuation|structure",
+                "original": "原始文本",
+                "corrected": "修正后的文本",
+                "explanation": "修正说明"
+            }}
+        ],
+        "overall_score": 0.85,
+        "explanation": "整体评价和建议",
+        "polished_sentence": "润色后的、更地道的native speaker表达。即使原句正确，也要提供一个更自然、更流畅的版本",
+        "polished_explanation": "简要解释为什么要这样改（用中文解释，50字以内）"
+    }}
+]
+
+评分标准：
+- 0.9-1.0: 优秀，语法正确，表达清晰
+- 0.7-0.8: 良好，有少量小错误
+- 0.5-0.6: 一般，有明显错误但不影响理解
+- 0.0-0.4: 较差，有严重错误
+
+只返回JSON数组，不要其他内容。
+"""
+
+        try:
+            result_text = await self._complete(
+                "你是一个专业的英语语法检查器。只返回JSON格式的结果。",
+                prompt,
+                temperature=0.1,
+                max_tokens=min(500 * len(sentences), 4000),
+                timeout=self.batch_timeout
+            )
+
+            try:
+                items = json.loads(result_text)
+            except json.JSONDecodeError:
+                # 如果JSON解析失败，尝试提取JSON数组部分
+                json_match = re.search(r'\[.*\]', result_text, re.DOTALL)
+                if not json_match:
+                    raise ValueError("回复中没有JSON数组")
+                items = json.loads(json_match.group())
+
+            if not isinstance(items, list) or len(items) != len(sentences):
+                raise ValueError(f"期望 {len(sentences)} 个结果，实际得到 {len(items) if isinstance(items, list) else 0} 个")
+
+            # 模型给出了编号时按编号对齐，否则按顺序对齐
+            if all(isinstance(item, dict) and isinstance(item.get("index"), int) for item in items):
+                items = sorted(items, key=lambda item: item["index"])
+            responses = [
+                SentenceCheckResponse(**{k: v for k, v in item.items() if k != "index"})
+                for item in items
+            ]
+        except Exception as e:
+            print(f"Batch sentence check failed, falling back to single checks: {e}")
+            return list(await asyncio.gather(*[
+                self.check_sentence(SentenceCheckRequest(sentence=sentence, full_text=full_text), screened=True)
+                for sentence in sentences
+            ]))
+
+        for sentence, response in zip(sentences, responses):
+            await self._remember(self._cache_key("check_sentence", sentence), response)
+        return responses
+
     async def get_improvement_suggestions(self, text: str) -> Dict[str, Any]:
         """获取文本改进建议"""
+        cache_key = self._cache_key("improve_text", text)
+        cached = await self.cache.aget(cache_key)
+        if cached is not None:
+            return cached
+
         prompt = f"""
 你是一个专业的英语写作导师。请分析以下文本并提供改进建议：
 
@@ -233,27 +562,23 @@ class EnglishChecker:
 """
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的英语写作导师。只返回JSON格式的结果。"},
-                    {"role": "user", "content": prompt}
-                ],
+            result_text = await self._complete(
+                "你是一个专业的英语写作导师。只返回JSON格式的结果。",
+                prompt,
                 temperature=0.3,
-                max_tokens=600
+                max_tokens=600,
+                timeout=self.improvement_timeout
             )
             
-            result_text = response.choices[0].message.content.strip()
-            
             # 尝试解析JSON
             try:
                 result = json.loads(result_text)
-                return result
+                return await self._remember(cache_key, result)
             except json.JSONDecodeError:
                 # 如果JSON解析失败，尝试提取JSON部分
                 json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
                 if json_match:
-                    return json.loads(json_match.group())
+                    return await self._remember(cache_key, json.loads(json_match.group()))
                 else:
                     return {
                         "overall_assessment": "无法分析文本",
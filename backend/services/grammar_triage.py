@@ -0,0 +1,608 @@
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from services.spell_checker import spell_checker
+
+# 本地语法初筛：规则和常见二元组检查都认为没问题的句子直接返回“没有问题”，不再调用 LLM
+GRAMMAR_TRIAGE_ENABLED = os.getenv("GRAMMAR_TRIAGE_ENABLED", "true").lower() == "true"
+GRAMMAR_BIGRAMS_PATH = os.getenv(
+    "GRAMMAR_BIGRAMS_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "en_bigrams.txt.gz")
+)
+# 超过这个词数的句子结构往往较复杂，直接交给 LLM
+GRAMMAR_TRIAGE_MAX_WORDS = int(os.getenv("GRAMMAR_TRIAGE_MAX_WORDS", "15"))
+
+# 两个词的 log10 词频都不低于该值时，它们的组合应当出现在常见二元组表中，没出现说明搭配可疑
+COMMON_WORD_LOG_FREQ = 8.0
+
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)*|\d+(?:[.,:]\d+)*|[^\w\s]")
+
+BASE_VERBS = frozenset("""
+be have do go make take come see know get give find think tell become leave feel bring begin keep
+hold write stand hear let mean meet run pay sit speak lie lead read grow lose fall send build
+understand draw break spend cut rise drive buy wear choose eat drink sleep swim sing fly forget
+like love want need play work live cook study watch help try call ask use start walk talk visit
+enjoy finish wash clean open close stay wait learn teach travel listen look worry agree hope
+believe decide plan prefer practice remember miss move change carry catch sell teach win
+""".split())
+
+# 一般过去式与过去分词不同的不规则动词的过去式
+PAST_ONLY = frozenset("""
+went saw came ate did took knew wrote gave ran began drank swam sang spoke broke chose drove
+forgot flew grew rode stole threw wore fell froze woke shook sank rang
+""".split())
+# 情态动词、do 之后不能出现的过去式 / 过去分词
+PAST_FORMS = PAST_ONLY | frozenset("""
+bought thought brought taught caught felt made left lost paid said sold told found heard kept
+met sent spent slept built meant sat stood understood won held led fed
+""".split())
+
+MODALS = frozenset("can could will would should must may might shall can't couldn't won't wouldn't shouldn't mustn't".split())
+DO_FORMS = frozenset("do does did don't doesn't didn't".split())
+HAVE_FORMS = frozenset("have has had i've you've we've they've he's she's it's".split())
+BE_FORMS = {"i": {"am", "was"}, "he": {"is", "was"}, "she": {"is", "was"}, "we": {"are", "were"},
+            "you": {"are", "were"}, "they": {"are", "were"}}
+THIRD_PERSON = frozenset("he she it everyone everybody someone somebody nobody everything something nothing".split())
+PLURAL_PRONOUNS = frozenset("i we you they".split())
+# 这些词之后的代词是宾语或倒装的主语，后面跟动词原形是正确的
+SUBJECT_GUARDS = MODALS | DO_FORMS | frozenset("""
+make makes made let lets help helps helped watch watched see saw hear heard have has had feel felt
+""".split())
+# 动词和否定词之间允许出现的副词
+ADVERBS = frozenset("not never already just ever also always often usually really still recently probably".split())
+# be 动词之后既可以是动词原形也可以是形容词或介词的词
+BE_COMPLEMENTS = frozenset("like open close clean mean present free back home right well".split())
+
+SUBORDINATORS = frozenset("because although though when if while since unless after before".split())
+PAST_MARKERS = frozenset("yesterday ago".split())
+FUTURE_MARKERS = frozenset("tomorrow".split())
+PERIODS = frozenset("""
+night week weekend month year summer winter spring autumn fall morning evening
+monday tuesday wednesday thursday friday saturday sunday
+""".split())
+# 这些词引出的从句可以有自己的时态（I learned that he likes...），时间状语只约束同一分句
+TENSE_CLAUSE_BREAKS = frozenset("""
+that because if when while although though since who which where until before after unless whether
+""".split())
+PAST_TENSE_CLASHES = frozenset("am is are can can't will won't have has don't doesn't".split())
+
+# 后面要接 to do 的动词，以及几乎只作动词用的原形（want go、decide buy）
+TO_VERBS = frozenset("want wants wanted decide decides decided hope hopes hoped plan plans planned".split())
+CLEAR_VERBS = frozenset("""
+go come eat buy see make take get give find tell become leave bring begin keep write know meet speak
+understand learn visit finish stay travel listen sleep swim sing fly forget choose sell
+""".split())
+BE_VERB_WORDS = frozenset("am is are was were be been being 'm".split())
+# 描述事物的 -ing 形容词，用来形容自己时通常应为 -ed
+ING_ADJECTIVES = frozenset("boring interesting exciting surprising tiring confusing disappointing annoying".split())
+
+QUANTIFIERS = frozenset("two three four five six seven eight nine ten many several few both these those".split())
+DETERMINERS = frozenset("the my your his her our their these those".split())
+# 不加 s 变复数，或单复数同形的词
+NOT_PLURALIZED = frozenset("""
+people other more hundred thousand million dozen kind much few many same little of children men women
+feet teeth mice police fish sheep deer staff
+""".split())
+POSSESSIVES = frozenset("my your his her our their".split())
+# 几乎只作动词用的原形，my study plan、my morning walk 这类复合名词不会被误判
+VERB_ONLY = frozenset("""
+go come eat buy see take get give find tell become bring begin keep write know meet speak understand
+learn listen sing forget choose sell like want need live cook
+""".split())
+SINGULAR_ONLY_VERBS = frozenset("is was has doesn't isn't wasn't hasn't".split())
+PLURAL_ONLY_VERBS = frozenset("are were have don't aren't weren't haven't".split())
+# 以 s 结尾但不是复数的名词
+S_SINGULARS = frozenset("news physics mathematics maths economics series species means bus gas lens status".split())
+# 引出新分句的词，其后的限定词 + 名词是分句的主语
+CLAUSE_STARTERS = frozenset("because so but when while if although though since that after before".split())
+SUBJECT_WORDS = frozenset("i you he she it we they".split())
+VERB_WORDS = frozenset("am is are was were have has had do does did".split())
+# 让后面的主谓结构成为从句或并列句的词：连词、关系词、引出宾语从句的动词
+CLAUSE_LINKS = frozenset("""
+and but so or then because when while if although though since that after before until unless where who which
+what how why as than think thought know knew hope hoped guess believe said say told tell wish realized feel felt
+heard hear found find sure
+""".split())
+# 跟在形容词、副词后面、没有连词的新主语说明两个句子连在了一起（I was tired I went to bed）
+RUN_ON_BEFORE = frozenset("""
+tired bored excited sick hungry sleepy full busy happy sad late early home today yesterday tonight now again too
+well there here outside nice hot cold good bad great fun
+""".split())
+# 名词之后常见的词；单数名词后面紧跟这些词时才判断为缺少复数
+AFTER_NOUN = frozenset("""
+is are was were in on at of and or but for to with from that who which yesterday today last this every
+""".split())
+
+# 读音以辅音开头的元音字母词、读音以元音开头的 h 开头词
+A_BEFORE_VOWEL = ("uni", "use", "usu", "uti", "uro", "eu", "ewe", "one", "once", "ufo")
+AN_BEFORE_H = ("hour", "honest", "honor", "honour", "heir", "herb")
+
+SHORT_ADJECTIVES = """
+big small tall short long fast slow hot cold warm cool easy happy busy early late large nice old
+young new high low cheap strong weak hard soft heavy light bright dark quiet smart safe rich poor
+deep wide pretty funny lucky healthy angry sad great kind
+""".split()
+
+
+def _comparatives(adjective: str) -> List[str]:
+    if adjective.endswith("y"):
+        stem = adjective[:-1] + "i"
+    elif adjective.endswith("e"):
+        stem = adjective[:-1]
+    elif len(adjective) >= 3 and adjective[-1] not in "aeiouwy" and adjective[-2] in "aeiou" and adjective[-3] not in "aeiou":
+        stem = adjective + adjective[-1]
+    else:
+        stem = adjective
+    return [stem + "er", stem + "est"]
+
+
+COMPARATIVES = frozenset([form for adjective in SHORT_ADJECTIVES for form in _comparatives(adjective)]
+                         + ["better", "best", "worse", "worst"])
+
+# 这些词必须大写
+PROPER_WORDS = frozenset("""
+monday tuesday wednesday thursday friday saturday sunday january february april june july
+september october november december english chinese japanese korean french german spanish
+american british russian italian canadian australian indian china japan america england france
+germany korea russia italy canada australia india
+""".split())
+
+# 中国学习者常见的固定搭配错误
+COLLOCATION_ERRORS = [re.compile(pattern) for pattern in (
+    r"\bdiscuss(?:ed|es|ing)? about\b",
+    r"\bdespite of\b",
+    r"\bemphasi[sz](?:e|ed|es|ing) on\b",
+    r"\breturn(?:ed|s|ing)? back\b",
+    r"\bmarried with\b",
+    r"\bexplain(?:ed|s|ing)? (?:me|him|us|them)\b",
+    r"\bsuggest(?:ed|s|ing)? (?:me|him|her|us|them) to\b",
+    r"\benjoy(?:ed|s|ing)? to\b",
+    r"\blook(?:ing|ed|s)? forward to (?:see|meet|hear|go|visit|work)\b",
+    r"\b(?:let|lets|make|makes|made) (?:me|him|her|us|them|it) to\b",
+    r"\bhow do you think\b",
+    r"\bvery (?:like|enjoy|enjoyed|want|wanted|hope|agree)\b",
+    r"\b(?:say|says|said) (?:me|him|us|them)\b",
+    r"\bborrow(?:ed|s|ing)? (?:me|him|us|them)\b",
+    r"\bwait(?:ed|s|ing)? (?:me|you|him|us|them)\b",
+    r"\blisten(?:ed|s|ing)? (?:music|the|a|an|my|his|her|your|our|their)\b",
+    r"\binterested (?:about|on|for)\b",
+    r"\bafraid (?:from|about)\b",
+    r"\b(?:go|goes|went|going|gone|come|comes|came|coming|been|get|got|arrive|arrived) to (?:home|here|there)\b",
+    r"\bat the night\b",
+    r"\byesterday night\b",
+    r"\b(?:make|makes|made|making) (?:my |his |her |our |their |your )?homework\b",
+    r"\b(?:i|you|he|she|it|we|they) (?:always|usually|often|never|sometimes) (?:am|is|are|was|were)\b",
+    r"\b(?:have|has|had) been (?:never|always)\b",
+    r"\b(?:open|close) the (?:light|lights|tv|television|radio)\b",
+    r"^if it will\b",
+    r"\b(?:man|woman|person|people|boy|girl|teacher|friend|friends|student|students) which\b",
+    r"\bin (?:monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b",
+    r"\barriv(?:e|ed|es|ing) to (?:the|a|my|our|his|her|their)\b",
+    r"\bsuggest(?:ed|s|ing)? to (?:go|do|eat|buy|see|visit|take|make|play|watch|have|try)\b",
+    # 间接疑问句不倒装：I don't know where is the station
+    r"\b(?:know|tell me|tell us|wonder|asked|ask|remember|understand) (?:what|where|when|why|how|who) (?:is|are|was|were) "
+    r"(?:the|your|my|his|her|its|their|our|this|that|these|those)\b",
+    r"\b(?:informations|advices|knowledges|homeworks|furnitures|equipments|luggages|childrens|peoples)\b",
+)]
+
+
+def tokenize(sentence: str) -> List[str]:
+    # 手机输入法常用弯引号作撇号
+    return TOKEN_PATTERN.findall(sentence.replace("’", "'"))
+
+
+def _third_person_forms(verb: str) -> List[str]:
+    if verb in ("have", "be", "do", "go"):
+        return [{"have": "has", "be": "is", "do": "does", "go": "goes"}[verb]]
+    if verb.endswith("y") and verb[-2] not in "aeiou":
+        return [verb[:-1] + "ies"]
+    if verb.endswith(("s", "sh", "ch", "x", "z", "o")):
+        return [verb + "es"]
+    return [verb + "s"]
+
+
+THIRD_PERSON_VERBS = frozenset(form for verb in BASE_VERBS for form in _third_person_forms(verb))
+
+
+def _is_regular_past(word: str) -> bool:
+    if not word.endswith("ed"):
+        return False
+    return word[:-2] in BASE_VERBS or word[:-1] in BASE_VERBS or (word.endswith("ied") and word[:-3] + "y" in BASE_VERBS)
+
+
+def _base_of_ing(word: str) -> str:
+    """swimming -> swim、making -> make、playing -> play"""
+    stem = word[:-3]
+    if len(stem) >= 3 and stem[-1] == stem[-2]:
+        return stem[:-1]
+    return stem if stem in BASE_VERBS else stem + "e"
+
+
+def _missing_plural(words: List[str], i: int, index) -> bool:
+    """数量词后的 words[i] 是可数名词的单数形式，且后面紧跟的不是名词（three apple on、many friend in）"""
+    if i >= len(words):
+        return False
+    noun = words[i]
+    if noun in NOT_PLURALIZED or noun in SHORT_ADJECTIVES or noun.endswith("s"):
+        return False
+    if i + 1 < len(words) and words[i + 1] not in AFTER_NOUN:
+        return False
+    plurals = [noun + "s", noun + "es"] + ([noun[:-1] + "ies"] if noun.endswith("y") else [])
+    return any(plural in index and index.log_freq(plural) >= 6.0 for plural in plurals)
+
+
+def _noun_verb_disagree(words: List[str], i: int, possessive: bool, index) -> bool:
+    """限定词后的名词 words[i] 与紧跟的谓语单复数不一致
+
+    单数名词 + are / have / 动词原形（原形只在 my、his 等物主代词后判断，the school play 这类复合名词容易误判），
+    复数名词 + is / has。
+    """
+    if i + 1 >= len(words):
+        return False
+    noun = words[i]
+    if noun in NOT_PLURALIZED or noun in SHORT_ADJECTIVES or noun not in index:
+        return False
+    verb = _skip_adverbs(words, i + 1)
+    if noun.endswith("s") and not noun.endswith("ss") and noun not in S_SINGULARS:
+        return verb in SINGULAR_ONLY_VERBS and noun[:-1] in index and index.log_freq(noun[:-1]) >= 6.0
+    if verb in PLURAL_ONLY_VERBS:
+        return True
+    return possessive and verb in VERB_ONLY
+
+
+def _skip_adverbs(words: List[str], i: int) -> Optional[str]:
+    """words[i] 起跳过副词后的第一个词"""
+    while i < len(words) and words[i] in ADVERBS:
+        i += 1
+    return words[i] if i < len(words) else None
+
+
+def find_rule_issue(sentence: str, index=None) -> Optional[str]:
+    """按规则检查句子，返回第一个命中的规则名，没有命中返回 None
+
+    规则只覆盖不依赖词性标注就能可靠判断的错误，命中任意一条都交给 LLM；
+    index 为拼写索引（SymSpell），为 None 时跳过拼写检查。
+    """
+    stripped = sentence.strip()
+    tokens = tokenize(stripped)
+    words = [t.lower() for t in tokens if t[0].isalpha()]
+    if not words:
+        return "not_a_sentence"
+
+    first_alpha = next(t for t in tokens if t[0].isalpha())
+    if first_alpha[0].islower() or any(t == "i" or t.startswith("i'") for t in tokens):
+        return "capitalization"
+    if any(t[0].islower() and t in PROPER_WORDS for t in tokens):
+        return "capitalization"
+    if stripped.rstrip("\"'”’)")[-1:] not in (".", "!", "?"):
+        return "punctuation"
+
+    if index is not None:
+        for position, token in enumerate(tokens):
+            if not token[0].isalpha() or not token.isascii() or (token.isupper() and len(token) > 1):
+                continue
+            # 句中首字母大写的未知词可能是人名、地名
+            if position > 0 and token[0].isupper():
+                continue
+            word = token.lower()
+            if word in index or word.split("'")[0] in index:
+                continue
+            if "-" in word and all(part in index for part in word.split("-")):
+                continue
+            return "spelling"
+
+    for a, b in zip(words, words[1:]):
+        if a == b and a not in ("had", "that"):
+            return "repetition"
+
+    for i, token in enumerate(tokens[:-1]):
+        nxt = tokens[i + 1]
+        if not nxt[0].isalpha() or (nxt.isupper() and len(nxt) > 1) or (len(nxt) == 1 and nxt.isupper()):
+            continue
+        lowered = nxt.lower()
+        needs_an = (lowered[0] in "aeiou" and not lowered.startswith(A_BEFORE_VOWEL)) or lowered.startswith(AN_BEFORE_H)
+        if (token.lower() == "a" and needs_an) or (token.lower() == "an" and not needs_an):
+            return "article"
+
+    text = " ".join(t.lower() for t in tokens)
+    if any(pattern.search(text) for pattern in COLLOCATION_ERRORS):
+        return "collocation"
+    if re.search(r"\b(?:should|could|would|might|must) of\b", text):
+        return "verb_form"
+    if words[0] in ("although", "though") and re.search(r", but\b", stripped.lower()):
+        return "conjunction"
+    if words[0] == "because" and re.search(r", so\b", stripped.lower()):
+        return "conjunction"
+    if words[0] in SUBORDINATORS and "," not in stripped:
+        return "fragment"
+
+    for i, word in enumerate(words):
+        previous = words[i - 1] if i else None
+        nxt = _skip_adverbs(words, i + 1)
+        if nxt is None:
+            break
+        if word in THIRD_PERSON and previous not in SUBJECT_GUARDS:
+            if nxt in BASE_VERBS or nxt in ("are", "have", "don't", "aren't", "haven't"):
+                return "agreement"
+        if word in PLURAL_PRONOUNS and previous not in SUBJECT_GUARDS:
+            if nxt in THIRD_PERSON_VERBS or nxt in ("doesn't", "hasn't", "isn't") or (word != "you" and nxt == "is"):
+                return "agreement"
+            if word != "i" and nxt in ("was", "wasn't"):
+                return "agreement"
+        if word in BE_FORMS and previous not in SUBJECT_GUARDS and i + 1 < len(words) and words[i + 1] in BE_FORMS[word]:
+            after = _skip_adverbs(words, i + 2)
+            if after in BASE_VERBS and after not in BE_COMPLEMENTS and after != "be":
+                return "verb_form"
+        if word == "there" and i + 1 < len(words):
+            if words[i + 1] in ("is", "was") and nxt in ("is", "was"):
+                quantity = _skip_adverbs(words, i + 2)
+                if quantity in ("many", "several", "two", "three", "four", "five", "numerous"):
+                    return "agreement"
+            if words[i + 1] in ("are", "were") and _skip_adverbs(words, i + 2) in ("a", "an", "one", "much"):
+                # there are a few / a lot of / a couple of 是正确的
+                if i + 3 >= len(words) or words[i + 3] not in ("few", "lot", "couple", "number"):
+                    return "agreement"
+        if word in DO_FORMS and (nxt in PAST_FORMS or nxt in THIRD_PERSON_VERBS or _is_regular_past(nxt)):
+            return "verb_form"
+        if word in MODALS and previous not in ("the", "a", "his", "her", "my", "your", "their", "our", "free"):
+            if nxt == "to" or nxt in PAST_FORMS or nxt in THIRD_PERSON_VERBS or _is_regular_past(nxt):
+                return "verb_form"
+            if nxt.endswith("ing") and _base_of_ing(nxt) in BASE_VERBS:
+                return "verb_form"
+        # want go、decide buy：缺少 to
+        if word in TO_VERBS and nxt in CLEAR_VERBS:
+            return "missing_word"
+        # I am used to get up：be used to 后面应为动名词
+        if word == "used" and BE_VERB_WORDS & set(words[max(0, i - 2):i]) and nxt == "to" and _skip_adverbs(words, i + 2) in CLEAR_VERBS:
+            return "verb_form"
+        # He very busy、It difficult 这类缺少谓语的情况只检查最明显的 very
+        if (word in THIRD_PERSON or word in PLURAL_PRONOUNS) and previous not in SUBJECT_GUARDS:
+            if words[i + 1] == "very" and i + 2 < len(words) and words[i + 2] != "much":
+                return "missing_word"
+        if word in ("i", "we") and words[i + 1] in BE_FORMS[word]:
+            j = i + 2
+            while j < len(words) and (words[j] in ADVERBS or words[j] in ("very", "so", "quite")):
+                j += 1
+            if j < len(words) and words[j] in ING_ADJECTIVES:
+                return "word_choice"
+        # I looking forward：进行时缺少 be 动词
+        if word in ("i", "he", "she", "we", "they") and previous not in SUBJECT_GUARDS:
+            if words[i + 1].endswith("ing") and _base_of_ing(words[i + 1]) in BASE_VERBS:
+                return "missing_word"
+        if word == "there" and i == 0 and words[i + 1] in ("many", "several", "some", "lots", "a", "an"):
+            return "missing_word"
+        if index is not None and word in QUANTIFIERS and _missing_plural(words, i + 1, index):
+            return "plural"
+        if index is not None and word == "one" and words[i + 1] == "of" and i + 3 < len(words):
+            if words[i + 2] in DETERMINERS and _missing_plural(words, i + 3, index):
+                return "plural"
+        if word in HAVE_FORMS and nxt in PAST_ONLY:
+            return "verb_form"
+        if word in ("more", "most") and words[i + 1] in COMPARATIVES:
+            return "comparative"
+        # My friend and I was：只看句首的并列主语，避免把 ", and I was" 这样的并列句算进来
+        if word == "and" and i <= 3 and words[i + 1] == "i" and i + 2 < len(words) and words[i + 2] in ("was", "is", "wasn't", "isn't"):
+            if not any(w in SUBJECT_WORDS or w in VERB_WORDS for w in words[:i]) and "," not in tokens[:i + 1]:
+                return "agreement"
+        # My brother have、My mother always cook、The weather are、My parents is：只看分句开头的主语
+        if index is not None and (i == 0 or previous in CLAUSE_STARTERS) and (word in POSSESSIVES or word in ("the", "this")):
+            if _noun_verb_disagree(words, i + 1, possessive=word in POSSESSIVES, index=index):
+                return "agreement"
+
+    if _tense_clash(words):
+        return "tense"
+    if _run_on(tokens):
+        return "punctuation"
+    if re.search(r"\b(?:am|is|are|i'm|he's|she's|it's|we're|they're) \w+ing\b.*\bsince (?:\d|last\b|this\b|yesterday\b|then\b)", text):
+        return "tense"
+    if re.search(r"\b(?:ago|yesterday|last (?:night|week|weekend|month|year|summer|winter))\b", text):
+        if re.search(r"\b(?:have|has|i've|we've|you've|they've) (?:\w+ )?(?:\w+ed|been|" + "|".join(PAST_FORMS) + r")\b", text):
+            return "tense"
+    return None
+
+
+def _run_on(tokens: List[str]) -> bool:
+    """两个主谓结构之间没有连词，只有空格或逗号（I was tired I went to bed、We had fun, we danced）"""
+    lowered = [t.lower() for t in tokens]
+    words = [t for t in lowered if t[0].isalpha()]
+    # 句首是从句时，第一个逗号是从句的结束
+    subordinate = bool(words) and words[0] in SUBORDINATORS
+    open_clause = False
+    for i, token in enumerate(lowered):
+        if token in CLAUSE_LINKS or token in (";", ":", "\"", "“", "”"):
+            open_clause = False
+            continue
+        if token == ",":
+            if subordinate:
+                subordinate = False
+                open_clause = False
+            continue
+        if token in ("i", "he", "she", "we", "they") and i + 1 < len(lowered):
+            verb = _skip_adverbs(lowered, i + 1) or ""
+            finite = (
+                verb in VERB_WORDS or verb in MODALS or verb in DO_FORMS or verb in PAST_FORMS
+                or verb.endswith("ed") or verb in THIRD_PERSON_VERBS or verb in BASE_VERBS
+            )
+            if finite:
+                if open_clause and i > 0 and (lowered[i - 1] == "," or lowered[i - 1] in RUN_ON_BEFORE):
+                    return True
+                open_clause = True
+            continue
+        if token in VERB_WORDS or token in PAST_FORMS or _is_regular_past(token):
+            open_clause = True
+    return False
+
+
+def _time_marker(words: List[str]) -> Optional[str]:
+    """分句中的过去 / 将来时间状语：yesterday、two days ago、last weekend、tomorrow、next month"""
+    for i, word in enumerate(words):
+        # the last time、the next day 不是时间状语
+        follows_article = i > 0 and words[i - 1] in ("the", "that", "this")
+        has_period = i + 1 < len(words) and words[i + 1] in PERIODS
+        if word in PAST_MARKERS or (word == "last" and has_period and not follows_article):
+            return "past"
+        if word in FUTURE_MARKERS or (word == "next" and has_period and not follows_article):
+            return "future"
+    return None
+
+
+def _tense_clash(words: List[str]) -> bool:
+    """时间状语所在分句中，代词主语后的动词时态与之不一致（I go to the park yesterday、Tomorrow I went）
+
+    按可能改变时态的连词切成分句；and、so 连接的并列分句共用同一个时间状语。
+    """
+    clauses, current = [], []
+    for word in words:
+        if word in TENSE_CLAUSE_BREAKS and current:
+            clauses.append(current)
+            current = []
+        current.append(word)
+    clauses.append(current)
+
+    for clause in clauses:
+        marker = _time_marker(clause)
+        if marker is None:
+            continue
+        for i, word in enumerate(clause[:-1]):
+            if word not in THIRD_PERSON and word not in PLURAL_PRONOUNS:
+                continue
+            if i > 0 and clause[i - 1] in SUBJECT_GUARDS:
+                continue
+            verb = _skip_adverbs(clause, i + 1) or ""
+            if marker == "past" and (verb in BASE_VERBS or verb in THIRD_PERSON_VERBS or verb in PAST_TENSE_CLASHES):
+                return True
+            if marker == "future" and (verb in PAST_FORMS or _is_regular_past(verb)):
+                return True
+    return False
+
+
+class GrammarTriage:
+    """/api/check-sentence 前的本地初筛
+
+    先跑规则，命中任何一条都交给 LLM；规则都通过后再检查常见词之间有没有常见二元组表中
+    从未出现过的组合，没有才在本地返回。超过 max_words 个词的句子不做本地判断。
+    规则和二元组检查只用来判断“句子没问题”，本地返回的结果不带润色建议。
+
+    之前在规则之后用的逻辑回归分类器，在非负权重约束下只剩下这一个特征有权重，
+    等价于“没有可疑的常见词组合”，所以直接使用这一条检查。
+    """
+
+    def __init__(
+        self,
+        bigrams_path: str = GRAMMAR_BIGRAMS_PATH,
+        max_words: int = GRAMMAR_TRIAGE_MAX_WORDS,
+        enabled: bool = GRAMMAR_TRIAGE_ENABLED
+    ):
+        self.bigrams_path = bigrams_path
+        self.max_words = max_words
+        self.enabled = enabled
+        self.bigrams: Optional[frozenset] = None
+        self.bigram_words: frozenset = frozenset()
+        self._lock = threading.Lock()
+        self.decisions: Counter = Counter()
+        self.load_seconds: Optional[float] = None
+
+    def load(self):
+        """加载拼写词典和二元组表，服务启动时在后台线程调用；加载完成前所有句子都交给 LLM"""
+        spell_checker.load()
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.bigrams is None:
+                start = time.perf_counter()
+                self.set_bigrams(self.load_bigrams(self.bigrams_path))
+                self.load_seconds = time.perf_counter() - start
+
+    @staticmethod
+    def load_bigrams(path: str) -> frozenset:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            return frozenset(line.rstrip("\n") for line in f if line.strip() and not line.startswith("#"))
+
+    def set_bigrams(self, bigrams: frozenset):
+        self.bigrams = bigrams
+        # 二元组表来源的词典只有英式拼写，不在表中的常见词（favorite、color 等）不参与判断
+        self.bigram_words = frozenset(word for pair in bigrams for word in pair.split())
+
+    def unseen_common_bigrams(self, sentence: str) -> List[str]:
+        """句子中两个常见词相邻、但在常见二元组表中从未出现过的组合"""
+        index = spell_checker.index
+        unseen = []
+        # 按标点切分成小句，跨标点的相邻词不算二元组
+        for clause in re.split(r"[^\sA-Za-z']+", sentence.replace("’", "'")):
+            words = [w.lower() for w in clause.split() if w]
+            for a, b in zip(words, words[1:]):
+                if a not in self.bigram_words or b not in self.bigram_words:
+                    continue
+                if a not in index or b not in index:
+                    continue
+                if min(index.log_freq(a), index.log_freq(b)) >= COMMON_WORD_LOG_FREQ and f"{a} {b}" not in self.bigrams:
+                    unseen.append(f"{a} {b}")
+        return unseen
+
+    def screen(self, sentence: str) -> Optional[str]:
+        """句子不能在本地判断的原因（过长或命中规则），可以做二元组检查时返回 None"""
+        if sum(1 for token in tokenize(sentence) if token[0].isalpha()) > self.max_words:
+            return "too_long"
+        return find_rule_issue(sentence, spell_checker.index)
+
+    def issue(self, sentence: str) -> Optional[str]:
+        """句子需要交给 LLM 的原因，本地可以判定为没有问题时返回 None"""
+        if not self.enabled or self.bigrams is None or spell_checker.index is None:
+            return "not_loaded"
+        issue = self.screen(sentence)
+        if issue is not None:
+            return issue
+        if self.unseen_common_bigrams(sentence):
+            return "unseen_bigram"
+        return None
+
+    def check(self, sentence: str) -> Tuple[Optional[dict], str]:
+        """返回 (结果, 原因)：可以在本地判定为没有问题时结果为 SentenceCheckResponse 的字段，否则为 None"""
+        reason = self.issue(sentence)
+        if reason is None:
+            result, reason = {
+                "is_complete": True,
+                "issues": [],
+                "suggestions": [],
+                # 没有经过 LLM 润色，给出“优秀”档的最低分
+                "overall_score": 0.9,
+                "explanation": "本地检查未发现语法问题",
+                "polished_sentence": None,
+                "polished_explanation": None
+            }, "clean"
+        else:
+            result = None
+        self.decisions[("local" if result is not None else "escalated", reason)] += 1
+        return result, reason
+
+    def stats(self) -> Dict[str, object]:
+        local = sum(n for (decision, _), n in self.decisions.items() if decision == "local")
+        escalated = sum(n for (decision, _), n in self.decisions.items() if decision == "escalated")
+        total = local + escalated
+        return {
+            "enabled": self.enabled,
+            "loaded": self.bigrams is not None,
+            "load_seconds": self.load_seconds,
+            "max_words": self.max_words,
+            "local": local,
+            "escalated": escalated,
+            "local_ratio": local / total if total else 0.0,
+            "reasons": {f"{decision}:{reason}": n for (decision, reason), n in sorted(self.decisions.items())}
+        }
+
+
+def load_examples(path: str) -> List[dict]:
+    """读取标注数据，每行 {"sentence": ..., "has_error": true/false, "category": ...}"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# 全局实例
+grammar_triage = GrammarTriage()
+
@@ -0,0 +1,65 @@
+import os
+import shutil
+import time
+import uuid
+
+# 索引目录的布局：
+#   <path>/CURRENT      当前版本的目录名
+#   <path>/v-<...>/     每次构建写入一个新的版本目录
+# 没有 CURRENT 文件时，索引文件直接位于 <path> 下（旧布局）。
+# 版本目录中的 manifest.json 记录构建参数（embedding 模型、切片参数、索引类型）和切片列表。
+CURRENT_FILE = "CURRENT"
+VERSION_PREFIX = "v-"
+MANIFEST_FILE = "manifest.json"
+
+
+def resolve_index_dir(path: str) -> str:
+    """返回当前生效的索引目录"""
+    try:
+        with open(os.path.join(path, CURRENT_FILE), "r", encoding="utf-8") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return path
+    return os.path.join(path, version)
+
+
+def new_version_dir(path: str) -> str:
+    """创建一个临时目录用于写入新版本，写完后调用 publish_version"""
+    os.makedirs(path, exist_ok=True)
+    # 纳秒时间戳保证版本目录按名字排序即按构建时间排序
+    version = f"{VERSION_PREFIX}{time.time_ns()}"
+    staging = os.path.join(path, version + ".tmp")
+    os.makedirs(staging)
+    return staging
+
+
+def publish_version(path: str, staging: str, keep: int = 2) -> str:
+    """原子地切换到新版本：先重命名目录，再替换 CURRENT 指针
+
+    正在运行的服务要么读到旧版本、要么读到新版本，不会读到写了一半的索引。
+    """
+    final = staging[:-len(".tmp")]
+    os.rename(staging, final)
+
+    pointer_tmp = os.path.join(path, f"{CURRENT_FILE}.{uuid.uuid4().hex}.tmp")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(os.path.basename(final))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, os.path.join(path, CURRENT_FILE))
+
+    cleanup_versions(path, keep)
+    return final
+
+
+def cleanup_versions(path: str, keep: int = 2):
+    """删除较旧的版本目录，保留最近 keep 个（包括当前版本）"""
+    current = os.path.basename(resolve_index_dir(path))
+    versions = sorted(
+        name for name in os.listdir(path)
+        if name.startswith(VERSION_PREFIX) and not name.endswith(".tmp")
+        and os.path.isdir(os.path.join(path, name))
+    )
+    for name in versions[:-keep] if keep > 0 else versions:
+        if name != current:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
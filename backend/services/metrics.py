@@ -0,0 +1,172 @@
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from services import profiling
+
+# 事件循环延迟的采样间隔（秒），0 表示不采样
+METRICS_LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", "0.5"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP 请求耗时", ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+STAGE_SECONDS = Histogram(
+    "stage_duration_seconds", "各处理阶段耗时（embedding、FAISS 检索、天气接口等）", ["stage"], buckets=LATENCY_BUCKETS
+)
+LLM_SECONDS = Histogram(
+    "llm_request_duration_seconds", "LLM 调用耗时", ["source", "model", "status"], buckets=LATENCY_BUCKETS
+)
+LLM_TOKENS = Counter("llm_tokens_total", "LLM 消耗的 token 数", ["source", "model", "kind"])
+TOOL_SECONDS = Histogram(
+    "agent_tool_duration_seconds", "Agent 工具调用耗时", ["tool", "status"], buckets=LATENCY_BUCKETS
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "event_loop_lag_seconds", "事件循环调度延迟", buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+SPELL_DECISIONS = Counter(
+    "spell_check_decisions_total", "单词检查在本地判定（local）或交给 LLM（escalated）的次数", ["decision", "reason"]
+)
+GRAMMAR_TRIAGE_DECISIONS = Counter(
+    "grammar_triage_decisions_total", "句子检查在本地判定为没有问题（local）或交给 LLM（escalated）的次数", ["decision", "reason"]
+)
+WS_CONNECTIONS = Gauge("ws_active_connections", "当前打开的 WebSocket 连接数")
+WS_CHECKS_IN_FLIGHT = Gauge("ws_checks_in_flight", "WebSocket 后台检查中尚未完成的任务数")
+
+
+@contextmanager
+def observe_stage(stage: str) -> Iterator[None]:
+    """记录 with 块的耗时，同步和异步代码中都可以使用；请求开启性能分析时同时记为一个区间"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        STAGE_SECONDS.labels(stage).observe(end - start)
+        profile = profiling.current()
+        if profile is not None:
+            profile.record(stage, "stage", start, end)
+
+
+def record_llm_call(source: str, model: str, seconds: float, usage: Any = None, status: str = "ok"):
+    """记录一次 LLM 调用；usage 为 OpenAI 的 response.usage 或同结构的 dict"""
+    LLM_SECONDS.labels(source, model, status).observe(seconds)
+    if usage is None:
+        return
+    if not isinstance(usage, dict):
+        usage = {"prompt_tokens": getattr(usage, "prompt_tokens", 0), "completion_tokens": getattr(usage, "completion_tokens", 0)}
+    for kind in ("prompt", "completion"):
+        tokens = usage.get(f"{kind}_tokens") or 0
+        if tokens:
+            LLM_TOKENS.labels(source, model, kind).inc(tokens)
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """LangChain 回调：记录 Agent 中每次 LLM 调用的耗时和 token 数，以及每次工具调用的耗时
+
+    按 run_id 记录开始时间，一个实例可以被并发的请求共享。
+    """
+
+    # 在事件循环中直接执行，避免回调被放进线程池后时间戳偏移
+    run_inline = True
+
+    def __init__(self, source: str = "agent"):
+        self.source = source
+        self._starts: Dict[UUID, tuple] = {}
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts, *, run_id: UUID, **kwargs: Any):
+        self._starts[run_id] = (time.perf_counter(), self._model_name(serialized, kwargs))
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages, *, run_id: UUID, **kwargs: Any):
+        self._starts[run_id] = (time.perf_counter(), self._model_name(serialized, kwargs))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        start, model = self._starts.pop(run_id, (None, "unknown"))
+        usage = (response.llm_output or {}).get("token_usage")
+        model = (response.llm_output or {}).get("model_name") or model
+        if start is not None:
+            record_llm_call(self.source, model, time.perf_counter() - start, usage)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        start, model = self._starts.pop(run_id, (None, "unknown"))
+        if start is not None:
+            record_llm_call(self.source, model, time.perf_counter() - start, status="error")
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any):
+        self._starts[run_id] = (time.perf_counter(), (serialized or {}).get("name", "unknown"))
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any):
+        self._finish_tool(run_id, "ok")
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._finish_tool(run_id, "error")
+
+    def _finish_tool(self, run_id: UUID, status: str):
+        start, tool = self._starts.pop(run_id, (None, "unknown"))
+        if start is not None:
+            TOOL_SECONDS.labels(tool, status).observe(time.perf_counter() - start)
+
+    @staticmethod
+    def _model_name(serialized: Dict[str, Any], kwargs: Dict[str, Any]) -> str:
+        params = kwargs.get("invocation_params") or {}
+        return params.get("model_name") or params.get("model") or (serialized or {}).get("name") or "unknown"
+
+
+class CacheStatsCollector:
+    """抓取时读取各缓存的 stats()，导出命中、未命中次数和命中率
+
+    stats() 需要返回包含 hits、misses 的 dict，可选 size。
+    """
+
+    def __init__(self):
+        self.sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def register(self, name: str, stats: Callable[[], Dict[str, Any]]):
+        self.sources[name] = stats
+
+    def collect(self):
+        hits = CounterMetricFamily("cache_hits", "缓存命中次数", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "缓存未命中次数", labels=["cache"])
+        ratio = GaugeMetricFamily("cache_hit_ratio", "缓存命中率", labels=["cache"])
+        size = GaugeMetricFamily("cache_entries", "缓存条目数", labels=["cache"])
+        for name, stats in self.sources.items():
+            try:
+                values = stats()
+            except Exception:
+                continue
+            total = values["hits"] + values["misses"]
+            hits.add_metric([name], values["hits"])
+            misses.add_metric([name], values["misses"])
+            ratio.add_metric([name], values["hits"] / total if total else 0.0)
+            if "size" in values:
+                size.add_metric([name], values["size"])
+        yield from (hits, misses, ratio, size)
+
+
+async def monitor_event_loop_lag(interval: float = METRICS_LOOP_LAG_INTERVAL):
+    """周期性 sleep，实际醒来时间比预期晚的部分即为事件循环被阻塞的时间"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - start - interval))
+
+
+def render_metrics() -> tuple:
+    """Prometheus 文本格式的指标和对应的 Content-Type"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+# 全局实例
+metrics_callback = MetricsCallbackHandler()
+cache_collector = CacheStatsCollector()
+REGISTRY.register(cache_collector)
@@ -0,0 +1,261 @@
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# 按需性能分析：只有开启 PROFILING_ENABLED 时，请求头 X-Profile: 1 或查询参数 ?profile=1 才会生效
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+
+# handle_parsing_errors=True 时，Agent 输出无法解析会以这个"工具"重试
+PARSING_ERROR_TOOL = "_Exception"
+
+_current: contextvars.ContextVar[Optional["Profile"]] = contextvars.ContextVar("profile", default=None)
+
+
+def requested(headers: Any, query_params: Any) -> bool:
+    """请求是否要求性能分析（且服务端允许）"""
+    if not PROFILING_ENABLED:
+        return False
+    flag = headers.get("x-profile") or query_params.get("profile") or ""
+    return flag.lower() in ("1", "true", "yes")
+
+
+def current() -> Optional["Profile"]:
+    """当前请求的 Profile，没有开启分析时为 None"""
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, kind: str = "stage", **attrs: Any) -> Iterator[None]:
+    """在当前请求的 Profile 中记录一个区间；没有开启分析时什么都不做"""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.record(name, kind, start, time.perf_counter(), **attrs)
+
+
+class StackSampler:
+    """后台线程按固定间隔采样调用栈，输出 collapsed stack 格式（flamegraph.pl、speedscope 可直接读取）
+
+    只采样事件循环线程和 tool-worker 线程池；线程池中空闲等待任务的栈会被丢弃。
+    采样期间同一进程中其它请求的栈也会被采到，结果适合看热点，不适合精确归因。
+    """
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, "")
+                if ident != self._target and not name.startswith("tool-worker"):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if ident != self._target and stack and stack[0].startswith(("wait (threading.py", "_worker (thread.py")):
+                    continue
+                stack.append("event-loop" if ident == self._target else name)
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+class Profile:
+    """一次请求的性能分析结果：区间列表（按时间包含关系组成树）和可选的采样栈"""
+
+    def __init__(self, sample: bool = False):
+        self.id = uuid.uuid4().hex[:16]
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self.sampler = StackSampler() if sample else None
+        self.callback = ProfileCallbackHandler(self)
+        self._token = None
+
+    def record(self, name: str, kind: str, start: float, end: float, **attrs: Any):
+        item = {
+            "name": name,
+            "kind": kind,
+            "start_ms": round((start - self.start) * 1000, 3),
+            "duration_ms": round((end - start) * 1000, 3),
+            **attrs
+        }
+        with self._lock:
+            self.spans.append(item)
+
+    def __enter__(self) -> "Profile":
+        self._token = _current.set(self)
+        if self.sampler is not None:
+            self.sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.end = time.perf_counter()
+        if self.sampler is not None:
+            self.sampler.stop()
+        _current.reset(self._token)
+
+    @property
+    def duration_ms(self) -> float:
+        return round(((self.end or time.perf_counter()) - self.start) * 1000, 3)
+
+    def tree(self) -> List[Dict[str, Any]]:
+        """按时间包含关系把区间组织成树；并发的兄弟区间挂在共同的外层区间下"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: (s["start_ms"], -s["duration_ms"]))
+        roots: List[Dict[str, Any]] = []
+        stack: List[Dict[str, Any]] = []
+        for item in spans:
+            node = {**item, "children": []}
+            end = node["start_ms"] + node["duration_ms"]
+            while stack and stack[-1]["start_ms"] + stack[-1]["duration_ms"] < end:
+                stack.pop()
+            (stack[-1]["children"] if stack else roots).append(node)
+            stack.append(node)
+        return roots
+
+    def step_timings(self) -> List[Dict[str, float]]:
+        """ReAct 每一步的耗时：产生该动作的 LLM 调用 + 工具执行，顺序与 intermediate_steps 一致"""
+        with self._lock:
+            spans = sorted((s for s in self.spans if s["kind"] in ("llm", "tool")), key=lambda s: s["start_ms"])
+        steps = []
+        llm_ms = 0.0
+        for item in spans:
+            if item["kind"] == "llm":
+                llm_ms += item["duration_ms"]
+                continue
+            steps.append({
+                "llm_ms": round(llm_ms, 3),
+                "tool_ms": item["duration_ms"],
+                "duration_ms": round(llm_ms + item["duration_ms"], 3)
+            })
+            llm_ms = 0.0
+        return steps
+
+    def timing_summary(self, step_count: int) -> Dict[str, Any]:
+        """decision_log 中的耗时拆分"""
+        with self._lock:
+            spans = list(self.spans)
+        llm = [s["duration_ms"] for s in spans if s["kind"] == "llm"]
+        tools = [s["duration_ms"] for s in spans if s["kind"] == "tool"]
+        steps = self.step_timings()[:step_count]
+        return {
+            "total_ms": self.duration_ms,
+            "llm_ms": round(sum(llm), 3),
+            "llm_calls": len(llm),
+            "tool_ms": round(sum(tools), 3),
+            "parsing_retries": sum(1 for s in spans if s["kind"] == "tool" and s["name"] == PARSING_ERROR_TOOL),
+            # 最后一次工具调用之后生成最终回答的 LLM 耗时
+            "final_llm_ms": round(sum(llm) - sum(step["llm_ms"] for step in steps), 3)
+        }
+
+    def save(self, directory: str = PROFILE_DIR) -> Dict[str, str]:
+        """保存区间树（JSON）和采样栈（collapsed 格式），返回文件路径"""
+        os.makedirs(directory, exist_ok=True)
+        paths = {"spans": os.path.join(directory, f"{self.id}.json")}
+        with open(paths["spans"], "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        if self.sampler is not None:
+            paths["folded"] = os.path.join(directory, f"{self.id}.folded")
+            with open(paths["folded"], "w", encoding="utf-8") as f:
+                f.write(self.sampler.collapsed())
+        return paths
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "duration_ms": self.duration_ms,
+            "samples": self.sampler.samples if self.sampler is not None else 0,
+            "spans": self.tree()
+        }
+
+
+class ProfileCallbackHandler(BaseCallbackHandler):
+    """LangChain 回调：把 chain、LLM、工具调用记录为 Profile 中的区间"""
+
+    # 在事件循环中直接执行，避免回调被放进线程池后时间戳偏移
+    run_inline = True
+
+    def __init__(self, profile: Profile):
+        self.profile = profile
+        self._starts: Dict[UUID, tuple] = {}
+
+    @staticmethod
+    def _name(serialized: Optional[Dict[str, Any]], kwargs: Dict[str, Any], default: str) -> str:
+        serialized = serialized or {}
+        return kwargs.get("name") or serialized.get("name") or (serialized.get("id") or [default])[-1]
+
+    def _begin(self, run_id: UUID, name: str, kind: str):
+        self._starts[run_id] = (time.perf_counter(), name, kind)
+
+    def _finish(self, run_id: UUID, **attrs: Any):
+        item = self._starts.pop(run_id, None)
+        if item is not None:
+            start, name, kind = item
+            self.profile.record(name, kind, start, time.perf_counter(), **attrs)
+
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, **kwargs: Any):
+        self._begin(run_id, self._name(serialized, kwargs, "chain"), "chain")
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id, error=repr(error))
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any):
+        self._begin(run_id, self._name(serialized, kwargs, "llm"), "llm")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any):
+        self._begin(run_id, self._name(serialized, kwargs, "llm"), "llm")
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        self._finish(run_id, **{k: usage[k] for k in ("prompt_tokens", "completion_tokens") if usage.get(k)})
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id, error=repr(error))
+
+    def on_tool_start(self, serialized, input_str: str, *, run_id: UUID, **kwargs: Any):
+        self._begin(run_id, self._name(serialized, kwargs, "tool"), "tool")
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id, error=repr(error))
@@ -1,29 +1,199 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from langchain_core.documents import Document
 from langchain_text_splitters import CharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
+from services.ann_index import ANN_INDEX_TYPE, INDEX_TYPES, build_index, index_type_of, reconstruct_all
+from services.chunk_store import load_mutable_vectorstore, save_vectorstore
+from services.concurrency import run_blocking
+from services.embedding_pipeline import EMBED_BATCH_SIZE, EMBED_WORKERS, embed_texts
+from services.index_storage import MANIFEST_FILE, new_version_dir, publish_version, resolve_index_dir
+from services.metrics import observe_stage
+from services.term_index import TermIndex, reciprocal_rank_fusion
+from services.vectorstore_registry import DEFAULT_EMBEDDING_MODEL, registry
+
+PHYSICS_INDEX_PATH = "vectorstore/physics"
+PHYSICS_SOURCE_DIR = "docs"
+
+# 构建过程中向量计算的断点目录，构建完成后删除
+EMBED_CHECKPOINT_DIR = ".embed-checkpoint"
+SOURCE_PATTERNS = ("*.txt", "*.md")
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+# 未命中术语时的检索方式：dense 仅向量检索，hybrid 为 BM25 与向量检索的 RRF 融合
+RAG_SEARCH_MODE = os.getenv("RAG_SEARCH_MODE", "dense")
+
+def chunk_id(source: str, content: str) -> str:
+    """切片的内容哈希，同时作为 docstore 中的 ID"""
+    return hashlib.sha256(f"{source}\0{content}".encode("utf-8")).hexdigest()
+
+def load_chunks(source_dir: str) -> Dict[str, Document]:
+    """读取目录下的所有源文件并切片，返回 {切片哈希: 文档}"""
+    splitter = CharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    chunks: Dict[str, Document] = {}
+    paths = sorted({p for pattern in SOURCE_PATTERNS for p in glob.glob(os.path.join(source_dir, "**", pattern), recursive=True)})
+    for path in paths:
+        source = os.path.relpath(path, source_dir).replace(os.sep, "/")
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        for doc in splitter.create_documents([text], metadatas=[{"source": source}]):
+            chunks[chunk_id(source, doc.page_content)] = doc
+    return chunks
+
+def load_manifest(index_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(index_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def build_vectorstore(
+    source_dir: str = PHYSICS_SOURCE_DIR,
+    index_path: str = PHYSICS_INDEX_PATH,
+    model_name: str = DEFAULT_EMBEDDING_MODEL,
+    full: bool = False,
+    batch_size: int = EMBED_BATCH_SIZE,
+    workers: int = EMBED_WORKERS,
+    index_type: Optional[str] = None
+) -> Tuple[int, int]:
+    """增量构建向量库，返回 (新增切片数, 删除切片数)
 
-def build_vectorstore():
-    with open("docs/physics.txt", "r", encoding="utf-8") as f:
-        text = f.read()
+    manifest 记录每个切片的内容哈希；重建时只为新增或修改的切片计算向量，
+    从索引中删除已不存在的切片，然后写入新版本目录并原子切换。
+    向量由 embedding_pipeline 分批并行计算，中断后重新运行会从断点继续。
+    增量更新在精确索引上进行，index_type 不是 flat 时最后再构建近似索引；
+    IVF-PQ 无法还原原始向量，每次都全量重建。
+    index_type 为 None 时沿用 manifest 中记录的索引类型和构建参数（例如 ann_index 转换过的索引），
+    没有记录时使用 ANN_INDEX_TYPE。
+    """
+    chunks = load_chunks(source_dir)
+    if not chunks:
+        raise ValueError(f"No source documents found in {source_dir}")
 
-    # 切分文本
-    splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    docs = splitter.create_documents([text])
+    params = {"embedding_model": model_name, "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+    previous_dir = resolve_index_dir(index_path)
+    manifest = load_manifest(previous_dir)
+    previous_params = (manifest or {}).get("params", {})
+    # 旧版本的 manifest 只在非 flat 时记录 index_type
+    previous_type = previous_params.get("index_type", "flat") if manifest is not None else None
+    if index_type is None:
+        index_type = previous_type or ANN_INDEX_TYPE
+    index_params = previous_params.get("index_params", {}) if index_type == previous_type else {}
+    # IVF-PQ 无法还原原始向量，新旧任何一方是 IVF-PQ 时都全量重建
+    if full or "ivf_pq" in (index_type, previous_type):
+        manifest = None
+    embeddings = registry.get_embeddings(model_name)
 
-    # 生成向量
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    vectorstore = FAISS.from_documents(docs, embeddings)
+    vectorstore = None
+    # 只有 embedding 和切片参数相同时才能复用已有向量，索引类型不同只需要重新构建索引
+    if manifest is not None and {key: previous_params.get(key) for key in params} == params:
+        # 加载一份独立的副本再修改，不影响服务中正在使用的实例
+        vectorstore = load_mutable_vectorstore(previous_dir, embeddings)
+        if index_type_of(vectorstore.index) != "flat":
+            vectorstore.index = build_index(reconstruct_all(vectorstore.index), "flat")
+        previous_ids = set(manifest["chunks"])
+    else:
+        previous_ids = set()
 
-    # 保存
-    vectorstore.save_local("vectorstore/physics")
+    added = [cid for cid in chunks if cid not in previous_ids]
+    removed = [cid for cid in previous_ids if cid not in chunks]
+    if vectorstore is not None and not added and not removed and index_type == previous_type:
+        print(f"Vector store {index_path} is up to date ({len(chunks)} chunks)")
+        return 0, 0
+
+    if vectorstore is not None and removed:
+        vectorstore.delete(removed)
+
+    if added:
+        texts = [chunks[cid].page_content for cid in added]
+        vectors, _ = embed_texts(
+            texts,
+            model_name=model_name,
+            batch_size=batch_size,
+            workers=workers,
+            checkpoint_dir=os.path.join(index_path, EMBED_CHECKPOINT_DIR)
+        )
+        text_embeddings = list(zip(texts, vectors.tolist()))
+        metadatas = [chunks[cid].metadata for cid in added]
+        if vectorstore is None:
+            vectorstore = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas, ids=added)
+        else:
+            vectorstore.add_embeddings(text_embeddings, metadatas=metadatas, ids=added)
+
+    if index_type != "flat":
+        vectorstore.index = build_index(reconstruct_all(vectorstore.index), index_type, **index_params)
+
+    # 写入新版本目录后原子切换
+    staging = new_version_dir(index_path)
+    save_vectorstore(vectorstore, staging)
+    TermIndex.build([row_document(vectorstore, row).page_content for row in range(vectorstore.index.ntotal)]).save(staging)
+    with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "params": {**params, "index_type": index_type, "index_params": index_params},
+            "chunks": {cid: chunks[cid].metadata for cid in chunks}
+        }, f, ensure_ascii=False, indent=2)
+    publish_version(index_path, staging)
+
+    print(f"Vector store {index_path}: +{len(added)} / -{len(removed)} chunks ({len(chunks)} total)")
+    return len(added), len(removed)
+
+def row_document(vectorstore: FAISS, row: int) -> Document:
+    """按 FAISS 行号取出切片"""
+    return vectorstore.docstore.search(vectorstore.index_to_docstore_id[row])
+
+def hybrid_search(vectorstore: FAISS, term_index: TermIndex, query: str, k: int = 4, fetch_k: int = 20) -> List[Document]:
+    """BM25 与向量检索各取 fetch_k 个候选，按名次融合后返回前 k 个"""
+    vector = np.asarray([registry.embed_query(query)], dtype=np.float32)
+    with observe_stage("faiss_search"):
+        _, rows = vectorstore.index.search(vector, fetch_k)
+    dense = [int(row) for row in rows[0] if row != -1]
+    sparse = [row for row, _ in term_index.bm25(query, fetch_k)]
+    return [row_document(vectorstore, row) for row in reciprocal_rank_fusion(dense, sparse)[:k]]
 
 def query_vectorstore(query: str) -> str:
     """Searches the vector store for a query and returns the most relevant document."""
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    vectorstore = FAISS.load_local("vectorstore/physics", embeddings, allow_dangerous_deserialization=True)
-    docs = vectorstore.similarity_search(query)
+    vectorstore = registry.get_vectorstore(PHYSICS_INDEX_PATH)
+    term_index = registry.get_term_index(PHYSICS_INDEX_PATH)
+    if term_index is not None:
+        # 查询中出现已知术语（LHC、BESIII 等）时直接查关键词索引，省去 embedding 推理
+        rows = term_index.lookup(query, k=1)
+        if rows:
+            return row_document(vectorstore, rows[0]).page_content
+        if RAG_SEARCH_MODE == "hybrid":
+            docs = registry.cached_search(
+                PHYSICS_INDEX_PATH, "hybrid", query, 4,
+                lambda: hybrid_search(vectorstore, term_index, query)
+            )
+            return docs[0].page_content if docs else "No relevant document found."
+    docs = registry.similarity_search(PHYSICS_INDEX_PATH, query)
     return docs[0].page_content if docs else "No relevant document found."
 
+async def aquery_vectorstore(query: str) -> str:
+    """query_vectorstore 的异步版本，embedding 推理和 FAISS 检索放到线程池执行"""
+    return await run_blocking(query_vectorstore, query)
+
 
 if __name__ == "__main__":
-    build_vectorstore()
+    parser = argparse.ArgumentParser(description="增量构建 FAISS 向量库")
+    parser.add_argument("--source", default=PHYSICS_SOURCE_DIR, help="源文件目录（*.txt, *.md）")
+    parser.add_argument("--index", default=PHYSICS_INDEX_PATH, help="向量库目录")
+    parser.add_argument("--full", action="store_true", help="忽略 manifest，全量重建")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="每批计算向量的切片数")
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS, help="计算向量的进程数")
+    parser.add_argument("--index-type", default=None, choices=INDEX_TYPES, help=f"FAISS 索引类型，默认沿用已有索引的类型，新建时为 {ANN_INDEX_TYPE}")
+    args = parser.parse_args()
+    build_vectorstore(
+        args.source,
+        args.index,
+        full=args.full,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        index_type=args.index_type
+    )
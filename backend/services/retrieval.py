@@ -0,0 +1,110 @@
+import asyncio
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+from services.cache import make_cache_key, normalize_text
+from services.concurrency import run_blocking
+from services.metrics import observe_stage
+from services.rag_builder import PHYSICS_INDEX_PATH, row_document
+from services.vectorstore_registry import DEFAULT_EMBEDDING_MODEL, registry
+
+TOASTMASTERS_INDEX_PATH = "indexes/toastmasters-faiss"
+
+# 可检索的索引：名称 -> 目录；RETRIEVAL_INDEXES 追加或覆盖，格式 "name=path,name=path"
+DEFAULT_INDEXES = {
+    "physics": PHYSICS_INDEX_PATH,
+    "toastmasters": TOASTMASTERS_INDEX_PATH
+}
+SEARCH_MAX_QUERIES = int(os.getenv("SEARCH_MAX_QUERIES", "64"))
+SEARCH_MAX_K = int(os.getenv("SEARCH_MAX_K", "50"))
+
+
+def configured_indexes() -> Dict[str, str]:
+    indexes = dict(DEFAULT_INDEXES)
+    for item in os.getenv("RETRIEVAL_INDEXES", "").split(","):
+        if "=" in item:
+            name, path = item.split("=", 1)
+            indexes[name.strip()] = path.strip()
+    return indexes
+
+
+class SearchRequest(BaseModel):
+    queries: List[str]
+    indexes: Optional[List[str]] = None
+    k: int = 4
+
+
+class SearchHit(BaseModel):
+    content: str
+    metadata: Dict[str, Any]
+    score: float
+
+
+class SearchResult(BaseModel):
+    query: str
+    # 索引名 -> 按 L2 距离升序排列的命中（越小越相似）
+    results: Dict[str, List[SearchHit]]
+
+
+class RetrievalService:
+    """多索引检索：同一批查询只计算一次向量，各索引的检索并行执行
+
+    向量库和查询向量都由 registry 加载和缓存，每个 (索引版本, 查询, k) 的结果也会缓存。
+    """
+
+    def __init__(self, indexes: Optional[Dict[str, str]] = None, model_name: str = DEFAULT_EMBEDDING_MODEL):
+        self.indexes = indexes if indexes is not None else configured_indexes()
+        self.model_name = model_name
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.indexes)
+
+    def warmup(self):
+        registry.warmup(self.indexes.values(), self.model_name)
+
+    async def search(self, queries: List[str], index_names: Optional[List[str]] = None, k: int = 4) -> List[SearchResult]:
+        names = index_names or self.names
+        unknown = [name for name in names if name not in self.indexes]
+        if unknown:
+            raise KeyError(f"Unknown index: {', '.join(unknown)}")
+
+        queries = [normalize_text(query) for query in queries]
+        vectors = await run_blocking(registry.embed_queries, queries, self.model_name)
+        per_index = await asyncio.gather(*(
+            run_blocking(self._search_index, name, queries, vectors, k) for name in names
+        ))
+        return [
+            SearchResult(query=query, results={name: hits[i] for name, hits in zip(names, per_index)})
+            for i, query in enumerate(queries)
+        ]
+
+    def _search_index(self, name: str, queries: List[str], vectors: np.ndarray, k: int) -> List[List[SearchHit]]:
+        """在一个索引上检索整批查询；缓存未命中的查询合并成一次 FAISS 调用"""
+        path = self.indexes[name]
+        vectorstore = registry.get_vectorstore(path, self.model_name)
+        fingerprint = registry.fingerprint(path)
+        keys = [make_cache_key("hits", path, self.model_name, fingerprint, query, k) for query in queries]
+
+        results: List[Optional[List[SearchHit]]] = [registry.result_cache.get(key) for key in keys]
+        missing = [i for i, hits in enumerate(results) if hits is None]
+        if missing:
+            with observe_stage("faiss_search"):
+                scores, rows = vectorstore.index.search(vectors[missing], k)
+            for j, i in enumerate(missing):
+                hits = []
+                for score, row in zip(scores[j], rows[j]):
+                    if row == -1:
+                        continue
+                    doc = row_document(vectorstore, int(row))
+                    hits.append(SearchHit(content=doc.page_content, metadata=doc.metadata, score=float(score)))
+                results[i] = hits
+                registry.result_cache.set(keys[i], hits)
+        return results
+
+
+# 全局实例
+retrieval_service = RetrievalService()
@@ -0,0 +1,158 @@
+import re
+from bisect import bisect_left
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# 句末标点（中英文标点均可），一个句子是一段非标点文本 + 一串句末标点
+TERMINATOR_PATTERN = re.compile(r'[.!?。！？]+')
+
+
+def iter_sentence_spans(text: str, pos: int = 0) -> Iterator[Tuple[int, int]]:
+    """从 pos 开始依次返回完整句子的 [start, end) 位置
+
+    逐个查找句末标点，末尾没有标点的部分只扫描一遍；
+    不能用 [^.!?]*[.!?]+ 配合 finditer，它会在没有标点的尾部从每个字符重新尝试匹配，耗时与尾部长度的平方成正比。
+    """
+    match = TERMINATOR_PATTERN.search(text, pos)
+    while match:
+        yield pos, match.end()
+        pos = match.end()
+        match = TERMINATOR_PATTERN.search(text, pos)
+
+
+def _common_prefix_len(a: str, b: str) -> int:
+    """两个字符串公共前缀的长度（二分 + 切片比较，比较在 C 层完成）"""
+    n = min(len(a), len(b))
+    if a[:n] == b[:n]:
+        return n
+    lo, hi = 0, n
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix_len(a: str, b: str, limit: int) -> int:
+    """两个字符串公共后缀的长度，最多 limit 个字符"""
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class IncrementalSegmenter:
+    """增量句子切分器
+
+    保存上一次的文本和完整句子的位置，每次更新只重新切分被修改的区域，
+    并报告新增、修改和删除的句子。末尾没有句末标点的部分不算完整句子。
+    """
+
+    def __init__(self):
+        self.text = ""
+        # 完整句子在 text 中的 [start, end) 位置，首尾相接地覆盖文本开头到最后一个句末标点
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+
+    @property
+    def sentences(self) -> List[str]:
+        return [self.text[s:e].strip() for s, e in zip(self._starts, self._ends)]
+
+    @property
+    def count(self) -> int:
+        return len(self._starts)
+
+    def sentence_at(self, index: int) -> Optional[str]:
+        """第 index 个完整句子，不存在时返回 None"""
+        if 0 <= index < len(self._starts):
+            return self.text[self._starts[index]:self._ends[index]].strip()
+        return None
+
+    def set_text(self, text: str) -> Dict[str, List[Dict[str, Any]]]:
+        """用完整文本更新，自动找出与上次文本不同的区域"""
+        old = self.text
+        if text == old:
+            return {"new": [], "changed": [], "removed": []}
+        if text.startswith(old):
+            # 最常见的情况：在末尾继续输入
+            start, end = len(old), len(old)
+        else:
+            start = _common_prefix_len(old, text)
+            suffix = _common_suffix_len(old, text, min(len(old), len(text)) - start)
+            end = len(old) - suffix
+        inserted = len(text) - (len(old) - (end - start))
+        return self._update(start, end, inserted, text)
+
+    def apply_patch(self, start: int, end: int, replacement: str) -> Dict[str, List[Dict[str, Any]]]:
+        """用补丁更新：把 text[start:end] 替换为 replacement"""
+        if not 0 <= start <= end <= len(self.text):
+            raise ValueError(f"Patch range [{start}, {end}) out of bounds for text of length {len(self.text)}")
+        text = self.text[:start] + replacement + self.text[end:]
+        return self._update(start, end, len(replacement), text)
+
+    def _update(self, start: int, end: int, inserted: int, text: str) -> Dict[str, List[Dict[str, Any]]]:
+        old_text = self.text
+        old_starts, old_ends = self._starts, self._ends
+        delta = inserted - (end - start)
+        edit_end = start + inserted
+
+        # 第一个可能受影响的句子：结束位置不早于修改起点（紧贴修改点的句末标点可能被延长）
+        first = bisect_left(old_ends, start)
+        if first < len(old_starts):
+            scan_from = old_starts[first]
+        else:
+            scan_from = old_ends[-1] if old_ends else 0
+
+        # 从受影响的句子开始重新切分，直到新句子的结尾与某个旧句子的结尾重新对齐
+        new_spans: List[Tuple[int, int]] = []
+        resume = len(old_ends)
+        j = first
+        for span in iter_sentence_spans(text, scan_from):
+            new_spans.append(span)
+            if span[1] < edit_end:
+                continue
+            old_end = span[1] - delta
+            while j < len(old_ends) and old_ends[j] < old_end:
+                j += 1
+            if j < len(old_ends) and old_ends[j] == old_end:
+                resume = j + 1
+                break
+
+        old_sentences = [old_text[s:e].strip() for s, e in zip(old_starts[first:resume], old_ends[first:resume])]
+        new_sentences = [text[s:e].strip() for s, e in new_spans]
+
+        self.text = text
+        # 原地替换受影响的区间；只有修改点之后还有句子时才需要整体平移
+        if delta and resume < len(old_ends):
+            old_starts[resume:] = [s + delta for s in old_starts[resume:]]
+            old_ends[resume:] = [e + delta for e in old_ends[resume:]]
+        old_starts[first:resume] = [s for s, _ in new_spans]
+        old_ends[first:resume] = [e for _, e in new_spans]
+
+        return self._diff(first, old_sentences, new_sentences, new_spans)
+
+    def _diff(self, first: int, old: List[str], new: List[str], new_spans: List[Tuple[int, int]]) -> Dict[str, List[Dict[str, Any]]]:
+        """对比受影响区域内的新旧句子，去掉首尾未变化的部分"""
+        head = 0
+        while head < len(old) and head < len(new) and old[head] == new[head]:
+            head += 1
+        tail = 0
+        while tail < len(old) - head and tail < len(new) - head and old[-1 - tail] == new[-1 - tail]:
+            tail += 1
+
+        old_mid = old[head:len(old) - tail]
+        new_mid = list(range(head, len(new) - tail))
+        diff: Dict[str, List[Dict[str, Any]]] = {"new": [], "changed": [], "removed": []}
+
+        for k, pos in enumerate(new_mid):
+            start, end = new_spans[pos]
+            item = {"index": first + pos, "text": new[pos], "start": start, "end": end}
+            diff["changed" if k < len(old_mid) else "new"].append(item)
+        for k in range(len(new_mid), len(old_mid)):
+            diff["removed"].append({"index": first + head + k, "text": old_mid[k]})
+        return diff
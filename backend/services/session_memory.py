@@ -0,0 +1,73 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List
+
+from langchain.memory import ConversationSummaryBufferMemory
+from langchain_core.language_models import BaseLanguageModel
+
+# 每个会话保留原文的 token 预算，超出部分滚动压缩为摘要
+ASK_MEMORY_MAX_TOKENS = int(os.getenv("ASK_MEMORY_MAX_TOKENS", "1000"))
+# 同时保留的会话数上限和空闲过期时间（秒）
+ASK_MAX_SESSIONS = int(os.getenv("ASK_MAX_SESSIONS", "1000"))
+ASK_SESSION_TTL = float(os.getenv("ASK_SESSION_TTL", "3600"))
+# /ask 响应中返回的最近消息条数
+ASK_HISTORY_WINDOW = int(os.getenv("ASK_HISTORY_WINDOW", "10"))
+
+
+class SessionMemoryStore:
+    """按会话 ID 保存 /ask 的对话记忆
+
+    - 每个会话使用 ConversationSummaryBufferMemory，原文超出 token 预算后滚动摘要
+    - 会话数超过上限时淘汰最久未使用的，空闲超过 ttl 的会话也会被淘汰
+    """
+
+    def __init__(
+        self,
+        llm: BaseLanguageModel,
+        max_sessions: int = ASK_MAX_SESSIONS,
+        ttl: float = ASK_SESSION_TTL,
+        max_token_limit: int = ASK_MEMORY_MAX_TOKENS
+    ):
+        self.llm = llm
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_token_limit = max_token_limit
+        self._lock = threading.Lock()
+        # session_id -> (memory, last_used)
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, session_id: str) -> ConversationSummaryBufferMemory:
+        """获取会话记忆，不存在时创建"""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            item = self._sessions.pop(session_id, None)
+            memory = item[0] if item is not None else ConversationSummaryBufferMemory(
+                llm=self.llm,
+                max_token_limit=self.max_token_limit,
+                memory_key="chat_history",
+                return_messages=True
+            )
+            self._sessions[session_id] = (memory, now)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return memory
+
+    def _evict_expired(self, now: float):
+        # 按最近使用排序，从最旧的开始检查即可
+        while self._sessions:
+            session_id, (_, last_used) = next(iter(self._sessions.items()))
+            if now - last_used <= self.ttl:
+                break
+            del self._sessions[session_id]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+def history_window(memory: ConversationSummaryBufferMemory, window: int = ASK_HISTORY_WINDOW) -> List[Dict[str, str]]:
+    """最近 window 条消息，用于 /ask 响应中的 history 字段"""
+    messages = memory.chat_memory.messages[-window:] if window > 0 else []
+    return [{"role": msg.type, "content": msg.content} for msg in messages]
@@ -0,0 +1,212 @@
+import gzip
+import os
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 本地拼写检查：明显正确的单词和只有一个合理改法的单编辑错误不再调用 LLM
+SPELL_CHECK_ENABLED = os.getenv("SPELL_CHECK_ENABLED", "true").lower() == "true"
+SPELL_DICTIONARY_PATH = os.getenv(
+    "SPELL_DICTIONARY_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "en_word_freq.txt.gz")
+)
+# 删除变体只取单词前 prefix_length 个字符，索引大小与词长无关
+SPELL_PREFIX_LENGTH = int(os.getenv("SPELL_PREFIX_LENGTH", "7"))
+# 最常见的候选词频率至少是第二名的 10^dominance 倍，才认为改法没有歧义
+SPELL_DOMINANCE = float(os.getenv("SPELL_DOMINANCE", "1.0"))
+# 候选词的 log10 词频下限，太生僻的候选不直接采用
+SPELL_MIN_LOG_FREQ = float(os.getenv("SPELL_MIN_LOG_FREQ", "5.0"))
+
+# 允许结尾的撇号（复数所有格 friends'）
+WORD_PATTERN = re.compile(r"^[A-Za-z]+(?:['-][A-Za-z]+)*'?$")
+
+# 本身拼写正确、但是否用对取决于上下文的词，有上下文时交给 LLM 判断
+CONFUSABLES = frozenset("""
+their there they're your you're its it's then than to too two affect effect accept except
+lose loose whose who's weather whether were where we're quiet quite advice advise
+principal principle stationary stationery complement compliment passed past breath breathe
+""".split())
+
+
+def _deletes(word: str) -> set:
+    """单词（前缀）本身以及删除一个字符后的所有变体"""
+    return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def within_one_edit(a: str, b: str) -> bool:
+    """a、b 之间是否最多相差一次编辑（插入、删除、替换或相邻字符交换）"""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    i = 0
+    while i < min(la, lb) and a[i] == b[i]:
+        i += 1
+    if la == lb:
+        return a[i + 1:] == b[i + 1:] or (
+            i + 1 < la and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]
+        )
+    return a[i + 1:] == b[i:] if la > lb else a[i:] == b[i + 1:]
+
+
+class SymSpell:
+    """对称删除（SymSpell）拼写索引，编辑距离为 1
+
+    每个词典词的前缀删除一个字符后的变体都指向该词；查询时对输入做同样的删除，
+    共享变体的词就是候选，再逐个验证编辑距离。变体以哈希值排序存放在 numpy 数组中，
+    8 万词的索引约 8MB，查找是几次 searchsorted。哈希冲突只会多出候选，验证时会被排除。
+    """
+
+    def __init__(self, words: List[str], log_freqs: List[float], prefix_length: int = SPELL_PREFIX_LENGTH):
+        self.prefix_length = prefix_length
+        self.words = words
+        self.log_freqs = np.asarray(log_freqs, dtype=np.float32)
+        self.word_ids: Dict[str, int] = {word: i for i, word in enumerate(words)}
+
+        hashes = array("q")
+        ids = array("i")
+        for i, word in enumerate(words):
+            for variant in _deletes(word[:prefix_length]):
+                hashes.append(hash(variant))
+                ids.append(i)
+        hashes = np.frombuffer(hashes, dtype=np.int64)
+        order = np.argsort(hashes, kind="stable")
+        self.hashes = hashes[order]
+        self.ids = np.frombuffer(ids, dtype=np.int32)[order]
+
+    @classmethod
+    def load(cls, path: str = SPELL_DICTIONARY_PATH, prefix_length: int = SPELL_PREFIX_LENGTH) -> "SymSpell":
+        """读取 "单词 log10词频" 格式的词典，# 开头的行是注释；支持 .gz"""
+        opener = gzip.open if path.endswith(".gz") else open
+        words, log_freqs = [], []
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("#") or not line.strip():
+                    continue
+                word, log_freq = line.split()
+                words.append(word)
+                log_freqs.append(float(log_freq))
+        return cls(words, log_freqs, prefix_length)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.word_ids
+
+    def log_freq(self, word: str) -> float:
+        return float(self.log_freqs[self.word_ids[word]])
+
+    def candidates(self, word: str) -> List[Tuple[str, float]]:
+        """编辑距离为 1 的词典词，按词频降序，返回 [(单词, log10 词频)]"""
+        keys = np.fromiter((hash(v) for v in _deletes(word[:self.prefix_length])), dtype=np.int64)
+        left = np.searchsorted(self.hashes, keys, "left")
+        right = np.searchsorted(self.hashes, keys, "right")
+        found = set()
+        for start, end in zip(left, right):
+            found.update(self.ids[start:end].tolist())
+        matches = [(self.words[i], float(self.log_freqs[i])) for i in found if within_one_edit(word, self.words[i])]
+        return sorted(matches, key=lambda item: -item[1])
+
+
+class SpellChecker:
+    """/api/check-word 前的本地拼写检查
+
+    check() 返回 (结果, 原因)：能在本地确定时结果为 WordCheckResponse 的字段，否则为 None，
+    由调用方交给 LLM。以下情况交给 LLM：词典还没加载完、不是普通英文单词、首字母大写的
+    未知词（可能是专有名词）、有上下文的易混词、没有候选或有多个相近的候选。
+    """
+
+    def __init__(
+        self,
+        path: str = SPELL_DICTIONARY_PATH,
+        dominance: float = SPELL_DOMINANCE,
+        min_log_freq: float = SPELL_MIN_LOG_FREQ,
+        enabled: bool = SPELL_CHECK_ENABLED
+    ):
+        self.path = path
+        self.dominance = dominance
+        self.min_log_freq = min_log_freq
+        self.enabled = enabled
+        self.index: Optional[SymSpell] = None
+        self._lock = threading.Lock()
+        self.decisions: Counter = Counter()
+        self.load_seconds: Optional[float] = None
+
+    def load(self):
+        """构建索引（约几秒），服务启动时在后台线程调用；加载完成前所有单词都交给 LLM"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.index is None:
+                start = time.perf_counter()
+                self.index = SymSpell.load(self.path)
+                self.load_seconds = time.perf_counter() - start
+
+    def check(self, word: str, context: Optional[str] = None) -> Tuple[Optional[dict], str]:
+        result, reason = self._decide(word, context)
+        self.decisions[("local" if result is not None else "escalated", reason)] += 1
+        return result, reason
+
+    def _decide(self, word: str, context: Optional[str]) -> Tuple[Optional[dict], str]:
+        index = self.index
+        if not self.enabled or index is None:
+            return None, "not_loaded"
+        # 手机输入法常用弯引号作撇号
+        word = word.strip().strip(".,!?;:\"()").replace("’", "'")
+        if not WORD_PATTERN.match(word):
+            return None, "not_a_word"
+        lowered = word.lower()
+
+        if self._known(index, lowered):
+            if context and lowered in CONFUSABLES:
+                return None, "confusable"
+            return {"is_correct": True, "suggestions": [], "explanation": "拼写正确", "confidence": 1.0}, "known"
+
+        if word[0].isupper():
+            return None, "proper_noun"
+        # 不认识的缩写（y'all、would've 等）按编辑距离纠正容易改错，交给 LLM
+        if "'" in word:
+            return None, "apostrophe"
+        candidates = [item for item in index.candidates(lowered) if item[1] >= self.min_log_freq]
+        if not candidates:
+            return None, "no_candidate"
+        if len(candidates) > 1 and candidates[0][1] - candidates[1][1] < self.dominance:
+            return None, "ambiguous"
+        best = candidates[0][0]
+        return {
+            "is_correct": False,
+            "suggestions": [best] + [w for w, _ in candidates[1:3]],
+            "explanation": f"“{word}” 拼写有误，应为 “{best}”",
+            "confidence": 0.9
+        }, "corrected"
+
+    @staticmethod
+    def _known(index: SymSpell, word: str) -> bool:
+        if word in index:
+            return True
+        # 所有格（mom's、friends'）的词干是已知词时视为正确
+        if word.endswith("'s") or word.endswith("s'"):
+            return SpellChecker._known(index, word[:-2] if word.endswith("'s") else word[:-1])
+        # 连字符复合词的每一部分都是已知词时视为正确
+        return "-" in word and all(part in index for part in word.split("-"))
+
+    def stats(self) -> Dict[str, object]:
+        local = sum(n for (decision, _), n in self.decisions.items() if decision == "local")
+        escalated = sum(n for (decision, _), n in self.decisions.items() if decision == "escalated")
+        total = local + escalated
+        return {
+            "enabled": self.enabled,
+            "loaded": self.index is not None,
+            "load_seconds": self.load_seconds,
+            "local": local,
+            "escalated": escalated,
+            "local_ratio": local / total if total else 0.0,
+            "reasons": {f"{decision}:{reason}": n for (decision, reason), n in sorted(self.decisions.items())}
+        }
+
+
+# 全局实例
+spell_checker = SpellChecker()
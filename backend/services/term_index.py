@@ -0,0 +1,211 @@
+import argparse
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict, deque
+from typing import Dict, Iterable, List, Tuple
+
+from services.index_storage import resolve_index_dir
+
+# 与向量库放在同一个目录，行号与 FAISS 向量一一对应
+TERMS_FILE = "terms.json"
+
+# 专有名词：全大写缩写（LHC、BESIII、LHAASO），以及紧跟其后括号里的全称/译名
+ACRONYM_PATTERN = re.compile(r"\b[A-Z][A-Z0-9]{1,}[a-z]?\b")
+ALIAS_PATTERN = re.compile(r"\b([A-Z][A-Z0-9]{1,}[a-z]?)\s*[（(]([^）)]+)[）)]")
+ALIAS_SEPARATORS = re.compile(r"[，,、;；]")
+LOWERCASE_WORD_PATTERN = re.compile(r"\b[a-z][a-z0-9]*\b")
+# BM25 分词：英文按单词，中文按相邻两字
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+CJK_PATTERN = re.compile(r"[一-鿿]+")
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    text = text.lower()
+    tokens = WORD_PATTERN.findall(text)
+    for run in CJK_PATTERN.findall(text):
+        tokens.extend(run[i:i + 2] for i in range(max(1, len(run) - 1)))
+    return tokens
+
+
+class AhoCorasick:
+    """多模式串匹配自动机，一次扫描找出文本中出现的所有术语"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[str]] = [[]]
+        for pattern in patterns:
+            self._add(pattern)
+        self._link()
+
+    def _add(self, pattern: str):
+        node = 0
+        for char in pattern:
+            if char not in self.goto[node]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[node][char] = len(self.goto) - 1
+            node = self.goto[node][char]
+        self.output[node].append(pattern)
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fail = self.fail[node]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[child] = self.goto[fail].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def iter_matches(self, text: str) -> Iterable[Tuple[int, str]]:
+        """产出 (结束位置, 术语)"""
+        node = 0
+        for pos, char in enumerate(text):
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            for pattern in self.output[node]:
+                yield pos + 1, pattern
+
+
+class TermIndex:
+    """向量库旁的关键词索引
+
+    - 术语表：自动从切片中抽取的缩写及其别名，查询命中术语时直接定位切片，不需要 embedding
+    - 倒排表：BM25 打分，用于稀疏+稠密的混合检索
+    """
+
+    def __init__(self, aliases: Dict[str, str], term_rows: Dict[str, Dict[str, int]], postings: Dict[str, Dict[str, int]], doc_lengths: List[int]):
+        # 别名（小写）-> 规范术语
+        self.aliases = aliases
+        # 规范术语 -> {行号: 出现次数}
+        self.term_rows = term_rows
+        # 词 -> {行号: 词频}
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.avg_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+        self.automaton = AhoCorasick(aliases)
+
+    @classmethod
+    def build(cls, texts: List[str]) -> "TermIndex":
+        # 全大写的标题（如 "LEADERSHIP AND GROWTH"）里的普通单词不算术语：
+        # 在语料中以小写形式出现过的词都排除掉
+        common_words = {word for text in texts for word in LOWERCASE_WORD_PATTERN.findall(text)}
+        aliases: Dict[str, str] = {}
+        for text in texts:
+            for term in ACRONYM_PATTERN.findall(text):
+                if term.lower() not in common_words:
+                    aliases.setdefault(term.lower(), term)
+            for term, expansion in ALIAS_PATTERN.findall(text):
+                for alias in ALIAS_SEPARATORS.split(expansion):
+                    alias = alias.strip()
+                    if len(alias) >= 2:
+                        aliases.setdefault(alias.lower(), term)
+
+        index = cls(aliases, {}, {}, [])
+        term_rows: Dict[str, Dict[str, int]] = defaultdict(dict)
+        postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        doc_lengths = []
+        for row, text in enumerate(texts):
+            for term, count in Counter(index.match(text)).items():
+                term_rows[term][str(row)] = count
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            for token, count in Counter(tokens).items():
+                postings[token][str(row)] = count
+        return cls(aliases, dict(term_rows), dict(postings), doc_lengths)
+
+    def match(self, text: str) -> List[str]:
+        """文本中出现的规范术语（按出现顺序，可重复）
+
+        英文术语要求两侧不是字母或数字，避免 LHC 命中 LHCb 之类的更长单词。
+        """
+        lowered = text.lower()
+        terms = []
+        for end, alias in self.automaton.iter_matches(lowered):
+            start = end - len(alias)
+            if alias[0].isascii() and alias[0].isalnum() and start > 0 and lowered[start - 1].isascii() and lowered[start - 1].isalnum():
+                continue
+            if alias[-1].isascii() and alias[-1].isalnum() and end < len(lowered) and lowered[end].isascii() and lowered[end].isalnum():
+                continue
+            terms.append(self.aliases[alias])
+        return terms
+
+    def lookup(self, query: str, k: int = 4) -> List[int]:
+        """按查询中出现的术语定位切片，返回最相关的行号；没有命中时返回空列表"""
+        scores: Dict[int, float] = defaultdict(float)
+        n = len(self.doc_lengths)
+        for term in set(self.match(query)):
+            rows = self.term_rows.get(term, {})
+            idf = math.log(1 + n / len(rows)) if rows else 0.0
+            for row, count in rows.items():
+                scores[int(row)] += idf * (1 + math.log(count))
+        return sorted(scores, key=lambda row: -scores[row])[:k]
+
+    def bm25(self, query: str, k: int = 20) -> List[Tuple[int, float]]:
+        """BM25 打分，返回 [(行号, 分数)]"""
+        scores: Dict[int, float] = defaultdict(float)
+        n = len(self.doc_lengths)
+        for token in set(tokenize(query)):
+            rows = self.postings.get(token)
+            if not rows:
+                continue
+            idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            for row, tf in rows.items():
+                length = self.doc_lengths[int(row)]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / self.avg_length) if self.avg_length else BM25_K1
+                scores[int(row)] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: -item[1])[:k]
+
+    def save(self, index_dir: str):
+        path = os.path.join(index_dir, TERMS_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "aliases": self.aliases,
+                "term_rows": self.term_rows,
+                "postings": self.postings,
+                "doc_lengths": self.doc_lengths
+            }, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, index_dir: str) -> "TermIndex":
+        with open(os.path.join(index_dir, TERMS_FILE), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["aliases"], data["term_rows"], data["postings"], data["doc_lengths"])
+
+
+def reciprocal_rank_fusion(*rankings: List[int], k: int = 60) -> List[int]:
+    """融合多个行号排名（RRF），稀疏和稠密分数量纲不同，只使用名次"""
+    scores: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            scores[row] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda row: -scores[row])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="为已有向量库生成关键词索引（terms.json）")
+    parser.add_argument("paths", nargs="+", help="向量库目录，如 vectorstore/physics indexes/toastmasters-faiss")
+    args = parser.parse_args()
+
+    from services.chunk_store import MmapDocstore, has_chunk_store
+
+    for path in args.paths:
+        index_dir = resolve_index_dir(path)
+        if not has_chunk_store(index_dir):
+            raise SystemExit(f"{path} still uses index.pkl; run `python -m services.chunk_store {path}` first")
+        docstore = MmapDocstore(index_dir)
+        term_index = TermIndex.build([docstore.search(row).page_content for row in range(len(docstore))])
+        term_index.save(index_dir)
+        print(f"{path}: {len(set(term_index.aliases.values()))} terms, {len(term_index.postings)} tokens")
@@ -1,23 +1,179 @@
-import requests
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
 
-def get_weather(city: str):
+import httpx
+
+from services.metrics import observe_stage
+
+# 天气接口（open-meteo 兼容），测试时可以指向本地的模拟服务
+WEATHER_API_BASE = os.getenv("WEATHER_API_BASE", "https://api.open-meteo.com/v1")
+# 缓存的天气在 ttl 内直接返回；上游出错时，stale_ttl 内的旧值仍可返回
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))
+WEATHER_STALE_TTL = float(os.getenv("WEATHER_STALE_TTL", "21600"))
+WEATHER_TIMEOUT = float(os.getenv("WEATHER_TIMEOUT", "5"))
+
+# 这里只做一个简单映射，真实项目可以用地理编码 API 获取经纬度
+CITY_COORDINATES = {
+    "北京": (39.9, 116.4),
+    "上海": (31.2, 121.5),
+    "广州": (23.1, 113.3),
+}
+
+# 上游请求失败时可以回退到旧值的异常
+UPSTREAM_ERRORS = (httpx.HTTPError, KeyError, ValueError)
+
+
+class WeatherService:
+    """带缓存的天气查询
+
+    - 按坐标缓存，ttl 内不再请求上游，上游请求量只和城市数、ttl 有关，与用户请求量无关
+    - 同一坐标的并发请求合并为一次上游请求（single-flight）
+    - 复用连接池，连接和读取都有超时
+    - 上游失败时返回 stale_ttl 内的旧值
+    """
+
+    def __init__(
+        self,
+        base_url: str = WEATHER_API_BASE,
+        ttl: float = WEATHER_CACHE_TTL,
+        stale_ttl: float = WEATHER_STALE_TTL,
+        timeout: float = WEATHER_TIMEOUT
+    ):
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        http_timeout = httpx.Timeout(timeout, connect=min(timeout, 3.0))
+        limits = httpx.Limits(max_connections=20, max_keepalive_connections=10)
+        self.http_client = httpx.AsyncClient(base_url=base_url, timeout=http_timeout, limits=limits)
+        # 同步调用（AgentFactory.run）使用独立的连接池
+        self.sync_client = httpx.Client(base_url=base_url, timeout=http_timeout, limits=limits)
+        self._lock = threading.Lock()
+        # 坐标 -> (天气, 获取时间)
+        self._cache: Dict[Tuple[float, float], Tuple[dict, float]] = {}
+        self._inflight: Dict[Tuple[float, float], asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+        self.stale_served = 0
+
+    @staticmethod
+    def _params(key: Tuple[float, float]) -> dict:
+        return {"latitude": key[0], "longitude": key[1], "current_weather": "true"}
+
+    def _cached(self, key: Tuple[float, float], max_age: float) -> Optional[dict]:
+        with self._lock:
+            item = self._cache.get(key)
+        if item is not None and time.monotonic() - item[1] <= max_age:
+            return item[0]
+        return None
+
+    def _store(self, key: Tuple[float, float], weather: dict):
+        with self._lock:
+            self._cache[key] = (weather, time.monotonic())
+
+    def _fallback(self, key: Tuple[float, float], error: Exception) -> dict:
+        """上游失败：有未过期太久的旧值就返回旧值，否则继续抛出异常"""
+        self.upstream_errors += 1
+        stale = self._cached(key, self.stale_ttl)
+        if stale is None:
+            raise error
+        self.stale_served += 1
+        return stale
+
+    async def _fetch(self, key: Tuple[float, float]) -> dict:
+        self.upstream_calls += 1
+        with observe_stage("weather_fetch"):
+            resp = await self.http_client.get("/forecast", params=self._params(key))
+        resp.raise_for_status()
+        weather = resp.json()["current_weather"]
+        self._store(key, weather)
+        return weather
+
+    async def current(self, lat: float, lon: float) -> dict:
+        key = (round(lat, 2), round(lon, 2))
+        weather = self._cached(key, self.ttl)
+        if weather is not None:
+            self.hits += 1
+            return weather
+        self.misses += 1
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        try:
+            # shield：某个等待方被取消时不影响其他等待同一请求的调用
+            return await asyncio.shield(task)
+        except UPSTREAM_ERRORS as e:
+            return self._fallback(key, e)
+
+    def current_sync(self, lat: float, lon: float) -> dict:
+        key = (round(lat, 2), round(lon, 2))
+        weather = self._cached(key, self.ttl)
+        if weather is not None:
+            self.hits += 1
+            return weather
+        self.misses += 1
+        try:
+            self.upstream_calls += 1
+            with observe_stage("weather_fetch"):
+                resp = self.sync_client.get("/forecast", params=self._params(key))
+            resp.raise_for_status()
+            weather = resp.json()["current_weather"]
+        except UPSTREAM_ERRORS as e:
+            return self._fallback(key, e)
+        self._store(key, weather)
+        return weather
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._cache),
+            "upstream_calls": self.upstream_calls,
+            "upstream_errors": self.upstream_errors,
+            "stale_served": self.stale_served
+        }
+
+    async def aclose(self):
+        await self.http_client.aclose()
+        self.sync_client.close()
+
+
+# 全局实例
+weather_service = WeatherService()
+
+
+def _clean_city(city: str) -> str:
     # Clean up city name input from LLM
-    city = city.strip().strip("'\"")
-    
-    # 这里只做一个简单映射，真实项目可以用地理编码 API 获取经纬度
-    city_map = {
-        "北京": (39.9, 116.4),
-        "上海": (31.2, 121.5),
-        "广州": (23.1, 113.3),
-    }
-
-    if city not in city_map:
-        return f"暂时不支持查询 {city} 的天气"
+    return city.strip().strip("'\"")
+
 
-    lat, lon = city_map[city]
-    url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&current_weather=true"
-    resp = requests.get(url)
-    data = resp.json()
+def _format_weather(city: str, weather: dict) -> str:
+    return f"{city}当前气温 {weather['temperature']}℃，风速 {weather['windspeed']} km/h。"
 
-    weather = data["current_weather"]
-    return f"{city}当前气温 {weather['temperature']}℃，风速 {weather['windspeed']} km/h。"
\ No newline at end of file
+
+def get_weather(city: str):
+    city = _clean_city(city)
+    if city not in CITY_COORDINATES:
+        return f"暂时不支持查询 {city} 的天气"
+    try:
+        weather = weather_service.current_sync(*CITY_COORDINATES[city])
+    except UPSTREAM_ERRORS:
+        return f"暂时无法获取 {city} 的天气，请稍后再试"
+    return _format_weather(city, weather)
+
+async def aget_weather(city: str):
+    """get_weather 的异步版本，使用共享的异步连接池"""
+    city = _clean_city(city)
+    if city not in CITY_COORDINATES:
+        return f"暂时不支持查询 {city} 的天气"
+    try:
+        weather = await weather_service.current(*CITY_COORDINATES[city])
+    except UPSTREAM_ERRORS:
+        return f"暂时无法获取 {city} 的天气，请稍后再试"
+    return _format_weather(city, weather)
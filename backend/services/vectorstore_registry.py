@@ -0,0 +1,196 @@
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from services.ann_index import configure_search
+from services.cache import LRUCache, make_cache_key, normalize_text
+from services.metrics import observe_stage
+from services.chunk_store import CHUNKS_FILE, FAISS_FILE, LEGACY_DOCSTORE_FILE, OFFSETS_FILE, load_vectorstore
+from services.index_storage import resolve_index_dir
+from services.term_index import TERMS_FILE, TermIndex
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# 向量库目录中的文件，任意一个变化都需要重新加载（index.pkl 仅旧格式存在）
+INDEX_FILES = (FAISS_FILE, CHUNKS_FILE, OFFSETS_FILE, TERMS_FILE, LEGACY_DOCSTORE_FILE)
+
+# 查询向量和检索结果的 LRU 缓存大小，ttl 为 0 表示不过期
+RETRIEVAL_EMBEDDING_CACHE_SIZE = int(os.getenv("RETRIEVAL_EMBEDDING_CACHE_SIZE", "2048"))
+RETRIEVAL_RESULT_CACHE_SIZE = int(os.getenv("RETRIEVAL_RESULT_CACHE_SIZE", "1024"))
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "0"))
+
+
+class VectorStoreRegistry:
+    """进程内共享的 embedding 模型和向量库缓存
+
+    - 每个 embedding 模型只加载一次
+    - 每个向量库只加载一次（内存映射，切片按需读取），磁盘上的索引文件变化（mtime/大小）时自动重新加载
+    - 查询向量按规范化后的文本缓存；检索结果按 (索引指纹, 查询, k) 缓存，索引重建后指纹变化，旧结果自然失效
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._embeddings: Dict[str, HuggingFaceEmbeddings] = {}
+        # (path, model_name) -> (fingerprint, vectorstore)
+        self._stores: Dict[Tuple[str, str], Tuple[tuple, FAISS]] = {}
+        # path -> (fingerprint, 关键词索引，没有 terms.json 时为 None)
+        self._term_indexes: Dict[str, Tuple[tuple, Optional[TermIndex]]] = {}
+        self.embedding_cache = LRUCache(RETRIEVAL_EMBEDDING_CACHE_SIZE, RETRIEVAL_CACHE_TTL or None)
+        self.result_cache = LRUCache(RETRIEVAL_RESULT_CACHE_SIZE, RETRIEVAL_CACHE_TTL or None)
+
+    def get_embeddings(self, model_name: str = DEFAULT_EMBEDDING_MODEL) -> HuggingFaceEmbeddings:
+        """获取（必要时加载）embedding 模型"""
+        embeddings = self._embeddings.get(model_name)
+        if embeddings is not None:
+            return embeddings
+
+        with self._lock:
+            embeddings = self._embeddings.get(model_name)
+            if embeddings is None:
+                embeddings = HuggingFaceEmbeddings(model_name=model_name)
+                self._embeddings[model_name] = embeddings
+            return embeddings
+
+    def fingerprint(self, path: str) -> tuple:
+        """当前版本目录及其索引文件的指纹，用于判断磁盘上的索引是否被重建"""
+        index_dir = resolve_index_dir(path)
+        # 索引文件不存在时抛出 FileNotFoundError
+        os.stat(os.path.join(index_dir, FAISS_FILE))
+        parts = [index_dir]
+        for name in INDEX_FILES:
+            try:
+                stat = os.stat(os.path.join(index_dir, name))
+            except FileNotFoundError:
+                continue
+            parts.append((name, stat.st_mtime_ns, stat.st_size))
+        return tuple(parts)
+
+    def get_vectorstore(self, path: str, model_name: str = DEFAULT_EMBEDDING_MODEL) -> FAISS:
+        """获取向量库，索引文件未变化时直接返回缓存的实例"""
+        key = (path, model_name)
+        fingerprint = self.fingerprint(path)
+
+        cached = self._stores.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+
+        embeddings = self.get_embeddings(model_name)
+        with self._lock:
+            cached = self._stores.get(key)
+            if cached is not None and cached[0] == fingerprint:
+                return cached[1]
+
+            index_dir = fingerprint[0]
+            vectorstore = load_vectorstore(index_dir, embeddings)
+            # 近似索引的查询参数（nprobe / efSearch）不随文件保存，加载后设置
+            configure_search(vectorstore.index)
+            self._stores[key] = (fingerprint, vectorstore)
+            return vectorstore
+
+    def get_term_index(self, path: str) -> Optional[TermIndex]:
+        """获取向量库旁的关键词索引，不存在时返回 None"""
+        fingerprint = self.fingerprint(path)
+        cached = self._term_indexes.get(path)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+
+        with self._lock:
+            cached = self._term_indexes.get(path)
+            if cached is not None and cached[0] == fingerprint:
+                return cached[1]
+            try:
+                term_index = TermIndex.load(fingerprint[0])
+            except FileNotFoundError:
+                term_index = None
+            self._term_indexes[path] = (fingerprint, term_index)
+            return term_index
+
+    def embed_query(self, text: str, model_name: str = DEFAULT_EMBEDDING_MODEL) -> List[float]:
+        """计算查询向量，相同（空白规范化后）的查询只推理一次"""
+        text = normalize_text(text)
+        key = make_cache_key("embed_query", model_name, text)
+        vector = self.embedding_cache.get(key)
+        if vector is None:
+            embeddings = self.get_embeddings(model_name)
+            with observe_stage("embedding"):
+                vector = embeddings.embed_query(text)
+            self.embedding_cache.set(key, vector)
+        return vector
+
+    def embed_queries(self, texts: List[str], model_name: str = DEFAULT_EMBEDDING_MODEL) -> np.ndarray:
+        """批量计算查询向量：缓存未命中的查询去重后一次推理，返回 (len(texts), dim) 矩阵"""
+        texts = [normalize_text(text) for text in texts]
+        keys = [make_cache_key("embed_query", model_name, text) for text in texts]
+        vectors = [self.embedding_cache.get(key) for key in keys]
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            embeddings = self.get_embeddings(model_name)
+            with observe_stage("embedding"):
+                computed = dict(zip(missing, embeddings.embed_documents(missing)))
+            for i, text in enumerate(texts):
+                if vectors[i] is None:
+                    vectors[i] = computed[text]
+                    self.embedding_cache.set(keys[i], vectors[i])
+        return np.asarray(vectors, dtype=np.float32)
+
+    def cached_search(
+        self,
+        path: str,
+        kind: str,
+        query: str,
+        k: int,
+        search: Callable[[], List[Document]],
+        model_name: str = DEFAULT_EMBEDDING_MODEL
+    ) -> List[Document]:
+        """以 (索引指纹, 检索方式, 查询, k) 为键缓存 search() 的结果"""
+        key = make_cache_key("search", path, model_name, self.fingerprint(path), kind, normalize_text(query), k)
+        docs = self.result_cache.get(key)
+        if docs is None:
+            docs = search()
+            self.result_cache.set(key, docs)
+        return docs
+
+    def similarity_search(self, path: str, query: str, k: int = 4, model_name: str = DEFAULT_EMBEDDING_MODEL) -> List[Document]:
+        """带缓存的向量检索"""
+        def search():
+            vectorstore = self.get_vectorstore(path, model_name)
+            vector = self.embed_query(query, model_name)
+            with observe_stage("faiss_search"):
+                return vectorstore.similarity_search_by_vector(vector, k=k)
+        return self.cached_search(path, "dense", query, k, search, model_name)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return {"embeddings": self.embedding_cache.stats(), "results": self.result_cache.stats()}
+
+    def warmup(self, paths: Iterable[str], model_name: str = DEFAULT_EMBEDDING_MODEL):
+        """预加载模型和向量库，供服务启动时调用"""
+        embeddings = self.get_embeddings(model_name)
+        # 跑一次前向推理，避免第一个请求承担懒初始化开销
+        embeddings.embed_query("warmup")
+        for path in paths:
+            try:
+                self.get_vectorstore(path, model_name)
+                self.get_term_index(path)
+            except FileNotFoundError:
+                print(f"Vector store not found, skip warmup: {path}")
+
+    def clear(self, path: Optional[str] = None):
+        """丢弃缓存的向量库，path 为空时全部丢弃"""
+        with self._lock:
+            if path is None:
+                self._stores.clear()
+                self._term_indexes.clear()
+                self.result_cache.clear()
+                return
+            for key in [key for key in self._stores if key[0] == path]:
+                del self._stores[key]
+            self._term_indexes.pop(path, None)
+
+
+# 全局实例
+registry = VectorStoreRegistry()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 测试以 backend 为根目录导入 services、bench
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
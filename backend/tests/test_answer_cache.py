@@ -0,0 +1,63 @@
+"""/ask 语义缓存：已有对话历史的会话既不写入也不读取缓存，缓存不可用时照常交给 Agent"""
+import asyncio
+
+import numpy as np
+import pytest
+from fastapi import Response
+
+import main
+from services.answer_cache import SemanticAnswerCache
+
+
+def char_bag(question: str) -> np.ndarray:
+    """测试用的 embedding：字符计数向量，相同文字的相似度为 1"""
+    vector = np.zeros(256, dtype=np.float32)
+    for char in question:
+        vector[ord(char) % 256] += 1
+    return vector / np.linalg.norm(vector)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(SemanticAnswerCache, "_embed", lambda self, question: char_bag(question))
+    monkeypatch.setattr(SemanticAnswerCache, "_terms", staticmethod(lambda question: frozenset()))
+    return SemanticAnswerCache(threshold=0.95, ttl=60, max_entries=8, excluded_tools=["Weather"], enabled=True)
+
+
+TOOL_STEP = [{"tool": "PhysicsSearch"}]
+
+
+def test_history_with_tool_step_is_not_cacheable(cache):
+    assert not cache.cacheable(TOOL_STEP, had_history=True)
+    assert not cache.cacheable([], had_history=True)
+
+
+def test_new_session_answers_are_cacheable(cache):
+    assert cache.cacheable(TOOL_STEP, had_history=False)
+    assert cache.cacheable([], had_history=False)
+    assert not cache.cacheable([{"tool": "Weather"}], had_history=False)
+
+
+def test_sessions_with_history_are_not_served_from_cache(cache):
+    cache.store("What about its mass?", "cached answer", {"question": "What about its mass?"})
+    assert cache.lookup("What about its mass?", had_history=True) is None
+    hit = cache.lookup("What about its mass?", had_history=False)
+    assert hit is not None and hit["answer"] == "cached answer"
+
+
+def test_ask_falls_back_to_agent_when_embedding_fails(monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("embedding model unavailable")
+
+    async def arun(question, memory, callbacks=None):
+        return {"output": "Hello!", "intermediate_steps": []}
+
+    monkeypatch.setattr(main.answer_cache, "lookup", broken)
+    monkeypatch.setattr(main.answer_cache, "store", broken)
+    monkeypatch.setattr(main.agent_factory, "arun", arun)
+
+    response = Response()
+    body = asyncio.run(main.ask(main.Query(question="Hi there"), response))
+    assert body["answer"] == "Hello!"
+    assert body["cached"] is False
+    assert response.headers["X-Cache"] == "MISS"
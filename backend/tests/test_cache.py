@@ -0,0 +1,75 @@
+"""检查结果缓存：LRU 淘汰和过期、SQLite 持久化、检查器命中缓存时不再调用 LLM"""
+import asyncio
+import json
+
+import pytest
+
+from services.cache import LRUCache, SQLiteCache, build_cache, make_cache_key, normalize_text
+from services.english_checker import EnglishChecker, SentenceCheckRequest
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 1
+
+
+def test_lru_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("services.cache.time.monotonic", lambda: now[0])
+    cache = LRUCache(maxsize=4, ttl=10)
+    cache.set("a", {"x": 1})
+    now[0] += 5
+    assert cache.get("a") == {"x": 1}
+    now[0] += 6
+    assert cache.get("a") is None and len(cache) == 0
+
+
+def test_sqlite_cache_survives_reopen(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SQLiteCache(path)
+    asyncio.run(cache.aset("k", {"is_correct": True}))
+    reopened = SQLiteCache(path)
+    assert asyncio.run(reopened.aget("k")) == {"is_correct": True}
+    assert reopened.get("missing") is None
+
+
+def test_cache_key_normalizes_whitespace():
+    assert make_cache_key("m", normalize_text(" I  am\nhappy. ")) == make_cache_key("m", normalize_text("I am happy."))
+    assert make_cache_key("m", "a") != make_cache_key("n", "a")
+    with pytest.raises(ValueError):
+        build_cache("redis")
+
+
+def test_checker_serves_repeated_sentence_from_cache(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("CHECK_CACHE_BACKEND", "memory")
+    checker = EnglishChecker()
+    monkeypatch.setattr(checker, "_triage", lambda sentence: None)
+    calls = []
+
+    async def complete(system, prompt, temperature, max_tokens, timeout):
+        calls.append(prompt)
+        return json.dumps({
+            "is_complete": True, "issues": [], "suggestions": [], "overall_score": 0.7,
+            "explanation": "ok", "polished_sentence": "I am happy.", "polished_explanation": None
+        })
+
+    monkeypatch.setattr(checker, "_complete", complete)
+
+    async def scenario():
+        # full_text 不参与缓存键，空白不同的同一个句子也命中
+        first = await checker.check_sentence(SentenceCheckRequest(sentence="I am happy.", full_text="a"))
+        second = await checker.check_sentence(SentenceCheckRequest(sentence="I  am happy. ", full_text="b"))
+        await checker.aclose()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert first == second
+    assert checker.cache.stats()["hits"] == 1
@@ -0,0 +1,100 @@
+"""WebSocket 后台检查调度：防抖、取消被取代的检查、丢弃过期结果"""
+import asyncio
+
+import main
+from services.check_scheduler import CheckScheduler
+from services.sentence_segmenter import IncrementalSegmenter
+
+
+class FakeChecker:
+    """记录调用的假检查器，每次检查耗时 delay 秒"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.started = []
+        self.finished = []
+        self.cancelled = []
+
+    def job(self, name):
+        async def run():
+            self.started.append(name)
+            try:
+                await asyncio.sleep(self.delay)
+            except asyncio.CancelledError:
+                self.cancelled.append(name)
+                raise
+            self.finished.append(name)
+        return run
+
+
+def test_debounce_runs_only_last_job():
+    async def scenario():
+        checker = FakeChecker()
+        scheduler = CheckScheduler(debounce=0.05)
+        for name in ("I", "I am", "I am happy."):
+            scheduler.schedule(("sentence", 0), checker.job(name))
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+        return checker, scheduler
+
+    checker, scheduler = asyncio.run(scenario())
+    assert checker.started == ["I am happy."]
+    assert scheduler.in_flight == 0
+
+
+def test_new_job_cancels_running_job():
+    async def scenario():
+        checker = FakeChecker(delay=0.1)
+        scheduler = CheckScheduler(debounce=0)
+        scheduler.schedule(("sentence", 0), checker.job("old"))
+        await asyncio.sleep(0.02)
+        scheduler.schedule(("sentence", 0), checker.job("new"))
+        await asyncio.sleep(0.15)
+        return checker
+
+    checker = asyncio.run(scenario())
+    assert checker.started == ["old", "new"]
+    assert checker.cancelled == ["old"]
+    assert checker.finished == ["new"]
+
+
+def test_editing_a_sentence_cancels_overlapping_batch():
+    async def scenario():
+        checker = FakeChecker(delay=0.1)
+        scheduler = CheckScheduler(debounce=0)
+        scheduler.schedule(("batch", (0, 1, 2)), checker.job("batch"))
+        scheduler.schedule(("batch", (5, 6)), checker.job("other"))
+        await asyncio.sleep(0.02)
+        pending = scheduler.cancel_sentences([1])
+        await asyncio.sleep(0.15)
+        return checker, pending
+
+    checker, pending = asyncio.run(scenario())
+    assert checker.cancelled == ["batch"]
+    assert checker.finished == ["other"]
+    # 批量检查里没有修改的句子需要重新提交
+    assert pending == {0, 2}
+
+
+def test_stale_result_is_dropped(monkeypatch):
+    client_id = "test-client"
+    segmenter = IncrementalSegmenter()
+    segmenter.set_text("I am happy.")
+    sent = []
+
+    async def send_message(message, cid):
+        sent.append(message)
+
+    async def check_sentence(request, on_partial=None):
+        # 检查期间用户修改了这个句子
+        segmenter.set_text("I am very happy.")
+        return main.SentenceCheckResponse(
+            is_complete=True, issues=[], suggestions=[], overall_score=0.9, explanation="ok"
+        )
+
+    monkeypatch.setitem(main.manager.user_contexts, client_id, {"segmenter": segmenter, "stream_feedback": False})
+    monkeypatch.setattr(main.manager, "send_message", send_message)
+    monkeypatch.setattr(main.english_checker, "check_sentence", check_sentence)
+
+    asyncio.run(main.check_sentence_and_send(client_id, "I am happy.", "I am happy.", 0))
+    assert [message["type"] for message in sent] == ["analyzing"]
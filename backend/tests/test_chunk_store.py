@@ -0,0 +1,93 @@
+"""内存映射的切片库：保存、加载、旧格式迁移和增量写入"""
+import os
+
+import faiss
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from services.chunk_store import (
+    FAISS_FILE, LEGACY_DOCSTORE_FILE, ChunkStoreWriter, MmapDocstore, has_chunk_store, load_mutable_vectorstore,
+    load_vectorstore, migrate, save_vectorstore
+)
+from services.index_storage import resolve_index_dir
+
+TEXTS = ["Quarks are confined.", "光子没有静止质量。", "Gluons carry colour.", "Leptons are fundamental."]
+
+
+def vector(text: str) -> list:
+    return np.random.default_rng(sum(map(ord, text))).normal(size=8).astype(np.float32).tolist()
+
+
+class FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return vector(text)
+
+
+def in_memory_store(texts=TEXTS):
+    return FAISS.from_texts(
+        texts, FakeEmbeddings(), metadatas=[{"source": f"doc{i}.txt", "page": i} for i in range(len(texts))],
+        ids=[f"id-{i}" for i in range(len(texts))]
+    )
+
+
+def test_round_trip_matches_in_memory_store(tmp_path):
+    original = in_memory_store()
+    save_vectorstore(original, str(tmp_path))
+    assert not os.path.exists(tmp_path / LEGACY_DOCSTORE_FILE)
+
+    loaded = load_vectorstore(str(tmp_path), FakeEmbeddings())
+    assert isinstance(loaded.docstore, MmapDocstore)
+    for text in TEXTS:
+        expected = original.similarity_search(text, k=2)
+        actual = loaded.similarity_search(text, k=2)
+        assert [(d.page_content, d.metadata) for d in actual] == [(d.page_content, d.metadata) for d in expected]
+    assert loaded.docstore.search(1).page_content == "光子没有静止质量。"
+    assert loaded.docstore.search(1).id == "id-1"
+    assert loaded.docstore.search(99) == "ID 99 not found."
+
+    mutable = load_mutable_vectorstore(str(tmp_path), FakeEmbeddings())
+    mutable.delete(["id-0"])
+    assert mutable.index.ntotal == 3
+
+
+def test_mismatched_index_is_rejected(tmp_path):
+    save_vectorstore(in_memory_store(), str(tmp_path))
+    other = in_memory_store(TEXTS[:2])
+    faiss.write_index(other.index, os.path.join(tmp_path, FAISS_FILE))
+    with pytest.raises(ValueError):
+        load_vectorstore(str(tmp_path), FakeEmbeddings())
+
+
+def test_migrate_legacy_pickle(tmp_path):
+    path = str(tmp_path / "store")
+    in_memory_store().save_local(path)
+    final = migrate(path)
+    assert resolve_index_dir(path) == final and has_chunk_store(final)
+    assert not os.path.exists(os.path.join(path, LEGACY_DOCSTORE_FILE))
+    loaded = load_vectorstore(final, FakeEmbeddings())
+    assert loaded.similarity_search(TEXTS[2], k=1)[0].page_content == TEXTS[2]
+
+
+def test_writer_copies_base_and_drops_sources(tmp_path):
+    base = str(tmp_path / "base")
+    save_vectorstore(in_memory_store(), base)
+
+    target = str(tmp_path / "new")
+    writer = ChunkStoreWriter(target, base_dir=base, drop_sources=["doc1.txt"])
+    new_doc = Document(page_content="Neutrinos oscillate.", metadata={"source": "doc9.txt"})
+    writer.add([new_doc], np.asarray([vector(new_doc.page_content)], dtype=np.float32))
+    writer.close()
+    assert writer.dropped == 1 and len(writer) == 4
+    assert not os.path.exists(os.path.join(target, ChunkStoreWriter.VECTORS_FILE))
+
+    loaded = load_vectorstore(target, FakeEmbeddings())
+    contents = [loaded.docstore.search(row).page_content for row in range(loaded.index.ntotal)]
+    assert contents == [TEXTS[0], TEXTS[2], TEXTS[3], "Neutrinos oscillate."]
+    for row, text in enumerate(contents):
+        assert np.allclose(loaded.index.reconstruct(row), vector(text))
@@ -0,0 +1,109 @@
+"""英语检查器：批量检查的打包、排序、缓存和降级，本地初筛计数；LLM 调用用假的 _complete 代替"""
+import asyncio
+import json
+import re
+
+import pytest
+
+import services.english_checker as english_checker_module
+from services.english_checker import EnglishChecker
+
+
+def sentence_result(score: float = 0.8) -> dict:
+    return {
+        "is_complete": True,
+        "issues": [],
+        "suggestions": [],
+        "overall_score": score,
+        "explanation": "ok",
+        "polished_sentence": None,
+        "polished_explanation": None
+    }
+
+
+class FakeLLM:
+    """按提示词返回单句或批量结果，记录每次调用；broken_batch 时批量回复无法解析"""
+
+    def __init__(self, broken_batch: bool = False):
+        self.broken_batch = broken_batch
+        self.calls = []
+
+    async def __call__(self, system, prompt, temperature, max_tokens, timeout):
+        self.calls.append(prompt)
+        if "句子列表" in prompt:
+            if self.broken_batch:
+                return "sorry, I cannot do that"
+            count = len(re.findall(r'^\d+\. "', prompt, re.M))
+            return json.dumps([{"index": i + 1, **sentence_result()} for i in range(count)])
+        return json.dumps(sentence_result())
+
+
+@pytest.fixture
+def checker(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("CHECK_CACHE_BACKEND", "memory")
+    checker = EnglishChecker()
+    yield checker
+    asyncio.run(checker.aclose())
+
+
+@pytest.fixture
+def triaged(monkeypatch):
+    """记录初筛过的句子，并让所有句子都交给 LLM"""
+    seen = []
+
+    def check(sentence):
+        seen.append(sentence)
+        return None, "too_long"
+
+    monkeypatch.setattr(english_checker_module.grammar_triage, "check", check)
+    return seen
+
+
+@pytest.mark.parametrize("sentences, broken_batch", [
+    (["I goes to school."], False),                       # 只有一个句子的分组
+    (["I goes to school.", "She like apples."], True),    # 批量回复无法解析，退回逐句检查
+])
+def test_batch_triages_each_sentence_once(checker, triaged, monkeypatch, sentences, broken_batch):
+    llm = FakeLLM(broken_batch=broken_batch)
+    monkeypatch.setattr(checker, "_complete", llm)
+    results = asyncio.run(checker.check_sentences_batch(sentences))
+    assert len(results) == len(sentences)
+    assert triaged == sentences
+
+
+def test_batch_packs_sentences_and_keeps_order(checker, triaged, monkeypatch):
+    llm = FakeLLM()
+    monkeypatch.setattr(checker, "_complete", llm)
+    checker.batch_size = 2
+    sentences = ["I goes home.", "She like tea.", "I goes home.", "He run fast.", "We was late."]
+    results = asyncio.run(checker.check_sentences_batch(sentences))
+    assert len(results) == 5
+    # 4 个不同的句子，每批 2 个：两次 LLM 调用；重复的句子共用结果
+    assert len(llm.calls) == 2
+    assert results[0] is results[2]
+
+
+def test_batch_reorders_by_index_and_caches(checker, triaged, monkeypatch):
+    async def complete(system, prompt, temperature, max_tokens, timeout):
+        # 模型打乱了顺序，但给出了编号
+        return json.dumps([{"index": 2, **sentence_result(0.2)}, {"index": 1, **sentence_result(0.9)}])
+
+    monkeypatch.setattr(checker, "_complete", complete)
+    results = asyncio.run(checker.check_sentences_batch(["Good one.", "bad one"]))
+    assert [r.overall_score for r in results] == [0.9, 0.2]
+
+    llm = FakeLLM()
+    monkeypatch.setattr(checker, "_complete", llm)
+    cached = asyncio.run(checker.check_sentences_batch(["bad one", "Good one."]))
+    assert [r.overall_score for r in cached] == [0.2, 0.9]
+    assert llm.calls == []
+
+
+def test_batch_falls_back_to_single_checks(checker, triaged, monkeypatch):
+    llm = FakeLLM(broken_batch=True)
+    monkeypatch.setattr(checker, "_complete", llm)
+    results = asyncio.run(checker.check_sentences_batch(["A b.", "C d.", "E f."]))
+    assert [r.overall_score for r in results] == [0.8, 0.8, 0.8]
+    # 一次批量调用 + 三次单句调用
+    assert len(llm.calls) == 4
@@ -0,0 +1,62 @@
+"""语法初筛：长句、句中时间状语的时态错误不能在本地判为没有问题"""
+import pytest
+
+from services.grammar_triage import GrammarTriage, find_rule_issue
+
+
+@pytest.fixture(scope="module")
+def triage():
+    triage = GrammarTriage(enabled=True)
+    triage.load()
+    return triage
+
+
+@pytest.mark.parametrize("sentence", [
+    "I go to the park yesterday with my friends.",
+    "We play basketball with our classmates yesterday afternoon.",
+    "I meet my old teacher at the supermarket two days ago.",
+    "They watch a very funny movie at the cinema last Saturday evening.",
+    "My family and I will travel to Hangzhou next month and we stayed in a hotel near the lake.",
+])
+def test_time_marker_anywhere_in_sentence(sentence):
+    assert find_rule_issue(sentence) == "tense"
+
+
+@pytest.mark.parametrize("sentence", [
+    "I went to the park yesterday with my friends.",
+    "We played basketball with our classmates yesterday afternoon.",
+    "I will visit my grandmother next week because she is not well.",
+    "The flowers in the park are blooming now.",
+    "Today was a long day, and I am ready to sleep.",
+    "My sister and her husband have lived in Canada for almost ten years now.",
+    "The book I bought yesterday was really interesting.",
+    "When I got home, I cooked dinner for my family.",
+])
+def test_clean_sentences_pass_rules(sentence):
+    assert find_rule_issue(sentence) is None
+
+
+@pytest.mark.parametrize("sentence", [
+    "The students in our class is preparing a short play for the school festival next month.",
+    "I have been studying English for five years, but I still feel nervous when I speak to foreigner.",
+    "There are a lot of people in the street today because it is a holiday and everyone want to go out.",
+])
+def test_long_sentences_are_escalated(triage, sentence):
+    result, reason = triage.check(sentence)
+    assert result is None
+    assert reason == "too_long"
+
+
+def test_clean_sentence_is_returned_locally(triage):
+    result, reason = triage.check("I went to the park yesterday with my friends.")
+    assert reason == "clean"
+    assert result["issues"] == [] and result["polished_sentence"] is None
+
+
+def test_unseen_common_bigram_is_escalated(triage):
+    # most good：两个常见词，但在常见二元组表中从未相邻出现
+    sentence = "This is the most good restaurant in our town."
+    assert triage.screen(sentence) is None
+    assert triage.unseen_common_bigrams(sentence) == ["most good"]
+    result, reason = triage.check(sentence)
+    assert result is None and reason == "unseen_bigram"
@@ -0,0 +1,98 @@
+"""PDF 流式入库：manifest 以真实路径为键、移除已删除文件的切片、失败时清理暂存目录
+
+semantic-search-engine.py 的文件名不是合法的模块名，用 importlib 加载；
+PDF 读取和 embedding 进程池换成读取文本文件的假实现。
+"""
+import importlib.util
+import json
+import os
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from services.chunk_store import MmapDocstore
+from services.index_storage import resolve_index_dir
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(__file__)), "semantic-search-engine.py")
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    spec = importlib.util.spec_from_file_location("semantic_search_engine", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    class TextLoader:
+        def __init__(self, path):
+            self.path = path
+
+        def lazy_load(self):
+            with open(self.path, encoding="utf-8") as f:
+                yield Document(page_content=f.read(), metadata={"source": self.path, "page": 0})
+
+    class FakePool:
+        def __init__(self, *args):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def map(self, batches):
+            for texts in batches:
+                yield np.asarray([[float(len(text)), float(sum(map(ord, text)) % 97), 1.0, 0.0] for text in texts], dtype=np.float32)
+
+    monkeypatch.setattr(module, "PyPDFLoader", TextLoader)
+    monkeypatch.setattr(module, "EmbeddingPool", FakePool)
+    return module
+
+
+def write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def sources(index_path):
+    docstore = MmapDocstore(resolve_index_dir(index_path))
+    return sorted({json.loads(docstore.raw(row))["metadata"]["source"] for row in range(len(docstore))})
+
+
+def test_same_file_via_different_paths_is_not_duplicated(engine, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write("a.pdf", "Nike has many distribution centers.")
+    index_path = str(tmp_path / "index")
+    assert engine.ingest(["./a.pdf"], index_path, 8, 1) == 1
+    assert engine.ingest(["a.pdf"], index_path, 8, 1) == 0
+    assert engine.find_pdfs(["a.pdf", "./a.pdf"]) == ["a.pdf"]
+
+
+def test_deleted_pdf_chunks_are_removed(engine, tmp_path):
+    a, b = str(tmp_path / "a.pdf"), str(tmp_path / "b.pdf")
+    write(a, "First document.")
+    write(b, "Second document.")
+    index_path = str(tmp_path / "index")
+    engine.ingest([a, b], index_path, 8, 1)
+    assert sources(index_path) == [a, b]
+
+    os.remove(b)
+    engine.ingest([a], index_path, 8, 1)
+    assert sources(index_path) == [a]
+    with open(os.path.join(resolve_index_dir(index_path), engine.MANIFEST_FILE), encoding="utf-8") as f:
+        assert list(json.load(f)["sources"]) == [os.path.realpath(a)]
+
+
+def test_failed_run_removes_staging_dir(engine, tmp_path, monkeypatch):
+    a = str(tmp_path / "a.pdf")
+    write(a, "First document.")
+    index_path = str(tmp_path / "index")
+
+    def broken(*args):
+        raise RuntimeError("embedding failed")
+
+    monkeypatch.setattr(engine.EmbeddingPool, "map", broken)
+    with pytest.raises(RuntimeError):
+        engine.ingest([a], index_path, 8, 1)
+    assert [name for name in os.listdir(index_path) if name.endswith(".tmp")] == []
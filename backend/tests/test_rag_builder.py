@@ -0,0 +1,112 @@
+"""增量构建向量库：用确定性的假 embedding 代替 HuggingFace 模型"""
+import hashlib
+import json
+import os
+
+import faiss
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from services import rag_builder
+from services.ann_index import convert_vectorstore, index_type_of
+from services.chunk_store import load_vectorstore
+from services.index_storage import MANIFEST_FILE, resolve_index_dir
+
+DIM = 16
+
+
+def fake_vector(text: str) -> list:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+    return np.random.default_rng(seed).normal(size=DIM).astype(np.float32).tolist()
+
+
+class FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [fake_vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return fake_vector(text)
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    embeddings = FakeEmbeddings()
+    monkeypatch.setattr(rag_builder.registry, "get_embeddings", lambda model_name=None: embeddings)
+    monkeypatch.setattr(
+        rag_builder, "embed_texts",
+        lambda texts, **kwargs: (np.asarray([fake_vector(text) for text in texts], dtype=np.float32), {})
+    )
+    return embeddings
+
+
+def write_docs(source_dir, docs):
+    os.makedirs(source_dir, exist_ok=True)
+    for name in os.listdir(source_dir):
+        os.remove(os.path.join(source_dir, name))
+    for name, text in docs.items():
+        with open(os.path.join(source_dir, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def read_index(index_path):
+    return faiss.read_index(os.path.join(resolve_index_dir(index_path), "index.faiss"))
+
+
+def read_manifest(index_path):
+    with open(os.path.join(resolve_index_dir(index_path), MANIFEST_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_converted_index_type_is_kept(tmp_path, fake_embeddings):
+    source, index_path = str(tmp_path / "docs"), str(tmp_path / "index")
+    write_docs(source, {"a.txt": "The Higgs boson was found at the LHC.", "b.txt": "Quarks carry colour charge."})
+    rag_builder.build_vectorstore(source, index_path)
+    assert index_type_of(read_index(index_path)) == "flat"
+
+    convert_vectorstore(index_path, "hnsw", hnsw_m=8)
+    params = read_manifest(index_path)["params"]
+    assert params["index_type"] == "hnsw" and params["index_params"] == {"hnsw_m": 8}
+
+    # 没有指定 index_type 的增量构建沿用转换后的类型和参数
+    write_docs(source, {"a.txt": "The Higgs boson was found at the LHC.", "b.txt": "Quarks carry colour charge.",
+                        "c.txt": "Neutrinos oscillate between flavours."})
+    assert rag_builder.build_vectorstore(source, index_path) == (1, 0)
+    index = read_index(index_path)
+    assert index_type_of(index) == "hnsw" and index.hnsw.nb_neighbors(1) == 8
+    assert read_manifest(index_path)["params"]["index_type"] == "hnsw"
+
+    # 显式指定时换成新的类型
+    rag_builder.build_vectorstore(source, index_path, index_type="flat")
+    assert index_type_of(read_index(index_path)) == "flat"
+    assert len(load_vectorstore(resolve_index_dir(index_path), fake_embeddings).index_to_docstore_id) == 3
+
+
+def test_incremental_build_embeds_only_changed_chunks(tmp_path, fake_embeddings, monkeypatch):
+    source, index_path = str(tmp_path / "docs"), str(tmp_path / "index")
+    embedded = []
+
+    def embed_texts(texts, **kwargs):
+        embedded.extend(texts)
+        return np.asarray([fake_vector(text) for text in texts], dtype=np.float32), {}
+
+    monkeypatch.setattr(rag_builder, "embed_texts", embed_texts)
+    write_docs(source, {"a.txt": "Alpha particles.", "b.txt": "Beta decay.", "c.txt": "Gamma rays."})
+    assert rag_builder.build_vectorstore(source, index_path) == (3, 0)
+
+    embedded.clear()
+    assert rag_builder.build_vectorstore(source, index_path) == (0, 0)
+    assert embedded == []
+
+    # 修改 b、删除 c、新增 d：只为新的切片计算向量
+    write_docs(source, {"a.txt": "Alpha particles.", "b.txt": "Beta decay emits electrons.", "d.txt": "Delta baryons."})
+    assert rag_builder.build_vectorstore(source, index_path) == (2, 2)
+    assert sorted(embedded) == ["Beta decay emits electrons.", "Delta baryons."]
+
+    vectorstore = load_vectorstore(resolve_index_dir(index_path), fake_embeddings)
+    rows = {rag_builder.row_document(vectorstore, row).page_content: row for row in range(vectorstore.index.ntotal)}
+    assert sorted(rows) == ["Alpha particles.", "Beta decay emits electrons.", "Delta baryons."]
+    assert sorted(read_manifest(index_path)["chunks"]) == sorted(rag_builder.load_chunks(source))
+    # 删除和追加之后，每一行的向量仍与它的切片对应
+    for content, row in rows.items():
+        assert np.allclose(vectorstore.index.reconstruct(row), fake_vector(content))
@@ -0,0 +1,97 @@
+"""增量句子切分：每次修改后的结果必须与整段重新切分一致"""
+import random
+import re
+import time
+
+import pytest
+
+from services.sentence_segmenter import IncrementalSegmenter
+
+FULL_PATTERN = re.compile(r'[^.!?。！？]*[.!?。！？]+')
+
+
+def full_segment(text):
+    return [m.group().strip() for m in FULL_PATTERN.finditer(text)]
+
+
+def segmenter_with(text):
+    segmenter = IncrementalSegmenter()
+    segmenter.set_text(text)
+    return segmenter
+
+
+BASE = "I went to school. It was sunny! Did you come? We played football."
+
+
+@pytest.mark.parametrize("start, end, replacement", [
+    (18, 18, "Then "),            # 在中间插入
+    (18, 32, ""),                 # 删除中间的整个句子
+    (21, 26, "rained"),           # 替换句子中间的词
+    (16, 17, ""),                 # 删除句末标点，两个句子合并
+    (10, 10, ". Then I"),         # 插入句末标点，一个句子拆成两个
+    (16, 34, " and"),             # 跨越句末标点的替换
+    (len(BASE), len(BASE), " I was tired"),  # 末尾没有标点的部分
+])
+def test_patch_matches_full_segmentation(start, end, replacement):
+    segmenter = segmenter_with(BASE)
+    segmenter.apply_patch(start, end, replacement)
+    expected = BASE[:start] + replacement + BASE[end:]
+    assert segmenter.text == expected
+    assert segmenter.sentences == full_segment(expected)
+
+
+def test_set_text_matches_full_segmentation():
+    segmenter = segmenter_with(BASE)
+    text = BASE.replace("sunny!", "sunny, and warm.")
+    segmenter.set_text(text)
+    assert segmenter.sentences == full_segment(text)
+
+
+def test_diff_reports_only_touched_sentences():
+    segmenter = segmenter_with(BASE)
+    diff = segmenter.apply_patch(21, 26, "rained")
+    assert [item["index"] for item in diff["changed"]] == [1]
+    assert diff["new"] == [] and diff["removed"] == []
+
+    diff = segmenter.apply_patch(16, 17, "")
+    assert diff["removed"] and segmenter.count == 3
+
+
+def test_unterminated_tail_is_not_a_sentence():
+    segmenter = segmenter_with("Hello there. I am typing")
+    assert segmenter.sentences == ["Hello there."]
+    diff = segmenter.set_text("Hello there. I am typing.")
+    assert [item["text"] for item in diff["new"]] == ["I am typing."]
+    assert segmenter.sentence_at(segmenter.count - 1) == "I am typing."
+
+
+def test_cjk_terminators():
+    text = "今天天气很好。我们去公园了！你去了吗？I stayed home."
+    segmenter = segmenter_with(text)
+    assert segmenter.sentences == full_segment(text)
+    segmenter.apply_patch(6, 7, "，")
+    assert segmenter.sentences == full_segment(segmenter.text)
+    assert segmenter.sentences[0] == "今天天气很好，我们去公园了！"
+
+
+def test_random_edits_match_full_segmentation():
+    rng = random.Random(0)
+    alphabet = "ab c.!?。！？ "
+    segmenter = IncrementalSegmenter()
+    for _ in range(500):
+        text = segmenter.text
+        start = rng.randint(0, len(text))
+        end = rng.randint(start, min(len(text), start + 8))
+        replacement = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 6)))
+        segmenter.apply_patch(start, end, replacement)
+        assert segmenter.sentences == full_segment(segmenter.text)
+
+
+def test_long_unterminated_paragraph_is_linear():
+    # 没有句末标点的长段落：每次按键只应扫描一次尾部，而不是从每个字符重新匹配
+    segmenter = segmenter_with("First sentence. " + "word " * 10000)
+    start = time.perf_counter()
+    for _ in range(50):
+        segmenter.apply_patch(len(segmenter.text), len(segmenter.text), "x")
+    assert time.perf_counter() - start < 1.0
+    assert segmenter.count == 1
@@ -0,0 +1,48 @@
+"""本地拼写检查：所有格、缩写不应被当作拼写错误纠正"""
+import pytest
+
+from services.spell_checker import SpellChecker
+
+
+@pytest.fixture(scope="module")
+def checker():
+    checker = SpellChecker(enabled=True)
+    checker.load()
+    return checker
+
+
+@pytest.mark.parametrize("word", [
+    "mom's", "friend's", "teacher's", "dog's", "sister's", "week's", "school's", "friends'", "parents'",
+    "mother-in-law's", "Tom's"
+])
+def test_possessives_are_correct(checker, word):
+    result, reason = checker.check(word)
+    if word[0].isupper():
+        # 专有名词的所有格交给 LLM，但绝不能在本地判为错误
+        assert result is None or result["is_correct"]
+    else:
+        assert result is not None and result["is_correct"], reason
+
+
+@pytest.mark.parametrize("word", ["don't", "can't", "I'm", "we're", "they've", "shouldn't", "it’s"])
+def test_contractions_are_correct(checker, word):
+    result, reason = checker.check(word)
+    assert result is not None and result["is_correct"], reason
+
+
+@pytest.mark.parametrize("word", ["would've", "y'all", "frend's"])
+def test_unknown_apostrophe_words_are_escalated(checker, word):
+    assert checker.check(word) == (None, "apostrophe")
+
+
+@pytest.mark.parametrize("word, suggestion", [("freind", "friend"), ("becuase", "because"), ("recieve", "receive")])
+def test_clear_misspellings_are_corrected_locally(checker, word, suggestion):
+    result, reason = checker.check(word)
+    assert reason == "corrected"
+    assert result["suggestions"][0] == suggestion
+
+
+@pytest.mark.parametrize("word", ["favorite", "neighbor", "traveled", "color"])
+def test_american_spellings_are_correct(checker, word):
+    result, _ = checker.check(word)
+    assert result is not None and result["is_correct"]
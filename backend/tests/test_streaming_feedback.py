@@ -0,0 +1,59 @@
+"""流式反馈：从不完整的 JSON 中取出字段，按片段推送 feedback_partial"""
+import asyncio
+import json
+
+from services.english_checker import STREAMED_SENTENCE_FIELDS, EnglishChecker, SentenceCheckRequest, extract_partial_fields
+
+FINAL = {
+    "is_complete": True,
+    "issues": [],
+    "suggestions": [],
+    "overall_score": 0.8,
+    "explanation": "句子基本正确",
+    "polished_sentence": "I went to the park yesterday.",
+    "polished_explanation": "went 是 go 的过去式"
+}
+
+
+def test_extract_fields_from_truncated_json():
+    text = '```json\n{"is_complete": true, "issues": [], "polished_sentence": "I went to the pa'
+    assert extract_partial_fields(text, STREAMED_SENTENCE_FIELDS) == {"polished_sentence": "I went to the pa"}
+
+
+def test_extract_fields_ignores_unparseable_and_non_string_values():
+    assert extract_partial_fields("no json here", STREAMED_SENTENCE_FIELDS) == {}
+    assert extract_partial_fields('{"explanation": 3, "polished_sentence": ""', STREAMED_SENTENCE_FIELDS) == {}
+    assert extract_partial_fields('[1, 2', STREAMED_SENTENCE_FIELDS) == {}
+
+
+def test_stream_sends_growing_partials_then_full_result(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("CHECK_CACHE_BACKEND", "none")
+    checker = EnglishChecker()
+    monkeypatch.setattr(checker, "_triage", lambda sentence: None)
+    reply = json.dumps(FINAL, ensure_ascii=False)
+
+    async def complete_stream(system, prompt, temperature, max_tokens, timeout, on_text):
+        # 每次多给 7 个字符，模拟逐个 token 到达
+        for end in range(7, len(reply) + 7, 7):
+            await on_text(reply[:end])
+        return reply
+
+    monkeypatch.setattr(checker, "_complete_stream", complete_stream)
+    partials = []
+
+    async def on_partial(fields):
+        partials.append(fields)
+
+    async def scenario():
+        result = await checker.check_sentence(SentenceCheckRequest(sentence="I go to the park yesterday."), on_partial=on_partial)
+        await checker.aclose()
+        return result
+
+    result = asyncio.run(scenario())
+    assert result.polished_sentence == FINAL["polished_sentence"]
+    # 相同的字段不会重复推送，字段只会变长，最后一次与最终结果一致
+    assert all(a != b for a, b in zip(partials, partials[1:]))
+    sentences = [p["polished_sentence"] for p in partials if "polished_sentence" in p]
+    assert all(FINAL["polished_sentence"].startswith(s) for s in sentences)
+    assert partials[-1] == {field: FINAL[field] for field in STREAMED_SENTENCE_FIELDS}
@@ -0,0 +1,60 @@
+"""检索缓存：查询向量只推理一次，索引重建后旧的检索结果不再返回"""
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from services.chunk_store import save_vectorstore
+from services.index_storage import new_version_dir, publish_version
+from services.vectorstore_registry import DEFAULT_EMBEDDING_MODEL, VectorStoreRegistry
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.queries = []
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return np.random.default_rng(sum(map(ord, text))).normal(size=8).astype(np.float32).tolist()
+
+
+def publish(path, embeddings, texts):
+    staging = new_version_dir(path)
+    save_vectorstore(FAISS.from_texts(texts, embeddings), staging)
+    publish_version(path, staging)
+
+
+def test_repeated_query_hits_caches_until_rebuild(tmp_path):
+    path = str(tmp_path / "store")
+    embeddings = CountingEmbeddings()
+    publish(path, embeddings, ["Quarks are confined.", "Gluons carry colour."])
+    registry = VectorStoreRegistry()
+    registry._embeddings[DEFAULT_EMBEDDING_MODEL] = embeddings
+    embeddings.queries.clear()
+
+    first = registry.similarity_search(path, "What  confines quarks?", k=1)
+    second = registry.similarity_search(path, "What confines quarks? ", k=1)
+    assert first == second
+    assert embeddings.queries == ["What confines quarks?"]
+    assert registry.cache_stats()["results"]["hits"] == 1
+
+    # 重建后指纹变化，重新检索新版本，查询向量仍然命中缓存
+    publish(path, embeddings, ["Leptons are fundamental."])
+    embeddings.queries.clear()
+    third = registry.similarity_search(path, "What confines quarks?", k=1)
+    assert third[0].page_content == "Leptons are fundamental."
+    assert embeddings.queries == []
+    assert registry.cache_stats()["embeddings"]["hits"] >= 1
+
+
+def test_embed_queries_deduplicates_misses():
+    embeddings = CountingEmbeddings()
+    registry = VectorStoreRegistry()
+    registry._embeddings[DEFAULT_EMBEDDING_MODEL] = embeddings
+    registry.embed_query("a b")
+    vectors = registry.embed_queries(["a  b", "c", "c", "d"])
+    assert vectors.shape == (4, 8)
+    assert embeddings.queries == ["a b", "c", "d"]
+    assert np.allclose(vectors[1], vectors[2])
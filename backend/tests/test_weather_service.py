@@ -0,0 +1,97 @@
+"""WeatherService 的缓存、single-flight 和旧值回退，上游为 bench.fake_weather 的模拟服务（进程内 ASGI，不占端口）"""
+import asyncio
+
+import httpx
+import pytest
+
+from bench.fake_weather import create_app
+from services.tools import WeatherService
+
+BEIJING = (39.9, 116.4)
+
+
+async def make_service(app, ttl: float = 600, stale_ttl: float = 3600) -> WeatherService:
+    service = WeatherService(base_url="http://weather/v1", ttl=ttl, stale_ttl=stale_ttl)
+    await service.http_client.aclose()
+    service.http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://weather/v1")
+    return service
+
+
+def test_concurrent_calls_share_one_upstream_request():
+    async def scenario():
+        app = create_app(latency_ms=50)
+        service = await make_service(app)
+        results = await asyncio.gather(*[service.current(*BEIJING) for _ in range(20)])
+        await service.aclose()
+        return app, service, results
+
+    app, service, results = asyncio.run(scenario())
+    assert app.state.requests == 1
+    assert service.upstream_calls == 1
+    assert all(result == results[0] for result in results)
+
+
+def test_fresh_hit_within_ttl_skips_upstream():
+    async def scenario():
+        app = create_app()
+        service = await make_service(app)
+        first = await service.current(*BEIJING)
+        second = await service.current(*BEIJING)
+        await service.aclose()
+        return app, service, first, second
+
+    app, service, first, second = asyncio.run(scenario())
+    assert first == second
+    assert app.state.requests == 1
+    assert (service.hits, service.misses) == (1, 1)
+
+
+def test_upstream_error_returns_stale_value():
+    async def scenario():
+        app = create_app()
+        # ttl 为 0：第二次调用一定会请求上游
+        service = await make_service(app, ttl=0, stale_ttl=3600)
+        first = await service.current(*BEIJING)
+        app.state.fail = True
+        second = await service.current(*BEIJING)
+        await service.aclose()
+        return app, service, first, second
+
+    app, service, first, second = asyncio.run(scenario())
+    assert second == first
+    assert app.state.requests == 2
+    assert service.upstream_errors == 1
+    assert service.stale_served == 1
+
+
+def test_upstream_error_without_stale_value_raises():
+    async def scenario():
+        app = create_app()
+        app.state.fail = True
+        service = await make_service(app)
+        try:
+            await service.current(*BEIJING)
+        finally:
+            await service.aclose()
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(scenario())
+
+
+def test_cancelling_one_waiter_keeps_shared_fetch():
+    async def scenario():
+        app = create_app(latency_ms=100)
+        service = await make_service(app)
+        cancelled = asyncio.create_task(service.current(*BEIJING))
+        waiting = asyncio.create_task(service.current(*BEIJING))
+        await asyncio.sleep(0.02)
+        cancelled.cancel()
+        result = await waiting
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        await service.aclose()
+        return app, result
+
+    app, result = asyncio.run(scenario())
+    assert app.state.requests == 1
+    assert "temperature" in result
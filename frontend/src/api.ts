@@ -29,13 +29,17 @@ export interface HealthResponse {
   message?: string;
 }
 
+// 后端按会话保存对话记忆，首次提问时由后端分配 session_id
+let askSessionId: string | null = null;
+
 export async function askQuestion(question: string): Promise<string> {
   const res = await fetch(`${API_BASE_URL}/ask`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ question })
+    body: JSON.stringify({ question, session_id: askSessionId })
   });
   const data = await res.json();
+  askSessionId = data.session_id ?? askSessionId;
   return data.answer;
 }
 